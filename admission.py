@@ -0,0 +1,173 @@
+import io
+import math
+import time
+import wave
+import threading
+from PIL import Image
+
+# Working copies a request holds per byte of decoded carrier: the decoded
+# samples, the copy the bits are written into and the encoded output
+IMAGE_MEMORY_FACTOR = 4
+AUDIO_MEMORY_FACTOR = 3
+
+# Compressed audio (MP3, OGG, ...) is roughly this many times larger once decoded to PCM
+COMPRESSED_AUDIO_EXPANSION = 12
+
+# Used when the header cannot be read, per byte of upload
+FALLBACK_MEMORY_FACTOR = 4
+
+# Retry-After for media types whose limit is 0, which are never admitted
+DISABLED_RETRY_AFTER = 60
+
+class Saturated(Exception):
+    """Raised when a request cannot be admitted; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def upload_size(stream):
+    position = stream.tell()
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+def estimate_memory(media_type, stream):
+    """Estimate the peak memory of embedding in or extracting from a carrier, from its header alone
+
+    Only the header is read and the stream is left at its start.
+    """
+    size = upload_size(stream)
+    try:
+        if media_type == 'image':
+            # PIL reads the dimensions without decoding the pixels
+            with Image.open(stream) as img:
+                width, height = img.size
+            return width * height * 4 * IMAGE_MEMORY_FACTOR
+        if media_type == 'audio':
+            try:
+                with wave.open(stream, 'rb') as audio_file:
+                    pcm_bytes = audio_file.getnframes() * audio_file.getnchannels() * audio_file.getsampwidth()
+            except (wave.Error, EOFError):
+                pcm_bytes = size * COMPRESSED_AUDIO_EXPANSION
+            return pcm_bytes * AUDIO_MEMORY_FACTOR
+    except Exception:
+        pass
+    finally:
+        stream.seek(0)
+    return size * FALLBACK_MEMORY_FACTOR
+
+class Ticket:
+    """An admitted request; release() (or leaving the with block) frees its slot and memory"""
+
+    def __init__(self, controller, media_type, memory):
+        self.controller = controller
+        self.media_type = media_type
+        self.memory = memory
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class AdmissionController:
+    """Per-media-type concurrency limits and a shared memory budget for the heavy requests of one process
+
+    A request waits up to timeout seconds for a slot, behind at most
+    max_queue others of its media type, and is otherwise rejected with
+    Saturated. A request larger than the whole budget is still admitted
+    when nothing else is running, so it can never starve. A limit of 0
+    disables a media type: its requests are rejected without waiting.
+    """
+
+    def __init__(self, limits, default_limit, memory_budget, max_queue, timeout):
+        for media_type, limit in {**limits, None: default_limit}.items():
+            if limit < 0:
+                raise ValueError(f"Admission limit of {media_type or 'the default'} must not be negative")
+        self.limits = dict(limits)
+        self.default_limit = default_limit
+        self.memory_budget = memory_budget
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.memory_in_use = 0
+        self.stats = {}
+        self.condition = threading.Condition()
+
+    def _stats(self, media_type):
+        if media_type not in self.stats:
+            self.stats[media_type] = {'in_flight': 0, 'waiting': 0, 'admitted_total': 0, 'rejected_total': 0,
+                                      'max_waiting': 0, 'avg_seconds': None}
+        return self.stats[media_type]
+
+    def limit(self, media_type):
+        return self.limits.get(media_type, self.default_limit)
+
+    def _fits(self, media_type, memory):
+        stats = self._stats(media_type)
+        if stats['in_flight'] >= self.limit(media_type):
+            return False
+        running = sum(entry['in_flight'] for entry in self.stats.values())
+        return running == 0 or self.memory_in_use + memory <= self.memory_budget
+
+    def _retry_after(self, media_type):
+        """Seconds until a slot is likely free, from the average time a request of this type holds one"""
+        stats = self._stats(media_type)
+        average = stats['avg_seconds'] or 1.0
+        queued = stats['waiting'] + 1
+        return max(1, math.ceil(average * queued / self.limit(media_type)))
+
+    def acquire(self, media_type, memory, timeout=None):
+        """Admit a request needing about memory bytes and return its Ticket, or raise Saturated"""
+        timeout = self.timeout if timeout is None else timeout
+        with self.condition:
+            stats = self._stats(media_type)
+            if self.limit(media_type) == 0:
+                stats['rejected_total'] += 1
+                raise Saturated(f"{media_type} requests are disabled on this server", DISABLED_RETRY_AFTER)
+            if not self._fits(media_type, memory):
+                if stats['waiting'] >= self.max_queue:
+                    stats['rejected_total'] += 1
+                    raise Saturated(f"Too many {media_type} requests in progress", self._retry_after(media_type))
+                stats['waiting'] += 1
+                stats['max_waiting'] = max(stats['max_waiting'], stats['waiting'])
+                try:
+                    admitted = self.condition.wait_for(lambda: self._fits(media_type, memory), timeout)
+                finally:
+                    stats['waiting'] -= 1
+                if not admitted:
+                    stats['rejected_total'] += 1
+                    raise Saturated(f"Too many {media_type} requests in progress", self._retry_after(media_type))
+            stats['in_flight'] += 1
+            stats['admitted_total'] += 1
+            self.memory_in_use += memory
+        return Ticket(self, media_type, memory)
+
+    def _release(self, ticket):
+        elapsed = time.monotonic() - ticket.started
+        with self.condition:
+            stats = self._stats(ticket.media_type)
+            stats['in_flight'] -= 1
+            self.memory_in_use -= ticket.memory
+            # Moving average of how long a request holds its slot, for Retry-After
+            average = stats['avg_seconds']
+            stats['avg_seconds'] = elapsed if average is None else 0.8 * average + 0.2 * elapsed
+            self.condition.notify_all()
+
+    def snapshot(self):
+        """Queue depths, limits and totals per media type, and the memory budget in use"""
+        with self.condition:
+            return {
+                'memory_in_use': self.memory_in_use,
+                'memory_budget': self.memory_budget,
+                'media_types': {media_type: {**stats, 'limit': self.limit(media_type)}
+                                for media_type, stats in self.stats.items()}
+            }
@@ -1,103 +1,672 @@
 import os
+import io
 import sys
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import tempfile
+import mimetypes
 from pathlib import Path
-from flask import Flask, request, jsonify, send_from_directory, render_template, redirect, url_for
+from concurrent.futures import as_completed
+from flask import Flask, Response, request, jsonify, g, after_this_request, send_from_directory, send_file, render_template, redirect, url_for
 from werkzeug.utils import secure_filename
 import utils
+import carriers
+import jobs
+import upload_sessions
+import output_store
+import storage
+import admission
+import metrics
+import logs
+import profiling
+import payload
+import idempotency
 import hashlib
-import traceback
+import hmac
+import logging
 from PIL import Image
 
+logger = logging.getLogger(__name__)
+
 # Create Flask app
 app = Flask(__name__, static_url_path='/static', static_folder='static')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
 app.config['MAX_CONTENT_LENGTH'] = 64 * 1024 * 1024  # 64MB max upload (increased from 16MB)
+app.config['JOB_DB'] = 'jobs.sqlite3'  # Shared by all server processes
+app.config['JOB_WORKERS'] = {}  # Worker processes per media type, e.g. {'image': 4, 'audio': 2}
+app.config['JOB_DEFAULT_WORKERS'] = None  # For media types not in JOB_WORKERS; None for one per CPU
+app.config['BATCH_MAX_FILES'] = 200  # Most files accepted by one batch request
+app.config['BATCH_MAX_UNZIPPED_SIZE'] = 256 * 1024 * 1024  # Limit on ZIP uploads to /api/decrypt-batch once unpacked
+app.config['UPLOAD_SPOOL_DIR'] = 'spool'  # Chunked uploads are assembled here
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # Chunk size suggested to clients (must stay under MAX_CONTENT_LENGTH)
+app.config['UPLOAD_MAX_SIZE'] = 8 * 1024 * 1024 * 1024  # Largest chunked upload
+app.config['UPLOAD_SESSION_TTL'] = 24 * 60 * 60  # Seconds before an unfinished or unused upload is removed
+app.config['UPLOAD_MAX_AGE'] = 60 * 60  # Seconds before a file left in the upload folder is removed
+app.config['OUTPUT_INDEX_DB'] = 'outputs.sqlite3'  # Size, expiry and last use of every output file
+app.config['OUTPUT_TTL'] = 24 * 60 * 60  # Seconds an output file is kept unless the request asks for less
+app.config['OUTPUT_MAX_TTL'] = 7 * 24 * 60 * 60  # Longest ttl a request may ask for
+app.config['OUTPUT_QUOTA_BYTES'] = 10 * 1024 * 1024 * 1024  # Least recently downloaded files are removed above this
+app.config['OUTPUT_REAP_INTERVAL'] = 5 * 60  # Seconds between reaper passes (0 disables the reaper thread)
+app.config['STORAGE_BACKEND'] = 'local'  # Where output files are kept: 'local' (OUTPUT_FOLDER) or 's3'
+app.config['S3_BUCKET'] = None  # Bucket of the s3 backend, shared by every node
+app.config['S3_PREFIX'] = 'output/'  # Key prefix of output files in the bucket
+app.config['S3_ENDPOINT_URL'] = None  # For S3-compatible services such as MinIO, e.g. 'http://minio:9000'
+app.config['S3_REGION'] = None
+app.config['DOWNLOAD_CHUNK_SIZE'] = 1024 * 1024  # Bytes held in memory at a time when streaming from the backend
+app.config['DOWNLOAD_OFFLOAD'] = None  # 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd) sends local files
+app.config['DOWNLOAD_ACCEL_PREFIX'] = '/protected-output/'  # Internal nginx location that maps to OUTPUT_FOLDER
+app.config['ADMISSION_LIMITS'] = {}  # Concurrent /api/encrypt and /api/decrypt requests per media type, e.g. {'audio': 2}
+app.config['ADMISSION_DEFAULT_LIMIT'] = os.cpu_count() or 1  # For media types not in ADMISSION_LIMITS
+app.config['ADMISSION_MEMORY_BUDGET'] = 2 * 1024 * 1024 * 1024  # Estimated carrier memory all running requests may use
+app.config['ADMISSION_MAX_QUEUE'] = 8  # Requests per media type that may wait for a slot before 429s
+app.config['ADMISSION_QUEUE_TIMEOUT'] = 5  # Seconds a request waits for a slot before a 429
+app.config['TRACE_SLOWEST'] = 20  # Slowest encrypt/decrypt/QR requests kept for /api/traces (0 disables)
+app.config['TRACE_LOG'] = None  # JSON file the slowest requests are also written to, e.g. 'slowest_requests.json'
+app.config['LOG_LEVEL'] = 'INFO'  # 'DEBUG' adds per-request pipeline details
+app.config['LOG_FORMAT'] = 'json'  # 'json' (one object per line), 'text', or None to leave logging to the host
+app.config['LOG_DEBUG_SAMPLE_RATE'] = 1.0  # Fraction of DEBUG records written, e.g. 0.01 for 1 in 100
+app.config['PROFILE_TOKEN'] = None  # Admin token that enables per-request profiling (None disables it)
+app.config['PROFILE_DIR'] = 'profiles'  # Where .prof and memory reports of profiled requests are written
+app.config['PROFILE_KEEP'] = 100  # Newest reports kept in PROFILE_DIR
+app.config['WARM_UP_BACKENDS'] = utils.WARM_UP_BACKENDS  # Backends warm_up() loads before workers fork
+app.config['IDEMPOTENCY_DB'] = 'idempotency.sqlite3'  # Responses by Idempotency-Key, shared by all server processes
+app.config['IDEMPOTENCY_TTL'] = 60 * 60  # Seconds a response is replayed to retries with the same key
+app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = 10 * 60  # Seconds before a key held by a crashed request can be reused
+app.config['IDEMPOTENCY_WAIT_TIMEOUT'] = 120  # Seconds a duplicate waits for the first request before a 409
+app.config['IDEMPOTENCY_MAX_BODY'] = 16 * 1024 * 1024  # Larger responses are not stored, so retries run again
 # Removed secret key since we're removing authentication
 
-# Create necessary directories
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+# Create necessary directories when serving requests, so importing the module (bulk.py) has no side effects
+@app.before_request
+def ensure_folders():
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+    setup_logging()
+    start_output_reaper()
+
+# Background job manager, chunked upload store and output store, created on first use
+_job_manager = None
+_upload_store = None
+_output_store = None
+_output_reaper = None
+_admission = None
+_slow_log = None
+_idempotency_store = None
+_logging_configured = False
+
+# Requests whose stages are traced for Server-Timing, ?timings=1 and the slow request log
+TRACED_ENDPOINTS = ('encrypt', 'decrypt', 'generate_qr', 'encrypt_qr', 'decrypt_qr')
+
+# Requests that create output files, where an Idempotency-Key makes retries safe
+IDEMPOTENT_ENDPOINTS = ('encrypt', 'generate_qr', 'encrypt_qr')
+
+# Response headers that belong to one attempt rather than to the stored response
+UNREPLAYED_HEADERS = ('Content-Length', 'Date', 'Set-Cookie', 'Server-Timing', 'X-Profile-Id')
+
+def get_job_manager():
+    """Return the job manager, starting it with the current configuration if needed"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = jobs.JobManager(jobs.JobStore(app.config['JOB_DB']), workers=app.config['JOB_WORKERS'],
+                                       default_workers=app.config['JOB_DEFAULT_WORKERS'])
+    return _job_manager
+
+def get_upload_store():
+    """Return the chunked upload store for the configured spool directory"""
+    global _upload_store
+    if _upload_store is None or _upload_store.spool_dir != app.config['UPLOAD_SPOOL_DIR']:
+        _upload_store = upload_sessions.UploadStore(app.config['UPLOAD_SPOOL_DIR'], app.config['UPLOAD_MAX_SIZE'],
+                                                    app.config['UPLOAD_SESSION_TTL'])
+    return _upload_store
+
+def get_output_store():
+    """Return the store for the configured output folder"""
+    global _output_store
+    if _output_store is None or _output_store.folder != app.config['OUTPUT_FOLDER']:
+        backend = storage.create_backend(app.config['STORAGE_BACKEND'], app.config['OUTPUT_FOLDER'],
+                                         bucket=app.config['S3_BUCKET'], prefix=app.config['S3_PREFIX'],
+                                         endpoint_url=app.config['S3_ENDPOINT_URL'], region_name=app.config['S3_REGION'])
+        _output_store = output_store.OutputStore(app.config['OUTPUT_FOLDER'], app.config['OUTPUT_INDEX_DB'],
+                                                 app.config['OUTPUT_TTL'], app.config['OUTPUT_QUOTA_BYTES'],
+                                                 backend=backend)
+    return _output_store
+
+def get_idempotency_store():
+    """Return the store of idempotent responses, shared by all server processes through IDEMPOTENCY_DB"""
+    global _idempotency_store
+    if _idempotency_store is None or _idempotency_store.path != app.config['IDEMPOTENCY_DB']:
+        _idempotency_store = idempotency.IdempotencyStore(app.config['IDEMPOTENCY_DB'], app.config['IDEMPOTENCY_TTL'],
+                                                          app.config['IDEMPOTENCY_LOCK_TIMEOUT'],
+                                                          app.config['IDEMPOTENCY_WAIT_TIMEOUT'])
+    return _idempotency_store
+
+def reap_storage():
+    """Remove expired and over-quota output files, and uploads left behind by failed requests"""
+    store = get_output_store()
+    result = store.reap()
+    result['uploads_removed'] = store.reap_uploads(app.config['UPLOAD_FOLDER'], app.config['UPLOAD_MAX_AGE'])
+    if not store.backend.local:
+        # The output folder only holds files on their way to the backend
+        result['uploads_removed'] += store.reap_uploads(app.config['OUTPUT_FOLDER'], app.config['UPLOAD_MAX_AGE'])
+    result['idempotency_keys_removed'] = get_idempotency_store().reap()
+    if any(result.values()):
+        logger.info("Storage reaper removed files", extra=result)
+    return result
+
+def setup_logging():
+    """Configure logging for this server process from LOG_LEVEL, LOG_FORMAT and LOG_DEBUG_SAMPLE_RATE, once"""
+    global _logging_configured
+    if not _logging_configured and app.config['LOG_FORMAT'] is not None:
+        logs.configure_logging(app.config['LOG_LEVEL'], json_output=app.config['LOG_FORMAT'] == 'json',
+                               debug_sample_rate=app.config['LOG_DEBUG_SAMPLE_RATE'])
+    _logging_configured = True
+
+def warm_up():
+    """Load the WARM_UP_BACKENDS now rather than in each request's worker; opt-in, for preforking servers
+
+    Call it where the server imports the app before forking (gunicorn --preload), so the
+    workers share the loaded modules instead of each importing them on first use.
+    """
+    timings = utils.warm_up(app.config['WARM_UP_BACKENDS'])
+    logger.info("Warmed up backends", extra={'warm_up_seconds': timings})
+    return timings
+
+PATH_SETTINGS = ('UPLOAD_FOLDER', 'OUTPUT_FOLDER', 'UPLOAD_SPOOL_DIR', 'JOB_DB', 'OUTPUT_INDEX_DB', 'PROFILE_DIR',
+                 'IDEMPOTENCY_DB')
+
+def create_app(config=None):
+    """Configure the module's app for a server process and return it
+
+    Unlike a Flask application factory, this does not build a new app: the routes, hooks and
+    per-process stores belong to the single module-level api.app, so two configurations cannot
+    coexist in one process. Call it once, before serving.
+
+    config overrides app.config: a dict, or the path of a Python config file. Folders and
+    databases in PATH_SETTINGS are made absolute against the current directory, since Flask
+    resolves relative download folders against the app's root path. Nothing is started here;
+    stores, job pools and the reaper thread are created by each process on its first request,
+    so the app can be configured before a server forks its workers.
+    """
+    if isinstance(config, str):
+        app.config.from_pyfile(os.path.abspath(config))
+    elif config:
+        app.config.update(config)
+    for key in PATH_SETTINGS:
+        app.config[key] = os.path.abspath(app.config[key])
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+    return app
+
+def start_output_reaper():
+    """Start the reaper thread of this server process, once"""
+    global _output_reaper
+    if _output_reaper is None and app.config['OUTPUT_REAP_INTERVAL'] > 0:
+        _output_reaper = output_store.start_reaper(reap_storage, app.config['OUTPUT_REAP_INTERVAL'])
+
+def requested_ttl():
+    """Return the ttl form field in seconds (capped at OUTPUT_MAX_TTL), or None if not given
+
+    Raises ValueError if it is not a positive integer.
+    """
+    ttl = request.form.get('ttl')
+    if ttl is None or ttl == '':
+        return None
+    if not ttl.isdigit() or int(ttl) <= 0:
+        raise ValueError('ttl must be a positive number of seconds')
+    return min(int(ttl), app.config['OUTPUT_MAX_TTL'])
+
+def remove_upload(path):
+    """Delete a saved upload and the WAV converted from it, if any"""
+    paths = [path]
+    if not path.lower().endswith('.wav'):
+        paths.append(os.path.splitext(path)[0] + '_converted.wav')
+    for candidate in paths:
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
+
+def upload_path_for(filename):
+    """Path in the upload folder, unique per request so concurrent uploads of the same name cannot clash"""
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+
+def get_admission_controller():
+    """Return this process's admission controller, created with the current configuration"""
+    global _admission
+    if _admission is None:
+        _admission = admission.AdmissionController(app.config['ADMISSION_LIMITS'], app.config['ADMISSION_DEFAULT_LIMIT'],
+                                                   app.config['ADMISSION_MEMORY_BUDGET'], app.config['ADMISSION_MAX_QUEUE'],
+                                                   app.config['ADMISSION_QUEUE_TIMEOUT'])
+    return _admission
+
+def admit_request(carrier, file):
+    """Wait for a slot and memory for processing file with carrier, released when the request ends
+
+    Raises admission.Saturated if the node is too busy.
+    """
+    memory = admission.estimate_memory(carrier.name, file.stream)
+    g.admission_ticket = get_admission_controller().acquire(carrier.name, memory)
+
+@app.teardown_request
+def release_admission(exc):
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        ticket.release()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request.endpoint in TRACED_ENDPOINTS:
+        metrics.start_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe_request(request.endpoint or 'none', metrics.current_media_type(), response.status_code,
+                                time.perf_counter() - started)
+    trace = metrics.current_trace()
+    if trace is not None:
+        finish_trace(trace, response)
+    return response
+
+@app.teardown_request
+def clear_media_type(exc):
+    # Server threads are reused, so the next request must not inherit this one's media type or trace
+    metrics.set_media_type(None)
+    metrics.end_trace()
+
+def profile_token():
+    """Admin token sent with the request (X-Profile-Token header or ?profile=), or None"""
+    return request.headers.get('X-Profile-Token') or request.args.get('profile')
 
-# Utility function for encryption
-def encrypt_message(message, password):
+def profile_token_valid(token):
+    expected = app.config['PROFILE_TOKEN']
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+@app.before_request
+def start_profile():
+    """Profile a traced request sent with the admin token; the report is written when it finishes"""
+    token = profile_token()
+    if token is None or request.endpoint not in TRACED_ENDPOINTS:
+        return None
+    if not profile_token_valid(token):
+        return jsonify({'status': 'error', 'message': 'Invalid profile token'}), 403
+    # None if another request is being profiled; this one is then served as usual
+    g.profile = profiling.start()
+    g.profile_busy = g.profile is None
+    return None
+
+@app.after_request
+def save_profile(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiling.finish(profile)
+        label = f"{request.endpoint}_{metrics.current_media_type() or 'none'}"
+        response.headers['X-Profile-Id'] = profile.save(app.config['PROFILE_DIR'], label, {
+            'endpoint': request.endpoint,
+            'media_type': metrics.current_media_type(),
+            'status': response.status_code,
+            'bytes_in': request.content_length or 0
+        })
+        profiling.prune(app.config['PROFILE_DIR'], app.config['PROFILE_KEEP'])
+    elif g.get('profile_busy'):
+        response.headers['X-Profile-Id'] = 'busy'
+    return response
+
+@app.teardown_request
+def stop_profile(exc):
+    # Only still set if the request failed before after_request ran
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiling.finish(profile)
+
+@app.before_request
+def replay_idempotent_request():
+    """Answer a retry from the stored response of its Idempotency-Key, waiting if the first attempt still runs"""
+    key = request.headers.get('Idempotency-Key')
+    if key is None or request.endpoint not in IDEMPOTENT_ENDPOINTS:
+        return None
+    if not idempotency.valid_key(key):
+        return jsonify({'error': f"Idempotency-Key must be 1 to {idempotency.MAX_KEY_LENGTH} printable characters"}), 400
+    # Keys are scoped to the endpoint
+    scoped_key = f"{request.endpoint}:{key}"
+    request_fingerprint = idempotency.fingerprint(request.endpoint, request.args, request.form, request.files)
     try:
-        # Print debug info
-        if isinstance(message, bytes):
-            try:
-                message_preview = message.decode('utf-8')[:10] + "..." if len(message) > 10 else message.decode('utf-8')
-            except UnicodeDecodeError:
-                message_preview = f"<binary data, {len(message)} bytes>"
+        owner, stored = get_idempotency_store().begin(
+            scoped_key, request_fingerprint, output_exists=lambda name: get_output_store().expires_at(name) is not None)
+    except idempotency.KeyConflict:
+        return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+    except idempotency.KeyBusy:
+        return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409, {'Retry-After': '1'}
+    if stored is not None:
+        status, headers, body = stored
+        response = app.response_class(body, status=status, headers=headers)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    g.idempotency_claim = (scoped_key, owner)
+    return None
+
+@app.after_request
+def store_idempotent_response(response):
+    """Keep a successful response for retries with the same key; otherwise let a retry run again"""
+    claim = g.pop('idempotency_claim', None)
+    if claim is None:
+        return response
+    store = get_idempotency_store()
+    length = response.calculate_content_length() if not response.direct_passthrough else response.content_length
+    if not 200 <= response.status_code < 300 or length is None or length > app.config['IDEMPOTENCY_MAX_BODY']:
+        store.release(*claim)
+        return response
+    # A JSON response links to its output file, and is replayed only while the file is kept
+    output = response.get_json().get('output_filename') if response.is_json else None
+    output_expires_at = get_output_store().expires_at(output) if output else None
+    if output and output_expires_at is None:
+        store.release(*claim)
+        return response
+    # Buffer a send_file() response so its body can be both stored and sent
+    response.direct_passthrough = False
+    headers = [(name, value) for name, value in response.headers if name not in UNREPLAYED_HEADERS]
+    store.complete(*claim, response.status_code, headers, response.get_data(), output, output_expires_at)
+    return response
+
+@app.teardown_request
+def release_idempotency_key(exc):
+    # Only still set if the request failed before after_request ran
+    claim = g.pop('idempotency_claim', None)
+    if claim is not None:
+        get_idempotency_store().release(*claim)
+
+def get_slow_log():
+    """Return this process's log of the slowest traced requests"""
+    global _slow_log
+    if _slow_log is None or (_slow_log.size, _slow_log.path) != (app.config['TRACE_SLOWEST'], app.config['TRACE_LOG']):
+        _slow_log = metrics.SlowLog(app.config['TRACE_SLOWEST'], app.config['TRACE_LOG'])
+    return _slow_log
+
+def timings_requested():
+    """True if the client asked for a timings field in the JSON response (?timings=1)"""
+    return request.args.get('timings', '0').lower() in ('1', 'true', 'yes')
+
+def finish_trace(trace, response):
+    """Report a traced request's stages in Server-Timing (and the body if asked) and keep it if among the slowest"""
+    response.headers['Server-Timing'] = trace.server_timing()
+    timings = {
+        'total_ms': round(trace.elapsed() * 1000, 3),
+        'stages_ms': trace.milliseconds(),
+        'bytes_in': request.content_length or 0,
+        'bytes_out': response.content_length or 0
+    }
+    if timings_requested() and response.is_json:
+        body = response.get_json()
+        if isinstance(body, dict):
+            body['timings'] = timings
+            response.set_data(app.json.dumps(body) + '\n')
+    
+    upload = request.files.get('file')
+    get_slow_log().record({
+        'endpoint': request.endpoint,
+        'media_type': metrics.current_media_type(),
+        'status': response.status_code,
+        'started_at': round(time.time() - timings['total_ms'] / 1000, 3),
+        'filename': upload.filename if upload else request.form.get('upload_id'),
+        **timings
+    })
+
+def save_upload(file, path):
+    """Save an uploaded file to path, timed as the upload_save stage"""
+    with metrics.stage('upload_save'):
+        file.save(path)
+
+def request_upload():
+    """Return the request's file: the multipart 'file' part, or the finalized chunked upload named by 'upload_id'
+
+    Returns None if there is neither. Raises ValueError if upload_id is unknown or not finalized.
+    A chunked upload is only used up by a successful response; after an error (a bad form field,
+    a 429) it is handed back, so the client can retry with the same upload_id.
+    """
+    if 'file' in request.files:
+        return request.files['file']
+    upload_id = request.form.get('upload_id')
+    if not upload_id:
+        return None
+    try:
+        file = get_upload_store().take(upload_id)
+    except KeyError:
+        raise ValueError('Unknown or already used upload_id')
+    
+    @after_this_request
+    def remove_upload(response):
+        if response.status_code >= 400:
+            file.restore()
         else:
-            message_preview = message[:10] + "..." if len(message) > 10 else message
-            
-        print(f"DEBUG: Encrypting message: '{message_preview}' ({len(message)} chars/bytes) with password: {password[:2]}{'*' * (len(password) - 4)}{password[-2:] if len(password) > 2 else ''}")
-        
-        if isinstance(message, str):
-            message = message.encode('utf-8')
-            
-        # For very short messages, use simpler encryption
-        if len(message) < 32:
-            print("DEBUG: Using simple XOR encryption for short message")
-            # Use simple XOR encryption for short messages
-            if isinstance(password, str):
-                password_bytes = password.encode('utf-8')
-            else:
-                password_bytes = password
-                
-            key = hashlib.sha256(password_bytes).digest()
-            encrypted = []
-            for i, char in enumerate(message):
-                key_char = key[i % len(key)]
-                encrypted_char = char ^ key_char
-                encrypted.append(encrypted_char)
-            
-            result = bytes(encrypted)
-            print(f"DEBUG: XOR encryption result: {len(result)} bytes")
-            return result
-        
-        # Use the utils encrypt_message function for normal messages
-        try:
-            print("DEBUG: Using AES encryption")
-            return utils.encrypt_message(message, password)
-        except Exception as e:
-            # Fallback encryption if utils function fails
-            print(f"DEBUG: AES encryption failed: {str(e)}, falling back to XOR")
-            if isinstance(password, str):
-                password_bytes = password.encode('utf-8')
-            else:
-                password_bytes = password
-                
-            key = hashlib.sha256(password_bytes).digest()
-            encrypted = []
-            for i, char in enumerate(message):
-                key_char = key[i % len(key)]
-                encrypted_char = char ^ key_char
-                encrypted.append(encrypted_char)
-            return bytes(encrypted)
+            file.close()
+        return response
+    
+    return file
+
+def resolve_carrier(media_type, file):
+    """Return the carrier for a media type, detecting it from the upload when media_type is 'auto'
+
+    Raises KeyError if the media type is unknown or cannot be detected.
+    """
+    if media_type == 'auto':
+        header = file.stream.read(16)
+        file.stream.seek(0)
+        media_type = carriers.detect_carrier(header, file.mimetype, file.filename)
+        if media_type is None:
+            raise KeyError('auto')
+    carrier = carriers.get_carrier(media_type)
+    metrics.set_media_type(carrier.name)
+    return carrier
+
+def inline_requested():
+    """True if the client asked for the in-memory request path (?inline=1)"""
+    return request.args.get('inline', '0').lower() in ('1', 'true', 'yes')
+
+def async_requested():
+    """True if the client asked for the work to run as a background job (?async=1)"""
+    return request.args.get('async', '0').lower() in ('1', 'true', 'yes')
+
+def encrypt_job(upload_path, filename, media_type, message, password, auto_generate, use_dictionary, store,
+                ttl=None, progress=None):
+    """Background version of /api/encrypt, run in a worker process"""
+    try:
+        return hide_in_carrier(carriers.get_carrier(media_type), upload_path, filename, message, password,
+                               auto_generate=auto_generate, use_dictionary=use_dictionary, store=store, ttl=ttl,
+                               progress=progress)
+    finally:
+        remove_upload(upload_path)
+
+def decrypt_job(upload_path, filename, media_type, password, progress=None):
+    """Background version of /api/decrypt, run in a worker process"""
+    try:
+        carrier = carriers.get_carrier(media_type)
+        extracted_data = carrier.extract(upload_path, progress=progress)
+        body, status_code = payload.decrypt_extracted_data(extracted_data, password, filename, carrier)
+    finally:
+        remove_upload(upload_path)
+    if status_code >= 400:
+        raise ValueError(body['message'])
+    return body
+
+def embed_batch_item(upload_path, output_path, media_type, data_to_hide):
+    """Hide an already encrypted payload in one file of a batch, run in a worker process"""
+    started = time.perf_counter()
+    try:
+        carriers.get_carrier(media_type).embed(upload_path, data_to_hide, output=output_path)
+    finally:
+        remove_upload(upload_path)
+    return {'file_size': os.path.getsize(output_path), 'embed_seconds': round(time.perf_counter() - started, 4)}
+
+def collect_batch_item(future, item, started):
+    """Fill in a batch item from its finished future, recording errors instead of raising"""
+    try:
+        item.update({'status': 'success', **future.result()})
     except Exception as e:
-        print(f"DEBUG: Encryption failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise
+        item.update(status='error', error=str(e))
+    item['elapsed_seconds'] = round(time.perf_counter() - started, 4)
+    return item
+
+def decrypt_batch_item(upload_path, filename, media_type, password):
+    """Extract and decrypt one file of a batch, run in a worker process"""
+    started = time.perf_counter()
+    try:
+        carrier = carriers.get_carrier(media_type)
+        extracted_data = carrier.extract(upload_path)
+    finally:
+        remove_upload(upload_path)
+    
+    # Without a password to try, data lacking the embedded password is not one of our payloads
+    if not password and not payload.has_payload_marker(extracted_data):
+        body = {'status': 'not_stego', 'message': 'No hidden message found'}
+    else:
+        body, _ = payload.decrypt_extracted_data(extracted_data, password, filename, carrier)
+    body['decrypt_seconds'] = round(time.perf_counter() - started, 4)
+    return body
 
-# Utility function for decryption
-def decrypt_message(encrypted_data, password):
+def save_batch_uploads(files, batch_id):
+    """Save the files of a batch to the upload folder, unpacking ZIP archives
+
+    Returns a list of (filename, path). Raises ValueError, without leaving
+    files behind, if the batch has too many files or unpacks too large.
+    """
+    saved = []
+    
+    def save_path(filename):
+        if len(saved) >= app.config['BATCH_MAX_FILES']:
+            raise ValueError(f"Too many files (at most {app.config['BATCH_MAX_FILES']} per batch)")
+        return os.path.join(app.config['UPLOAD_FOLDER'], f"{batch_id}_{len(saved)}_{filename}")
+    
     try:
-        # Use the decrypt_message function from utils module
-        return utils.decrypt_message(encrypted_data, password)
-    except (AttributeError, ImportError):
-        # Fallback decryption if utils function is not available
-        if isinstance(password, str):
-            password = password.encode('utf-8')
+        for file in files:
+            header = file.stream.read(4)
+            file.stream.seek(0)
+            if header != b'PK\x03\x04':
+                filename = secure_filename(file.filename)
+                path = save_path(filename)
+                save_upload(file, path)
+                saved.append((filename, path))
+                continue
             
-        key = hashlib.sha256(password).digest()
-        decrypted = []
-        for i, char in enumerate(encrypted_data):
-            key_char = key[i % len(key)]
-            decrypted_char = char ^ key_char
-            decrypted.append(decrypted_char)
-        return bytes(decrypted)
+            with zipfile.ZipFile(file.stream) as archive:
+                members = [member for member in archive.infolist()
+                           if not member.is_dir() and not member.filename.startswith('__MACOSX/')]
+                if sum(member.file_size for member in members) > app.config['BATCH_MAX_UNZIPPED_SIZE']:
+                    raise ValueError(f"{file.filename} is too large once unpacked")
+                for member in members:
+                    filename = secure_filename(os.path.basename(member.filename))
+                    path = save_path(filename)
+                    with archive.open(member) as source, open(path, 'wb') as target:
+                        shutil.copyfileobj(source, target)
+                    saved.append((filename, path))
+    except Exception:
+        for _, path in saved:
+            os.remove(path)
+        raise
+    return saved
+
+def probe_batch_file(path, filename, media_type):
+    """Check a batch file's header, returning (carrier, None) or (None, reason to skip it)
+
+    Only the first bytes of the file are read, so files that are not media at
+    all are skipped before any decoding.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(16)
+    detected = carriers.detect_carrier(header, filename=filename)
+    if media_type == 'auto':
+        if detected is None:
+            return None, 'Unsupported file type'
+        return carriers.get_carrier(detected), None
+    if detected is not None and detected != media_type:
+        return None, f"Not a {media_type} file"
+    return carriers.get_carrier(media_type), None
+
+class ZipStream:
+    """Write-only file object that lets zipfile build an archive while it is being sent
+
+    zipfile falls back to data descriptors for streams it cannot seek, so each
+    member can be sent as soon as it is written.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and forget everything written since the last call"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def submit_upload_job(kind, carrier, file, func, *args):
+    """Save an upload under a job-unique name and queue func(upload_path, filename, media_type, *args)
+
+    Returns the 202 response pointing at the job status URL.
+    """
+    manager = get_job_manager()
+    job_id = manager.create(kind, carrier.name)
+    filename = secure_filename(file.filename)
+    upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+    save_upload(file, upload_path)
+    manager.submit(job_id, carrier.name, func, upload_path, filename, carrier.name, *args)
+    
+    status_url = f"/api/jobs/{job_id}"
+    response = jsonify({'status': jobs.QUEUED, 'job_id': job_id, 'status_url': status_url,
+                        'events_url': f"{status_url}/events"})
+    response.headers['Location'] = status_url
+    return response, 202
+
+def stego_filename(filename, carrier):
+    """Output filename for a carrier (image carriers always write PNG, audio carriers WAV)"""
+    return f"stego_{Path(filename).stem}{carrier.output_extension}"
+
+def hide_in_carrier(carrier, source, filename, message, password, auto_generate=False, use_dictionary=False,
+                    store=None, ttl=None, progress=None):
+    """Encrypt a message, hide it in a carrier file and save the result in the output store
+
+    Returns the /api/encrypt response body.
+    """
+    store = store or get_output_store()
+    data_to_hide, stats = payload.prepare_payload(message, password, use_dictionary)
+    
+    # Named by the payload and carrier bytes, so outputs of different requests never share a name
+    output_filename = output_store.content_name(stego_filename(filename, carrier),
+                                                output_store.content_digest(data_to_hide, source))
+    output_path = os.path.join(store.folder, output_filename)
+    
+    # Hide data in the carrier (converts JPEG/MP3/... input as needed)
+    carrier.embed(source, data_to_hide, output=output_path, progress=progress)
+    
+    # Get file size for response (before the store moves the file to its backend)
+    file_size = os.path.getsize(output_path)
+    expires_at = store.add(output_filename, ttl)
+    
+    return {
+        'status': 'success',
+        'original_filename': filename,
+        'output_filename': output_filename,
+        'file_size': file_size,
+        **stats,
+        'auto_generated': auto_generate,
+        'auto_generated_password': password if auto_generate else None,
+        'download_url': f"/api/download/{output_filename}",
+        'expires_at': expires_at,
+        'media_type': carrier.name,
+        'encryption_method': 'AES-256',
+        'hiding_technique': carrier.hiding_technique
+    }
 
 # API routes
 @app.route('/api/health', methods=['GET'])
@@ -109,11 +678,14 @@ def health_check():
 def encrypt():
     """Encrypt a message and hide it in a media file"""
     try:
-        # Check if the post request has the file part
-        if 'file' not in request.files:
+        # Check if the post request has the file part (or names a finalized chunked upload)
+        try:
+            file = request_upload()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if file is None:
             return jsonify({'error': 'No file part'}), 400
         
-        file = request.files['file']
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
@@ -127,360 +699,536 @@ def encrypt():
         # Auto-generate password or use provided one
         if auto_generate:
             password = utils.generate_strong_password(16)
-            print(f"Auto-generated password: {password}")
         else:
             password = request.form.get('password', '')
             if not password:
                 return jsonify({'error': 'No password provided and auto-generate not enabled'}), 400
         
         media_type = request.form.get('media_type', 'image')
+        try:
+            carrier = resolve_carrier(media_type, file)
+        except KeyError:
+            return jsonify({'error': 'Unsupported media type'}), 400
         
-        # Save the uploaded file
-        filename = secure_filename(file.filename)
-        orig_file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(orig_file_path)
-        
-        # Get original message size
-        original_size = len(message.encode('utf-8'))
-        
-        # Encrypt the message
-        message_bytes = message.encode('utf-8') if isinstance(message, str) else message
-        encrypted_data = encrypt_message(message_bytes, password)
-        
-        # Calculate compression ratio correctly
-        # Format is now: [salt(16)][IV(16)][compression_marker(1)][ciphertext]
-        
-        # Extract compression marker to determine if compression was used
-        if len(encrypted_data) > 32:
-            compression_marker = encrypted_data[32:33]
-            is_compressed = compression_marker != b'\xFF'
-        else:
-            is_compressed = False
-        
-        # Overhead is salt(16) + IV(16) + marker(1) = 33 bytes
-        overhead_size = 33
-        estimated_content_size = max(0, len(encrypted_data) - overhead_size)
+        # Optionally compress with the shipped preset dictionary (helps short messages)
+        use_dictionary = request.form.get('use_dictionary', 'false').lower() == 'true'
         
-        # For reporting to user
-        compressed_size = estimated_content_size
+        try:
+            ttl = requested_ttl()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Calculate compression ratio
-        if is_compressed and original_size > 0:
-            compression_ratio = ((original_size - compressed_size) / original_size) * 100
-        else:
-            compression_ratio = 0  # No compression or invalid size
+        if async_requested():
+            return submit_upload_job('encrypt', carrier, file, encrypt_job, message, password, auto_generate,
+                                     use_dictionary, get_output_store(), ttl)
         
-        print(f"DEBUG: Original size: {original_size}, Estimated content size: {compressed_size}")
-        print(f"DEBUG: Compression applied: {is_compressed}, Ratio: {compression_ratio:.2f}%")
+        # Jobs are bounded by their worker pools; requests served here wait for a slot or get a 429
+        try:
+            admit_request(carrier, file)
+        except admission.Saturated as e:
+            return jsonify({'error': str(e)}), 429, {'Retry-After': str(e.retry_after)}
         
-        # Prepare the data to be hidden
-        # Format: [encrypted data][1 byte: marker][password bytes]
-        password_bytes = password.encode('utf-8') if isinstance(password, str) else password
-        data_to_hide = encrypted_data + b'\x01' + password_bytes
+        # Inline mode works on the upload stream and returns the stego file in the response body
+        inline = inline_requested()
         
-        # Generate output filename
-        file_extension = Path(filename).suffix.lower()
-        filename_base = Path(filename).stem
-        
-        # Process based on media type
-        if media_type == 'image':
-            # Handle all image formats, including JPEG/JPG
-            output_filename = f"stego_{filename_base}.png"  # Always use PNG for output
-            output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-            
-            # Use convert_and_hide_in_image for all image formats
-            if hasattr(utils, 'convert_and_hide_in_image'):
-                utils.convert_and_hide_in_image(orig_file_path, output_path, data_to_hide)
-            else:
-                return jsonify({'error': 'Image conversion not supported in this build'}), 400
-            
-            # Get file size for response
-            file_size = os.path.getsize(output_path)
-            
-            return jsonify({
-                'status': 'success',
-                'original_filename': filename,
-                'output_filename': output_filename,
-                'file_size': file_size,
-                'encrypted_size': len(encrypted_data),
-                'message_length': len(message),
-                'original_size': original_size,
-                'compressed_size': compressed_size,
-                'compression_ratio': compression_ratio,
-                'auto_generated': auto_generate,
-                'auto_generated_password': password if auto_generate else None,
-                'download_url': f"/api/download/{output_filename}",
-                'media_type': 'image',
-                'encryption_method': 'AES-256',
-                'hiding_technique': 'LSB Image Steganography'
-            })
+        # Save the uploaded file
+        filename = secure_filename(file.filename)
+        if not inline:
+            orig_file_path = upload_path_for(filename)
+            save_upload(file, orig_file_path)
         
-        elif media_type == 'audio':
-            # Convert to WAV if needed
-            if file_extension != '.wav':
-                print(f"Converting audio to WAV: {filename}")
-                if hasattr(utils, 'convert_audio_to_wav'):
-                    wav_path = utils.convert_audio_to_wav(orig_file_path)
-                    orig_file_path = wav_path
-                    file_extension = '.wav'
-                else:
-                    return jsonify({'error': 'Audio conversion not supported in this build'}), 400
-            
-            output_filename = f"stego_{filename_base}.wav"
-            output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-            
-            # Hide data in audio
-            if hasattr(utils, 'hide_data_in_audio'):
-                utils.hide_data_in_audio(orig_file_path, output_path, data_to_hide)
-            else:
-                return jsonify({'error': 'Audio steganography not supported in this build'}), 400
-            
-            # Get file size for response
-            file_size = os.path.getsize(output_path)
-            
-            return jsonify({
-                'status': 'success',
-                'original_filename': filename,
-                'output_filename': output_filename,
-                'file_size': file_size,
-                'encrypted_size': len(encrypted_data),
-                'message_length': len(message),
-                'original_size': original_size,
-                'compressed_size': compressed_size,
-                'compression_ratio': compression_ratio,
-                'auto_generated': auto_generate,
-                'auto_generated_password': password if auto_generate else None,
-                'download_url': f"/api/download/{output_filename}",
-                'media_type': 'audio',
-                'encryption_method': 'AES-256',
-                'hiding_technique': 'Audio Sample Steganography'
-            })
+        if inline:
+            # Decode straight from the (in-memory or spooled) upload, nothing touches uploads/ or output/
+            data_to_hide, stats = payload.prepare_payload(message, password, use_dictionary)
+            output_filename = stego_filename(filename, carrier)
+            stego_bytes = carrier.embed(file.stream, data_to_hide)
+            response = send_file(io.BytesIO(stego_bytes), mimetype=carrier.output_mime_type,
+                                 as_attachment=True, download_name=output_filename)
+            response.headers['X-Stego-Output-Filename'] = output_filename
+            response.headers['X-Stego-Media-Type'] = carrier.name
+            response.headers['X-Stego-Message-Length'] = str(stats['message_length'])
+            response.headers['X-Stego-Original-Size'] = str(stats['original_size'])
+            response.headers['X-Stego-Encrypted-Size'] = str(stats['encrypted_size'])
+            response.headers['X-Stego-Compressed-Size'] = str(stats['compressed_size'])
+            response.headers['X-Stego-Compression-Ratio'] = f"{stats['compression_ratio']:.2f}"
+            if auto_generate:
+                response.headers['X-Stego-Auto-Generated-Password'] = password
+            return response
         
-        else:
-            return jsonify({'error': 'Unsupported media type'}), 400
+        try:
+            return jsonify(hide_in_carrier(carrier, orig_file_path, filename, message, password,
+                                           auto_generate=auto_generate, use_dictionary=use_dictionary, ttl=ttl))
+        finally:
+            remove_upload(orig_file_path)
     
     except Exception as e:
-        print(f"Error in encryption process: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in encryption process: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/decrypt', methods=['POST'])
 def decrypt():
     """Extract and decrypt a hidden message from a media file"""
     try:
-        # Check if the post request has the file part
-        if 'file' not in request.files:
+        # Check if the post request has the file part (or names a finalized chunked upload)
+        try:
+            file = request_upload()
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        if file is None:
             return jsonify({'status': 'error', 'message': 'No file part'}), 400
         
-        file = request.files['file']
         if file.filename == '':
             return jsonify({'status': 'error', 'message': 'No selected file'}), 400
         
         # Password is optional now - it will be extracted from the file if not provided
         password = request.form.get('password', '')
         media_type = request.form.get('media_type', 'image')
+        try:
+            carrier = resolve_carrier(media_type, file)
+        except KeyError:
+            return jsonify({'status': 'error', 'message': 'Unsupported media type'}), 400
+        
+        if async_requested():
+            return submit_upload_job('decrypt', carrier, file, decrypt_job, password)
+        
+        try:
+            admit_request(carrier, file)
+        except admission.Saturated as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 429, {'Retry-After': str(e.retry_after)}
         
-        # Save the uploaded file
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        # Extract data based on media type
-        if media_type == 'image':
-            # Extract data from image
-            if hasattr(utils, 'extract_data_from_image'):
-                extracted_data = utils.extract_data_from_image(file_path)
-            else:
-                return jsonify({'status': 'error', 'message': 'Image steganography not supported in this build'}), 400
-            
-        elif media_type == 'audio':
-            # Convert to WAV if needed
-            file_extension = Path(filename).suffix.lower()
-            if file_extension != '.wav':
-                print(f"Converting audio to WAV for extraction: {filename}")
-                if hasattr(utils, 'convert_audio_to_wav'):
-                    wav_path = utils.convert_audio_to_wav(file_path)
-                    file_path = wav_path
-                else:
-                    return jsonify({'status': 'error', 'message': 'Audio conversion not supported in this build'}), 400
-            
-            # Extract data from audio
-            if hasattr(utils, 'extract_data_from_audio'):
-                extracted_data = utils.extract_data_from_audio(file_path)
-            else:
-                return jsonify({'status': 'error', 'message': 'Audio steganography not supported in this build'}), 400
+        
+        if inline_requested():
+            # Extract straight from the (in-memory or spooled) upload stream
+            extracted_data = carrier.extract(file.stream)
+        else:
+            # Save the uploaded file
+            file_path = upload_path_for(filename)
+            save_upload(file, file_path)
             
+            # Extract data with the carrier (converts non-WAV audio as needed)
+            try:
+                extracted_data = carrier.extract(file_path)
+            finally:
+                remove_upload(file_path)
+        
+        body, status_code = payload.decrypt_extracted_data(extracted_data, password, filename, carrier)
+        return jsonify(body), status_code
+    
+    except Exception as e:
+        logger.exception("Error in decryption process: %s", e)
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/encrypt-batch', methods=['POST'])
+def encrypt_batch():
+    """Hide one message in many media files, compressing and encrypting it only once"""
+    try:
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        if len(files) > app.config['BATCH_MAX_FILES']:
+            return jsonify({'error': f"Too many files (at most {app.config['BATCH_MAX_FILES']} per batch)"}), 400
+        
+        message = request.form.get('message', '')
+        if not message:
+            return jsonify({'error': 'No message provided'}), 400
+        
+        auto_generate = request.form.get('auto_generate', 'false').lower() == 'true'
+        if auto_generate:
+            password = utils.generate_strong_password(16)
         else:
-            return jsonify({'status': 'error', 'message': 'Unsupported media type'}), 400
+            password = request.form.get('password', '')
+            if not password:
+                return jsonify({'error': 'No password provided and auto-generate not enabled'}), 400
         
-        # Debug info
-        print(f"DEBUG: Extracted data length: {len(extracted_data)} bytes")
-        if len(extracted_data) > 0:
-            print(f"DEBUG: First few bytes: {' '.join([f'{b:02x}' for b in extracted_data[:16]])}")
-        
-        # Look for embedded password (marker byte 0x01 indicates password follows)
-        embedded_password = None
-        password_found = False
-        encrypted_data = extracted_data
-        
-        # Search for the marker byte
-        for i in range(len(extracted_data) - 1):
-            if extracted_data[i] == 0x01:  # Found marker
-                encrypted_data = extracted_data[:i]
-                try:
-                    embedded_password = extracted_data[i+1:].decode('utf-8')
-                    password_found = True
-                    print(f"Found embedded password: {embedded_password}")
-                    print(f"DEBUG: Encrypted data length: {len(encrypted_data)} bytes")
-                    break
-                except UnicodeDecodeError:
-                    print("Failed to decode embedded password - possible corruption")
-        
-        # Always use embedded password if available
-        if password_found:
-            password = embedded_password
-            print(f"Using embedded password from file: {password}")
-        # Only use provided password if no embedded password was found
-        elif not password:
-            return jsonify({
-                'status': 'error', 
-                'message': 'No password provided or found in the file',
-                'filename': filename
-            }), 400
+        media_type = request.form.get('media_type', 'image')
+        try:
+            batch_carriers = [resolve_carrier(media_type, file) for file in files]
+        except KeyError:
+            return jsonify({'error': 'Unsupported media type'}), 400
         
-        # Check if we have any encrypted data
-        if len(encrypted_data) < 1:  # Just check that we have some data
-            print(f"DEBUG: No encrypted data found: {len(encrypted_data)} bytes")
-            return jsonify({
-                'status': 'error',
-                'filename': filename,
-                'message': "No valid encrypted data found. The file may not contain a hidden message.",
-                'message_length': 0,
-                'password_found': password_found,
-                'used_password': password if password_found else None
-            })
+        use_dictionary = request.form.get('use_dictionary', 'false').lower() == 'true'
         
-        # Try simple XOR decryption first for legacy/small messages
+        # zip streams the stego files back; urls keeps them in the output folder for download
+        output_mode = request.args.get('output', 'zip')
+        if output_mode not in ('zip', 'urls'):
+            return jsonify({'error': "output must be 'zip' or 'urls'"}), 400
         try:
-            print(f"DEBUG: Trying XOR decryption with password: {password[:2]}{'*' * (len(password) - 4)}{password[-2:] if len(password) > 2 else ''}")
-            # Simple XOR encryption/decryption
-            if isinstance(password, str):
-                password_bytes = password.encode('utf-8')
-            else:
-                password_bytes = password
-                
-            key = hashlib.sha256(password_bytes).digest()
-            decrypted = []
-            for i, char in enumerate(encrypted_data):
-                key_char = key[i % len(key)]
-                decrypted_char = char ^ key_char
-                decrypted.append(decrypted_char)
+            ttl = requested_ttl()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Compress and encrypt once for the whole batch
+        started = time.perf_counter()
+        data_to_hide, stats = payload.prepare_payload(message, password, use_dictionary)
+        encrypt_seconds = round(time.perf_counter() - started, 4)
+        
+        store = get_output_store()
+        output_folder = store.folder if output_mode == 'urls' else tempfile.mkdtemp(prefix='stego_batch_')
+        batch_id = uuid.uuid4().hex
+        manager = get_job_manager()
+        futures = {}
+        used_names = set()
+        for index, (file, carrier) in enumerate(zip(files, batch_carriers)):
+            filename = secure_filename(file.filename)
+            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{batch_id}_{index}_{filename}")
+            save_upload(file, upload_path)
             
-            decrypted_bytes = bytes(decrypted)
+            output_filename = stego_filename(filename, carrier)
+            if output_mode == 'urls':
+                # Files kept for download get content-addressed names, like /api/encrypt
+                output_filename = output_store.content_name(output_filename,
+                                                            output_store.content_digest(data_to_hide, upload_path))
+            elif output_filename in used_names:
+                output_filename = f"{Path(output_filename).stem}_{index}{carrier.output_extension}"
+            used_names.add(output_filename)
             
-            # Try to convert to string
-            try:
-                decrypted_message = decrypted_bytes.decode('utf-8')
-                # If it decodes as valid UTF-8, it's likely the correct message
-                print(f"DEBUG: Successfully decoded message using XOR: {decrypted_message[:20]}...")
-                
-                return jsonify({
-                    'status': 'success',
-                    'filename': filename,
-                    'message': decrypted_message,
-                    'message_length': len(decrypted_message),
-                    'password_found': password_found,
-                    'used_password': password if password_found else None
-                })
-            except UnicodeDecodeError:
-                # Not valid UTF-8, try AES decryption next
-                print("DEBUG: XOR result not valid UTF-8, trying AES decryption")
-                pass
-                
-            # Fall through to AES if the XOR result isn't valid UTF-8
-        except Exception as e:
-            print(f"DEBUG: XOR decryption failed: {str(e)}")
+            future = manager.run(carrier.name, embed_batch_item, upload_path,
+                                 os.path.join(output_folder, output_filename), carrier.name, data_to_hide)
+            futures[future] = {'index': index, 'original_filename': filename,
+                               'output_filename': output_filename, 'media_type': carrier.name}
         
-        # Try AES decryption if XOR didn't work
-        try:
-            # Only try AES if we have enough data
-            if len(encrypted_data) >= 33:  # Need at least salt(16) + IV(16) + 1 byte
-                print("DEBUG: Trying AES decryption")
-                decrypted_message = utils.decrypt_message(encrypted_data, password)
-                
-                # Convert to string if it's bytes
-                if isinstance(decrypted_message, bytes):
-                    try:
-                        message_str = decrypted_message.decode('utf-8')
-                    except UnicodeDecodeError:
-                        message_str = f"Binary data (could not decode as UTF-8): {decrypted_message.hex()[:50]}..."
-                else:
-                    message_str = str(decrypted_message)
-                
-                # Check if the decrypted message contains an error indication
-                has_error = isinstance(message_str, str) and "error" in message_str.lower()
-                
-                return jsonify({
-                    'status': 'warning' if has_error else 'success',
-                    'filename': filename,
-                    'message': message_str,
-                    'message_length': len(message_str),
-                    'password_found': password_found,
-                    'used_password': password if password_found else None,
-                    'encryption_method': 'AES-256',
-                    'hiding_technique': 'LSB Image Steganography' if media_type == 'image' else 'Audio Sample Steganography'
-                })
-            else:
-                # Not enough data for AES, and XOR didn't work
-                return jsonify({
-                    'status': 'error',
-                    'filename': filename,
-                    'message': "Not enough data for AES decryption and XOR decryption failed.",
-                    'message_length': 0,
-                    'password_found': password_found,
-                    'used_password': password if password_found else None
-                })
-        except Exception as e:
-            print(f"ERROR: AES Decryption failed: {str(e)}")
+        summary = {
+            'count': len(files),
+            **stats,
+            'encrypt_seconds': encrypt_seconds,
+            'auto_generated': auto_generate,
+            'auto_generated_password': password if auto_generate else None
+        }
+        
+        if output_mode == 'urls':
+            items = [collect_batch_item(future, item, started) for future, item in futures.items()]
+            for item in items:
+                if item['status'] == 'success':
+                    item['download_url'] = f"/api/download/{item['output_filename']}"
+                    item['expires_at'] = store.add(item['output_filename'], ttl)
             return jsonify({
-                'status': 'error',
-                'filename': filename,
-                'message': f"Decryption error: {str(e)}",
-                'message_length': 0,
-                'password_found': password_found,
-                'used_password': password if password_found else None
+                'status': 'success',
+                **summary,
+                'failed': sum(item['status'] != 'success' for item in items),
+                'total_seconds': round(time.perf_counter() - started, 4),
+                'items': items
             })
+        
+        def generate():
+            # Members are added in completion order; manifest.json with the timings comes last
+            stream = ZipStream()
+            items = []
+            try:
+                with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+                    for future in as_completed(futures):
+                        item = collect_batch_item(future, futures[future], started)
+                        items.append(item)
+                        if item['status'] == 'success':
+                            archive.write(os.path.join(output_folder, item['output_filename']), item['output_filename'])
+                            yield stream.drain()
+                    items.sort(key=lambda item: item['index'])
+                    archive.writestr('manifest.json', json.dumps({
+                        **summary,
+                        'failed': sum(item['status'] != 'success' for item in items),
+                        'total_seconds': round(time.perf_counter() - started, 4),
+                        'items': items
+                    }, indent=2))
+                yield stream.drain()
+            finally:
+                shutil.rmtree(output_folder, ignore_errors=True)
+        
+        response = Response(generate(), mimetype='application/zip')
+        response.headers['Content-Disposition'] = 'attachment; filename=stego_batch.zip'
+        response.headers['X-Stego-Batch-Count'] = str(len(files))
+        response.headers['X-Stego-Encrypt-Seconds'] = str(encrypt_seconds)
+        if auto_generate:
+            response.headers['X-Stego-Auto-Generated-Password'] = password
+        return response
     
     except Exception as e:
-        print(f"Error in decryption process: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in batch encryption process: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/decrypt-batch', methods=['POST'])
+def decrypt_batch():
+    """Extract and decrypt many media files in parallel, streaming one JSON line per file as it finishes"""
+    try:
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({'status': 'error', 'message': 'No files provided'}), 400
+        
+        # Password is optional, as for /api/decrypt; it is used for files without an embedded password
+        password = request.form.get('password', '')
+        media_type = request.form.get('media_type', 'auto')
+        if media_type != 'auto' and media_type not in carriers.available_carriers():
+            return jsonify({'status': 'error', 'message': 'Unsupported media type'}), 400
+        
+        started = time.perf_counter()
+        try:
+            saved = save_batch_uploads(files, uuid.uuid4().hex)
+        except (ValueError, zipfile.BadZipFile) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        # Header probes run here; only files that look like media reach the worker pools
+        manager = get_job_manager()
+        skipped = []
+        futures = {}
+        for index, (filename, path) in enumerate(saved):
+            item = {'type': 'item', 'index': index, 'filename': filename}
+            carrier, reason = probe_batch_file(path, filename, media_type)
+            if carrier is None:
+                os.remove(path)
+                skipped.append({**item, 'status': 'skipped', 'message': reason})
+                continue
+            item['media_type'] = carrier.name
+            futures[manager.run(carrier.name, decrypt_batch_item, path, filename, carrier.name, password)] = item
+        
+        def generate():
+            counts = {}
+            for item in skipped:
+                counts['skipped'] = counts.get('skipped', 0) + 1
+                yield json.dumps(item) + '\n'
+            for future in as_completed(futures):
+                item = collect_batch_item(future, futures[future], started)
+                counts[item['status']] = counts.get(item['status'], 0) + 1
+                yield json.dumps(item) + '\n'
+            yield json.dumps({
+                'type': 'summary',
+                'count': len(saved),
+                'statuses': counts,
+                'total_seconds': round(time.perf_counter() - started, 4)
+            }) + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Send each line as soon as it is ready
+        })
+    
+    except Exception as e:
+        logger.exception("Error in batch decryption process: %s", e)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
+    if not filename:
+        return jsonify({'status': 'error', 'message': 'No filename provided'}), 400
+    try:
+        status = get_upload_store().create(filename, data.get('size'), data.get('sha256'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    status['upload_url'] = f"/api/uploads/{status['upload_id']}"
+    status['chunk_size'] = app.config['UPLOAD_CHUNK_SIZE']
+    response = jsonify(status)
+    response.headers['Location'] = status['upload_url']
+    return response, 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Return the byte ranges received so far, so a client can resume"""
+    try:
+        return jsonify(get_upload_store().status(upload_id))
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Unknown upload'}), 404
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Store one chunk: the raw request body, written at ?offset=N and checked against X-Chunk-SHA256"""
+    offset = request.args.get('offset', type=int)
+    checksum = request.headers.get('X-Chunk-SHA256')
+    if offset is None or not checksum or not request.content_length:
+        return jsonify({'status': 'error',
+                        'message': 'Chunks need an offset, a Content-Length and an X-Chunk-SHA256 header'}), 400
+    try:
+        # Read straight from the request stream, so the chunk is never held in memory whole
+        return jsonify(get_upload_store().write_chunk(upload_id, offset, request.stream, request.content_length, checksum))
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Unknown upload'}), 404
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Check a chunked upload is complete so it can be passed to /api/encrypt or /api/decrypt as upload_id"""
+    try:
+        return jsonify(get_upload_store().finalize(upload_id))
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Unknown upload'}), 404
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def discard_upload(upload_id):
+    """Abandon a chunked upload"""
+    try:
+        get_upload_store().discard(upload_id)
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Unknown upload'}), 404
+    return jsonify({'status': 'success', 'upload_id': upload_id})
+
 @app.route('/api/download/<filename>', methods=['GET'])
 def download_file(filename):
-    """Download a file from the output folder"""
-    return send_from_directory(app.config['OUTPUT_FOLDER'], filename, as_attachment=True)
+    """Download a file from the output store
+
+    The ETag is the SHA-256 of the file, so If-None-Match revalidation and
+    If-Range/Range resumption work across nodes and restarts.
+    """
+    if secure_filename(filename) != filename:
+        return jsonify({'status': 'error', 'message': 'File not found'}), 404
+    store = get_output_store()
+    # Downloads keep a file from being the next one evicted over the quota
+    store.touch(filename)
+    sha256 = store.sha256(filename)
+    
+    if store.backend.local and not app.config['DOWNLOAD_OFFLOAD']:
+        # Werkzeug handles the conditional and range headers for files on disk
+        return send_from_directory(app.config['OUTPUT_FOLDER'], filename, as_attachment=True, etag=sha256 or True)
+    
+    if sha256 and request.if_none_match.contains_weak(sha256):
+        response = Response(status=304)
+        response.set_etag(sha256)
+        return response
+    
+    if store.backend.local:
+        return offload_download(store.backend.local_path(filename), filename, sha256)
+    return stream_download(store.backend, filename, sha256)
+
+def download_headers(response, filename, sha256):
+    response.headers['Content-Disposition'] = f"attachment; filename={filename}"
+    response.headers['Accept-Ranges'] = 'bytes'
+    if sha256:
+        response.set_etag(sha256)
+    return response
+
+def offload_download(path, filename, sha256):
+    """Let the web server in front of the app send a local file (DOWNLOAD_OFFLOAD)"""
+    if not os.path.isfile(path):
+        return jsonify({'status': 'error', 'message': 'File not found'}), 404
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    if app.config['DOWNLOAD_OFFLOAD'] == 'x-accel-redirect':
+        response.headers['X-Accel-Redirect'] = f"{app.config['DOWNLOAD_ACCEL_PREFIX']}{filename}"
+    else:
+        response.headers['X-Sendfile'] = os.path.abspath(path)
+    return download_headers(response, filename, sha256)
+
+def stream_download(backend, filename, sha256):
+    """Stream a file (or the single byte range asked for) from a remote backend in chunks"""
+    try:
+        size = backend.size(filename)
+    except FileNotFoundError:
+        return jsonify({'status': 'error', 'message': 'File not found'}), 404
+    
+    start, end, status = 0, size, 200
+    byte_range = request.range
+    # If-Range: resume only if the client's partial copy is of this exact file
+    if_range_ok = 'If-Range' not in request.headers or (sha256 is not None and request.if_range.etag == sha256)
+    if byte_range and if_range_ok and len(byte_range.ranges) == 1:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+        start, end = bounds
+        status = 206
+    
+    response = Response(backend.iter_chunks(filename, app.config['DOWNLOAD_CHUNK_SIZE'], start, end), status=status,
+                        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.headers['Content-Length'] = str(end - start)
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+    return download_headers(response, filename, sha256)
+
+@app.route('/api/admission', methods=['GET'])
+def admission_status():
+    """Return the requests running and waiting per media type in this server process"""
+    return jsonify(get_admission_controller().snapshot())
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-stage latency histograms and request counters of this process, in the Prometheus text format"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/traces', methods=['GET'])
+def slowest_traces():
+    """The slowest encrypt, decrypt and QR requests of this process with their stage timings"""
+    return jsonify({'slowest': get_slow_log().entries()})
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Reports of profiled requests, newest first (needs the admin token)"""
+    if not profile_token_valid(profile_token()):
+        return jsonify({'status': 'error', 'message': 'Invalid profile token'}), 403
+    reports = profiling.list_profiles(app.config['PROFILE_DIR'])
+    for report in reports:
+        report['prof_url'] = f"/api/profiles/{report['name']}.prof"
+        report['report_url'] = f"/api/profiles/{report['name']}.json"
+    return jsonify({'profiles': reports})
+
+@app.route('/api/profiles/<filename>', methods=['GET'])
+def download_profile(filename):
+    """Download a .prof file (for pstats or snakeviz) or a memory report (needs the admin token)"""
+    if not profile_token_valid(profile_token()):
+        return jsonify({'status': 'error', 'message': 'Invalid profile token'}), 403
+    if filename != secure_filename(filename) or not filename.endswith(('.prof', '.json')):
+        return jsonify({'status': 'error', 'message': 'Not found'}), 404
+    return send_from_directory(os.path.abspath(app.config['PROFILE_DIR']), filename, as_attachment=True)
+
+@app.route('/api/storage', methods=['GET'])
+def storage_usage():
+    """Return the size of the output folder against its quota, and what the reaper has removed"""
+    return jsonify(get_output_store().usage())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return the status of a background job, with its result once finished"""
+    job = get_job_manager().store.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream the progress of a background job as Server-Sent Events until it finishes"""
+    store = get_job_manager().store
+    if store.get(job_id) is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    return Response(jobs.iter_events(store, job_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
 
 @app.route('/api/capabilities', methods=['GET'])
 def get_capabilities():
     """Return the capabilities of the API"""
+    registered = carriers.available_carriers()
+    extensions = set()
+    for name in registered:
+        extensions.update(carriers.carrier_info(name)['extensions'])
+    
     capabilities = {
-        'image_steganography': hasattr(utils, 'hide_data_in_image'),
-        'audio_steganography': hasattr(utils, 'hide_data_in_audio'),
-        'audio_conversion': hasattr(utils, 'convert_audio_to_wav'),
-        'image_conversion': hasattr(utils, 'convert_and_hide_in_image'),
-        'supports_jpg_jpeg': hasattr(utils, 'convert_and_hide_in_image'),
-        'supports_png': hasattr(utils, 'hide_data_in_image'),
-        'supports_bmp': hasattr(utils, 'hide_data_in_image'),
-        'supports_gif': hasattr(utils, 'convert_and_hide_in_image'),
+        'image_steganography': 'image' in registered,
+        'audio_steganography': 'audio' in registered,
+        'audio_conversion': 'audio' in registered,
+        'image_conversion': 'image' in registered,
+        'supports_jpg_jpeg': '.jpg' in extensions,
+        'supports_png': '.png' in extensions,
+        'supports_bmp': '.bmp' in extensions,
+        'supports_gif': '.gif' in extensions,
         'qr_code_steganography': hasattr(utils, 'hide_message_in_qr'),
-        'qr_code_generation': hasattr(utils, 'generate_qr_code')
+        'qr_code_generation': hasattr(utils, 'generate_qr_code'),
+        'carriers': {
+            name: {
+                'mime_types': list(carriers.carrier_info(name)['mime_types']),
+                'extensions': list(carriers.carrier_info(name)['extensions'])
+            }
+            for name in registered
+        }
     }
     return jsonify(capabilities)
 
 @app.route('/api/generate-qr', methods=['POST'])
 def generate_qr():
     """Generate a QR code from data"""
+    metrics.set_media_type('qr')
     try:
         # Get data from request
         data = request.form.get('data', '')
@@ -493,13 +1241,7 @@ def generate_qr():
         border = int(request.form.get('border', 4))
         
         # Map error correction string to qrcode constant
-        ec_mapping = {
-            'L': utils.qrcode.constants.ERROR_CORRECT_L,  # ~7% correction
-            'M': utils.qrcode.constants.ERROR_CORRECT_M,  # ~15% correction
-            'Q': utils.qrcode.constants.ERROR_CORRECT_Q,  # ~25% correction
-            'H': utils.qrcode.constants.ERROR_CORRECT_H   # ~30% correction
-        }
-        ec_level = ec_mapping.get(error_correction.upper(), utils.qrcode.constants.ERROR_CORRECT_H)
+        ec_level = utils.qr_error_correction(error_correction)
         
         # Generate output filename
         timestamp = utils.binascii.hexlify(os.urandom(4)).decode('ascii')
@@ -509,8 +1251,9 @@ def generate_qr():
         # Generate QR code
         utils.generate_qr_code(data, output_path, error_correction=ec_level, box_size=box_size, border=border)
         
-        # Get file size for response
+        # Get file size for response (before the store moves the file to its backend)
         file_size = os.path.getsize(output_path)
+        get_output_store().add(output_filename)
         
         return jsonify({
             'status': 'success',
@@ -520,13 +1263,13 @@ def generate_qr():
         })
         
     except Exception as e:
-        print(f"Error in QR code generation: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in QR code generation: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/encrypt-qr', methods=['POST'])
 def encrypt_qr():
     """Encrypt a message and generate a QR code containing it"""
+    metrics.set_media_type('qr')
     try:
         # Get message from request
         message = request.form.get('message', '')
@@ -539,7 +1282,6 @@ def encrypt_qr():
         # Auto-generate password or use provided one
         if auto_generate:
             password = utils.generate_strong_password(16)
-            print(f"Auto-generated password: {password}")
         else:
             password = request.form.get('password', '')
             if not password:
@@ -550,6 +1292,9 @@ def encrypt_qr():
         if style not in ['standard', 'fancy', 'embedded']:
             return jsonify({'error': 'Invalid style parameter. Choose from: standard, fancy, embedded'}), 400
         
+        # Optionally compress with the shipped preset dictionary to need a smaller QR version
+        use_dictionary = request.form.get('use_dictionary', 'false').lower() == 'true'
+        
         # Get original message size
         original_size = len(message.encode('utf-8'))
         
@@ -559,8 +1304,13 @@ def encrypt_qr():
             bg_file = request.files['background']
             if bg_file.filename != '':
                 bg_filename = secure_filename(bg_file.filename)
-                background_image = os.path.join(app.config['UPLOAD_FOLDER'], bg_filename)
-                bg_file.save(background_image)
+                background_image = upload_path_for(bg_filename)
+                save_upload(bg_file, background_image)
+                
+                @after_this_request
+                def remove_background(response):
+                    remove_upload(background_image)
+                    return response
         
         # Generate output filename
         timestamp = utils.binascii.hexlify(os.urandom(4)).decode('ascii')
@@ -568,13 +1318,15 @@ def encrypt_qr():
         output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
         
         # Generate encrypted QR code
-        utils.hide_message_in_qr(message, password, output_path, background_image=background_image, style=style)
+        utils.hide_message_in_qr(message, password, output_path, background_image=background_image, style=style,
+                                 use_dictionary=use_dictionary)
         
-        # Get file size for response
+        # Get file size for response (before the store moves the file to its backend)
         file_size = os.path.getsize(output_path)
+        get_output_store().add(output_filename)
         
         # Calculate encrypted size (approximate)
-        encrypted_size = len(utils.encrypt_message(message.encode('utf-8'), password))
+        encrypted_size = len(utils.encrypt_message(message.encode('utf-8'), password, use_dictionary=use_dictionary))
         compression_ratio = (1 - encrypted_size / original_size) * 100 if original_size > 0 else 0
         
         return jsonify({
@@ -595,13 +1347,13 @@ def encrypt_qr():
         })
         
     except Exception as e:
-        print(f"Error in QR code encryption: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in QR code encryption: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/decrypt-qr', methods=['POST'])
 def decrypt_qr():
     """Extract and decrypt a message from a QR code"""
+    metrics.set_media_type('qr')
     try:
         # Check if the post request has the file part
         if 'file' not in request.files:
@@ -616,11 +1368,14 @@ def decrypt_qr():
         
         # Save the uploaded file
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        file_path = upload_path_for(filename)
+        save_upload(file, file_path)
         
         # Extract and decrypt the message
-        message = utils.extract_message_from_qr(file_path, password)
+        try:
+            message = utils.extract_message_from_qr(file_path, password)
+        finally:
+            remove_upload(file_path)
         
         # Check if an error occurred
         if isinstance(message, str) and message.startswith("Error:"):
@@ -647,8 +1402,7 @@ def decrypt_qr():
         })
         
     except Exception as e:
-        print(f"Error in QR code decryption: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in QR code decryption: %s", e)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/')
@@ -667,4 +1421,5 @@ def sign_up():
     return render_template('sign-up.html')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=True) 
\ No newline at end of file
+    # The development server; set FLASK_DEBUG=1 for the debugger and reloader, never in production
+    create_app().run(host='0.0.0.0', port=8080) 
\ No newline at end of file
@@ -0,0 +1,393 @@
+import os
+import sys
+import json
+import math
+import time
+import wave
+import shutil
+import logging
+import subprocess
+import platform
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+import utils
+
+# Carrier and payload sizes per profile. quick runs in seconds (and in CI), full covers the
+# largest carriers we accept: 100 MP images and an hour of CD-quality audio
+PROFILES = {
+    'quick': {
+        'image_megapixels': (1,),
+        'audio_seconds': (1, 10),
+        'payload_bytes': (32, 1024, 64 * 1024),
+        'qr_payload_bytes': (16, 128),
+    },
+    'standard': {
+        'image_megapixels': (1, 12),
+        'audio_seconds': (1, 60),
+        'payload_bytes': (32, 1024, 64 * 1024, 1024 * 1024),
+        'qr_payload_bytes': (16, 128, 400),
+    },
+    'full': {
+        'image_megapixels': (1, 12, 50, 100),
+        'audio_seconds': (1, 60, 600, 3600),
+        'payload_bytes': (32, 1024, 64 * 1024, 1024 * 1024, 4 * 1024 * 1024),
+        'qr_payload_bytes': (16, 128, 400),
+    },
+}
+
+# Modules whose cold import time is tracked (python -X importtime in a fresh interpreter)
+IMPORT_MODULES = ('utils', 'carriers', 'api', 'bulk', 'client')
+
+DEFAULT_CORPUS_DIR = 'bench_corpus'
+DEFAULT_THRESHOLD = 0.25
+
+# Differences smaller than these are timer and allocator noise, never regressions
+MIN_SECONDS_DELTA = 0.002
+MIN_MEMORY_DELTA = 1024 * 1024
+
+PASSWORD = 'Bench-Pass-123'
+
+def payload(size, seed=0):
+    """Random payload bytes without 0x00, so extraction reads all of it before the terminator"""
+    return np.random.default_rng(seed).integers(1, 256, size, dtype=np.uint8).tobytes()
+
+def text_payload(size):
+    """Message-like text of size bytes, built from the preset dictionary's sample messages"""
+    with open(os.path.join(utils.ZDICT_DIR, 'corpus.txt'), 'rb') as f:
+        sample = f.read()
+    return (sample * (size // len(sample) + 1))[:size]
+
+def image_size(megapixels):
+    """Width and height of a 4:3 image with about megapixels million pixels"""
+    height = round(math.sqrt(megapixels * 1_000_000 * 3 / 4))
+    return round(height * 4 / 3), height
+
+def make_image(path, megapixels, seed=0):
+    """Write a photo-like PNG (smooth gradients plus sensor noise), built in strips to bound memory"""
+    width, height = image_size(megapixels)
+    rng = np.random.default_rng(seed)
+    img = Image.new('RGB', (width, height))
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    strip = 256
+    for top in range(0, height, strip):
+        rows = min(strip, height - top)
+        y = np.linspace(top, top + rows, rows, dtype=np.float32)[:, None] / height * 255
+        pixels = np.empty((rows, width, 3), dtype=np.float32)
+        pixels[..., 0] = x
+        pixels[..., 1] = y
+        pixels[..., 2] = (x + y) / 2
+        pixels += rng.normal(0, 6, pixels.shape).astype(np.float32)
+        img.paste(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)), (0, top))
+    img.save(path, format='PNG', compress_level=1)
+    return path
+
+def make_wav(path, seconds, seed=0, framerate=44100):
+    """Write a 16-bit stereo WAV of tones plus noise, one second at a time"""
+    rng = np.random.default_rng(seed)
+    with wave.open(path, 'wb') as audio_file:
+        audio_file.setnchannels(2)
+        audio_file.setsampwidth(2)
+        audio_file.setframerate(framerate)
+        for second in range(seconds):
+            t = np.arange(framerate, dtype=np.float32) / framerate + second
+            signal = 8000 * np.sin(2 * np.pi * 440 * t) + 3000 * np.sin(2 * np.pi * 1234 * t)
+            samples = np.stack([signal, signal * 0.8], axis=1) + rng.normal(0, 300, (framerate, 2))
+            audio_file.writeframes(np.clip(samples, -32768, 32767).astype('<i2').tobytes())
+    return path
+
+def corpus_files(profile, corpus_dir):
+    """Generate the carriers of a profile in corpus_dir (reusing existing ones); return {name: path}"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    settings = PROFILES[profile]
+    files = {}
+    for megapixels in settings['image_megapixels']:
+        path = os.path.join(corpus_dir, f"image_{megapixels}mp.png")
+        if not os.path.exists(path):
+            print(f"Generating {path}")
+            make_image(path, megapixels)
+        files[f"{megapixels}mp"] = path
+    for seconds in settings['audio_seconds']:
+        path = os.path.join(corpus_dir, f"audio_{seconds}s.wav")
+        if not os.path.exists(path):
+            print(f"Generating {path}")
+            make_wav(path, seconds)
+        files[f"{seconds}s"] = path
+    return files
+
+class Case:
+    """One measured operation: run() is timed, setup() (untimed) runs once before it"""
+
+    def __init__(self, name, run, carrier_bytes=0, payload_bytes=0, setup=None):
+        self.name = name
+        self.run = run
+        self.carrier_bytes = carrier_bytes
+        self.payload_bytes = payload_bytes
+        self.setup = setup
+
+def image_cases(label, path, payloads, work_dir):
+    width, height = Image.open(path).size
+    capacity = width * height * 3 // 8 - 1
+    output = os.path.join(work_dir, f"stego_{label}.png")
+    cases = []
+    for size in payloads:
+        if size > capacity:
+            continue
+        data = payload(size)
+        cases.append(Case(f"image_hide/{label}/{size}B", lambda data=data: utils.hide_data_in_image(path, output, data),
+                          width * height * 3, size))
+        cases.append(Case(f"image_extract/{label}/{size}B", lambda: utils.extract_data_from_image(output),
+                          width * height * 3, size,
+                          setup=lambda data=data: utils.hide_data_in_image(path, output, data)))
+    return cases
+
+def audio_cases(label, path, payloads, work_dir):
+    with wave.open(path, 'rb') as audio_file:
+        pcm_bytes = audio_file.getnframes() * audio_file.getnchannels() * audio_file.getsampwidth()
+    capacity = pcm_bytes // 8 - 1
+    output = os.path.join(work_dir, f"stego_{label}.wav")
+    cases = []
+    for size in payloads:
+        if size > capacity:
+            continue
+        data = payload(size)
+        cases.append(Case(f"audio_hide/{label}/{size}B", lambda data=data: utils.hide_data_in_audio(path, output, data),
+                          pcm_bytes, size))
+        cases.append(Case(f"audio_extract/{label}/{size}B", lambda: utils.extract_data_from_audio(output),
+                          pcm_bytes, size,
+                          setup=lambda data=data: utils.hide_data_in_audio(path, output, data)))
+    return cases
+
+def crypto_cases(payloads):
+    cases = []
+    for size in payloads:
+        message = text_payload(size)
+        cases.append(Case(f"compress/{size}B", lambda message=message: utils.compress_data(message), 0, size))
+        cases.append(Case(f"encrypt/{size}B", lambda message=message: utils.encrypt_message(message, PASSWORD), 0, size))
+    return cases
+
+def qr_cases(payloads, work_dir):
+    cases = []
+    for size in payloads:
+        message = text_payload(size).decode('utf-8', errors='ignore')
+        output = os.path.join(work_dir, f"qr_{size}.png")
+        cases.append(Case(f"qr_hide/{size}B", lambda message=message, output=output:
+                          utils.hide_message_in_qr(message, PASSWORD, output), 0, size))
+        cases.append(Case(f"qr_extract/{size}B", lambda output=output: utils.extract_message_from_qr(output), 0, size,
+                          setup=lambda message=message, output=output: utils.hide_message_in_qr(message, PASSWORD, output)))
+    return cases
+
+def build_cases(profile, corpus_dir, work_dir):
+    settings = PROFILES[profile]
+    files = corpus_files(profile, corpus_dir)
+    cases = []
+    for megapixels in settings['image_megapixels']:
+        cases += image_cases(f"{megapixels}mp", files[f"{megapixels}mp"], settings['payload_bytes'], work_dir)
+    for seconds in settings['audio_seconds']:
+        cases += audio_cases(f"{seconds}s", files[f"{seconds}s"], settings['payload_bytes'], work_dir)
+    cases += crypto_cases(settings['payload_bytes'])
+    cases += qr_cases(settings['qr_payload_bytes'], work_dir)
+    return cases
+
+def measure(case, repeat):
+    """Time case.run repeat times, then run it once more under tracemalloc for its peak memory"""
+    if case.setup is not None:
+        case.setup()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        case.run()
+        timings.append(time.perf_counter() - started)
+
+    # A separate run, since tracing allocations slows the code down
+    tracemalloc.start()
+    try:
+        case.run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    seconds = min(timings)
+    return {
+        'seconds': round(seconds, 6),
+        'median_seconds': round(statistics.median(timings), 6),
+        'carrier_bytes': case.carrier_bytes,
+        'payload_bytes': case.payload_bytes,
+        'carrier_mb_per_s': round(case.carrier_bytes / seconds / 1e6, 3) if case.carrier_bytes else None,
+        'payload_bits_per_s': round(case.payload_bytes * 8 / seconds) if case.payload_bytes else None,
+        'peak_memory_bytes': peak
+    }
+
+def parse_importtime(output, module):
+    """Return (cumulative seconds, {direct import: ms}) of a top-level import in -X importtime output"""
+    children = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                return int(cumulative) / 1e6, children
+            children = {}
+        elif depth == 1:
+            children[name] = round(int(cumulative) / 1000, 2)
+    raise ValueError(f"{module} not found in the -X importtime output")
+
+def measure_import(module, repeat):
+    """Cold import time of module in repeat fresh interpreters, and the peak RSS of one"""
+    code = (f"import {module}\n"
+            "try:\n"
+            "    import resource\n"
+            "    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+            "except ImportError:\n"
+            "    print(0)\n")
+    timings, peak, children = [], 0, {}
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        seconds, children = parse_importtime(completed.stderr, module)
+        timings.append(seconds)
+        # ru_maxrss is in KiB, except on macOS
+        peak = int(completed.stdout.split()[-1]) * (1 if sys.platform == 'darwin' else 1024)
+    slowest = dict(sorted(children.items(), key=lambda item: item[1], reverse=True)[:5])
+    return {
+        'seconds': round(min(timings), 6),
+        'median_seconds': round(statistics.median(timings), 6),
+        'carrier_bytes': 0,
+        'payload_bytes': 0,
+        'carrier_mb_per_s': None,
+        'payload_bits_per_s': None,
+        'peak_memory_bytes': peak,
+        'slowest_imports_ms': slowest
+    }
+
+def run_benchmarks(profile='quick', corpus_dir=DEFAULT_CORPUS_DIR, repeat=3, only=None, cases=None,
+                   import_modules=IMPORT_MODULES):
+    """Run every case of a profile (or only those whose name contains only) and return the results document"""
+    work_dir = tempfile.mkdtemp(prefix='stego_bench_')
+    try:
+        if cases is None:
+            cases = build_cases(profile, corpus_dir, work_dir)
+        results = {}
+        for case in cases:
+            if only and only not in case.name:
+                continue
+            results[case.name] = measure(case, repeat)
+            print(format_result(case.name, results[case.name]))
+        for module in import_modules:
+            name = f"import/{module}"
+            if only and only not in name:
+                continue
+            results[name] = measure_import(module, repeat)
+            print(format_result(name, results[name]))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'meta': {
+            'profile': profile,
+            'repeat': repeat,
+            'created_at': time.time(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+def format_result(name, result):
+    line = f"{name:<36} {result['seconds'] * 1000:>10.2f} ms"
+    if result['carrier_mb_per_s'] is not None:
+        line += f" {result['carrier_mb_per_s']:>9.2f} MB/s"
+    else:
+        line += ' ' * 15
+    if result['payload_bits_per_s'] is not None:
+        line += f" {result['payload_bits_per_s'] / 1e6:>9.3f} Mbit/s"
+    return line + f" peak {result['peak_memory_bytes'] / 1024 / 1024:.1f} MiB"
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare two results documents case by case
+
+    Returns a list of (case, metric, baseline value, new value) for every case
+    that got slower or used more memory by more than threshold (a fraction).
+    Cases missing from either side are ignored.
+    """
+    regressions = []
+    for name, base in baseline['results'].items():
+        new = results['results'].get(name)
+        if new is None:
+            continue
+        if (new['seconds'] > base['seconds'] * (1 + threshold)
+                and new['seconds'] - base['seconds'] > MIN_SECONDS_DELTA):
+            regressions.append((name, 'seconds', base['seconds'], new['seconds']))
+        if (new['peak_memory_bytes'] > base['peak_memory_bytes'] * (1 + threshold)
+                and new['peak_memory_bytes'] - base['peak_memory_bytes'] > MIN_MEMORY_DELTA):
+            regressions.append((name, 'peak_memory_bytes', base['peak_memory_bytes'], new['peak_memory_bytes']))
+    return regressions
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def report_regressions(regressions, threshold):
+    """Print regressions and return the exit code: 0 if there are none, 1 otherwise"""
+    if not regressions:
+        print(f"No regressions beyond {threshold:.0%}")
+        return 0
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name}: {metric} {before} -> {after} ({after / before - 1:+.0%})")
+    return 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the carriers, compression, encryption and QR codes')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks and optionally compare them with a baseline')
+    run_parser.add_argument('--profile', choices=sorted(PROFILES), default='quick', help='Carrier and payload sizes')
+    run_parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='Where generated carriers are kept')
+    run_parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (the fastest is reported)')
+    run_parser.add_argument('--only', help='Only run cases whose name contains this, e.g. audio_hide')
+    run_parser.add_argument('--output', help='Write the results to this JSON file')
+    run_parser.add_argument('--baseline', help='Results JSON to compare against; exit 1 on regressions')
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Allowed slowdown or memory growth as a fraction (default: 0.25)')
+
+    corpus_parser = subparsers.add_parser('corpus', help='Only generate the synthetic carriers of a profile')
+    corpus_parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    corpus_parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two results files')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    # Only errors from the code under test, so the output stays a table
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.command == 'corpus':
+        for path in corpus_files(args.profile, args.corpus_dir).values():
+            print(path)
+        return 0
+    if args.command == 'compare':
+        return report_regressions(compare(load_results(args.results), load_results(args.baseline), args.threshold),
+                                  args.threshold)
+
+    results = run_benchmarks(args.profile, args.corpus_dir, args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        return report_regressions(compare(results, load_results(args.baseline), args.threshold), args.threshold)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import struct
+import numpy as np
+
+# Null byte written after the payload; extraction stops at the first byte-aligned one
+TERMINATOR = b'\x00'
+
+# Length header used by framed payloads: 32-bit big-endian byte count
+HEADER_FORMAT = '>I'
+HEADER_BITS = struct.calcsize(HEADER_FORMAT) * 8
+
+# Number of decoded bytes handled per chunk when scanning a carrier
+DEFAULT_CHUNK_BYTES = 64 * 1024
+
+# Number of carrier samples written between progress reports
+PROGRESS_CHUNK_SAMPLES = 1024 * 1024
+
+def bytes_to_bits(data):
+    """Unpack bytes into a uint8 array of bits, most significant bit first"""
+    return np.unpackbits(np.frombuffer(bytes(data), dtype=np.uint8))
+
+def bits_to_bytes(bits, pad=False):
+    """Pack an array of bits back into bytes
+
+    A trailing partial byte is dropped, or zero-padded when pad is True.
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    if not pad:
+        bits = bits[:len(bits) - len(bits) % 8]
+    return np.packbits(bits).tobytes()
+
+def capacity_bits(n_samples, bits_per_sample=1):
+    """Number of payload bits a carrier of n_samples can hold"""
+    return n_samples * bits_per_sample
+
+def as_carrier(buffer):
+    """Return a flat uint8 view of a carrier (numpy array, bytearray or bytes)
+
+    Arrays and bytearrays are viewed without copying, so writing into the
+    result modifies the original buffer. Immutable bytes give a read-only view.
+    """
+    if isinstance(buffer, np.ndarray):
+        if buffer.dtype != np.uint8:
+            raise ValueError(f"Carrier must be uint8, got {buffer.dtype}")
+        return buffer.reshape(-1)
+    return np.frombuffer(buffer, dtype=np.uint8)
+
+class BitWriter:
+    """Collect a payload as bits and write it into the least significant bits of a carrier"""
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def _append(self, bits):
+        self._parts.append(bits)
+        self._length += len(bits)
+
+    def write_bytes(self, data):
+        """Append whole bytes"""
+        self._append(bytes_to_bits(data))
+
+    def write_bits(self, value, k):
+        """Append the k lowest bits of an integer, most significant first"""
+        if value < 0 or value >= 1 << k:
+            raise ValueError(f"Value {value} does not fit in {k} bits")
+        shifts = np.arange(k - 1, -1, -1, dtype=np.uint64)
+        self._append(((np.uint64(value) >> shifts) & np.uint64(1)).astype(np.uint8))
+
+    def write_terminator(self):
+        """Append the null byte that marks the end of a terminated payload"""
+        self.write_bytes(TERMINATOR)
+
+    def write_header(self, length):
+        """Append the length header of a framed payload"""
+        self.write_bytes(struct.pack(HEADER_FORMAT, length))
+
+    def getbits(self):
+        """Return all written bits as a single uint8 array"""
+        if not self._parts:
+            return np.zeros(0, dtype=np.uint8)
+        if len(self._parts) > 1:
+            self._parts = [np.concatenate(self._parts)]
+        return self._parts[0]
+
+    def embed(self, carrier, bits_per_sample=1, progress=None):
+        """Write the collected bits into the k least significant bits of each carrier sample
+
+        The carrier is modified in place and must be writable. Returns the
+        number of samples that were changed. progress, if given, is called as
+        progress('embed', bits_written, total_bits) as the carrier is written.
+        """
+        samples = as_carrier(carrier)
+        k = bits_per_sample
+        bits = self.getbits()
+        if len(bits) > capacity_bits(len(samples), k):
+            raise ValueError(f"Need {len(bits)} bits, but carrier can only store {capacity_bits(len(samples), k)} bits")
+
+        if k == 1:
+            n_samples = len(bits)
+            values = bits
+        else:
+            n_samples = -(-len(bits) // k)
+            padded = np.zeros(n_samples * k, dtype=np.uint8)
+            padded[:len(bits)] = bits
+            weights = (1 << np.arange(k - 1, -1, -1)).astype(np.uint8)
+            values = (padded.reshape(-1, k) * weights).sum(axis=1).astype(np.uint8)
+
+        mask = np.uint8((0xFF << k) & 0xFF)
+        if progress is None:
+            samples[:n_samples] = (samples[:n_samples] & mask) | values
+            return n_samples
+
+        for start in range(0, n_samples, PROGRESS_CHUNK_SAMPLES):
+            stop = min(start + PROGRESS_CHUNK_SAMPLES, n_samples)
+            samples[start:stop] = (samples[start:stop] & mask) | values[start:stop]
+            progress('embed', min(stop * k, len(bits)), len(bits))
+        return n_samples
+
+class BitReader:
+    """Read a payload back from the least significant bits of a carrier"""
+
+    def __init__(self, carrier, bits_per_sample=1):
+        self.samples = as_carrier(carrier)
+        self.bits_per_sample = bits_per_sample
+        self.position = 0  # in bits
+
+    @property
+    def capacity(self):
+        """Total number of payload bits in the carrier"""
+        return capacity_bits(len(self.samples), self.bits_per_sample)
+
+    def _sample_bits(self, start, stop):
+        """Return the embedded bits of samples[start:stop]"""
+        k = self.bits_per_sample
+        values = self.samples[start:stop]
+        if k == 1:
+            return values & 1
+        shifts = np.arange(k - 1, -1, -1, dtype=np.uint8)
+        return ((values[:, None] >> shifts) & 1).reshape(-1)
+
+    def read_bits(self, n):
+        """Read the next n bits (fewer if the carrier runs out)"""
+        k = self.bits_per_sample
+        start = self.position
+        stop = min(start + n, self.capacity)
+        bits = self._sample_bits(start // k, -(-stop // k))
+        self.position = stop
+        offset = start % k
+        return bits[offset:offset + stop - start]
+
+    def read_bytes(self, n):
+        """Read the next n whole bytes"""
+        return bits_to_bytes(self.read_bits(n * 8))
+
+    def read_header(self):
+        """Read the length header of a framed payload"""
+        header = self.read_bytes(HEADER_BITS // 8)
+        if len(header) < HEADER_BITS // 8:
+            raise ValueError("Carrier is too small to hold a payload header")
+        return struct.unpack(HEADER_FORMAT, header)[0]
+
+    def read_framed(self):
+        """Read a payload written with BitWriter.write_header"""
+        length = self.read_header()
+        if length * 8 > self.capacity - self.position:
+            raise ValueError(f"Header claims {length} bytes, but the carrier only holds {(self.capacity - self.position) // 8}")
+        return self.read_bytes(length)
+
+    def iter_chunks(self, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """Yield the remaining payload as whole bytes, chunk_bytes at a time
+
+        Only as much of the carrier as each chunk needs is unpacked, so a short
+        payload at the start of a large carrier is read without touching the rest.
+        """
+        while self.capacity - self.position >= 8:
+            n_bytes = min(chunk_bytes, (self.capacity - self.position) // 8)
+            yield self.read_bytes(n_bytes)
+
+    def read_until_terminator(self, pad_partial=False, chunk_bytes=DEFAULT_CHUNK_BYTES, progress=None):
+        """Read bytes up to the first byte-aligned null terminator
+
+        Returns (data, found). Without a terminator the whole carrier is
+        returned; a trailing partial byte is dropped, or zero-padded when
+        pad_partial is True. progress, if given, is called as
+        progress('extract', bytes_scanned, total_bytes) after each chunk.
+        """
+        parts = []
+        # Start small and grow, since most payloads end near the start of the carrier
+        n_bytes = min(256, chunk_bytes)
+        while self.capacity - self.position >= 8:
+            chunk = self.read_bytes(min(n_bytes, (self.capacity - self.position) // 8))
+            index = chunk.find(TERMINATOR)
+            if index != -1:
+                parts.append(chunk[:index])
+                # Leave the reader just past the terminator
+                self.position -= (len(chunk) - index - 1) * 8
+                if progress is not None:
+                    progress('extract', self.position // 8, self.position // 8)
+                return b''.join(parts), True
+            if progress is not None:
+                progress('extract', self.position // 8, self.capacity // 8)
+            parts.append(chunk)
+            n_bytes = min(n_bytes * 2, chunk_bytes)
+
+        remaining = self.read_bits(self.capacity - self.position)
+        if pad_partial and len(remaining):
+            parts.append(bits_to_bytes(remaining, pad=True))
+        return b''.join(parts), False
+
+def framed(data):
+    """Return a BitWriter holding a length-prefixed payload"""
+    writer = BitWriter()
+    writer.write_header(len(data))
+    writer.write_bytes(data)
+    return writer
+
+def terminated(data):
+    """Return a BitWriter holding a null-terminated payload (the format all carriers use)"""
+    writer = BitWriter()
+    writer.write_bytes(data)
+    writer.write_terminator()
+    return writer
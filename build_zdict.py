@@ -0,0 +1,109 @@
+import os
+import re
+import sys
+import zlib
+import argparse
+from collections import Counter
+
+# Directory holding the corpus and the versioned dictionaries (zdict/v<N>.bin)
+ZDICT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zdict')
+DEFAULT_CORPUS = os.path.join(ZDICT_DIR, 'corpus.txt')
+
+def load_corpus(corpus_path):
+    """Load the sample messages (one per line) used to train the dictionary"""
+    with open(corpus_path, 'rb') as f:
+        return [line.rstrip(b'\r\n') for line in f if line.strip()]
+
+def build_dictionary(samples, size=4096, min_len=3, max_len=24):
+    """Build a preset zlib dictionary from the substrings shared between samples
+
+    Every substring is scored by how many samples contain it times its length,
+    the best non-overlapping ones are kept until the size budget is reached and
+    the most valuable strings are placed at the end of the dictionary, where
+    zlib can reference them with the shortest distances.
+    """
+    counts = Counter()
+    for sample in samples:
+        seen = set()
+        for n in range(min_len, max_len + 1):
+            for i in range(len(sample) - n + 1):
+                seen.add(sample[i:i + n])
+        counts.update(seen)
+
+    # Only strings that appear in more than one sample are worth shipping
+    candidates = sorted(
+        ((count - 1) * len(substring), substring)
+        for substring, count in counts.items() if count > 1
+    )
+    candidates.reverse()
+
+    chosen = []
+    total = 0
+    for score, substring in candidates:
+        if total >= size:
+            break
+        if any(substring in existing for existing in chosen):
+            continue
+        chosen.append(substring)
+        total += len(substring)
+
+    return b''.join(reversed(chosen))[-size:]
+
+def existing_versions():
+    """Return the dictionary versions already shipped in the zdict directory"""
+    versions = []
+    if os.path.isdir(ZDICT_DIR):
+        for name in os.listdir(ZDICT_DIR):
+            match = re.fullmatch(r'v(\d+)\.bin', name)
+            if match:
+                versions.append(int(match.group(1)))
+    return sorted(versions)
+
+def evaluate(samples, zdict):
+    """Return the total compressed size of the samples without and with the dictionary"""
+    plain_total = 0
+    dict_total = 0
+    for sample in samples:
+        plain_total += min(len(zlib.compress(sample, 9)), len(sample) + 1)
+        compressor = zlib.compressobj(level=9, zdict=zdict)
+        dict_total += min(len(compressor.compress(sample) + compressor.flush()), len(sample) + 1)
+    return plain_total, dict_total
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a versioned preset zlib dictionary for short messages')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='Corpus file with one sample message per line')
+    parser.add_argument('--size', type=int, default=4096, help='Dictionary size in bytes (max 32768)')
+    parser.add_argument('--version', type=int, help='Version number to write (defaults to the next free one)')
+    parser.add_argument('--force', action='store_true', help='Overwrite an existing version (breaks files written with it)')
+    args = parser.parse_args()
+
+    if not 0 < args.size <= 32768:
+        print("Error: --size must be between 1 and 32768 bytes")
+        return 1
+
+    samples = load_corpus(args.corpus)
+    if not samples:
+        print(f"Error: corpus {args.corpus} is empty")
+        return 1
+
+    versions = existing_versions()
+    version = args.version or (versions[-1] + 1 if versions else 1)
+    output_path = os.path.join(ZDICT_DIR, f"v{version}.bin")
+
+    # Shipped dictionaries are referenced by stego files, so never replace one silently
+    if os.path.exists(output_path) and not args.force:
+        print(f"Error: {output_path} already exists. Pick a new --version or pass --force.")
+        return 1
+
+    zdict = build_dictionary(samples, size=args.size)
+    os.makedirs(ZDICT_DIR, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(zdict)
+
+    plain_total, dict_total = evaluate(samples, zdict)
+    print(f"Wrote {output_path} ({len(zdict)} bytes, id 0x{zlib.adler32(zdict):08x})")
+    print(f"Corpus of {len(samples)} messages: {plain_total} bytes without dictionary, {dict_total} bytes with it")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+
+# Payloads are built and read by the same code as the API (payload.py), so files are interchangeable
+import logs
+import carriers
+import payload
+
+# Manifest columns (JSONL keys or CSV header):
+#   id            row id used for checkpointing (defaults to the 1-based row number)
+#   op            'encrypt' (default) or 'decrypt'
+#   input         carrier file to read
+#   output        stego file to write (encrypt), or text file for the message (decrypt, optional)
+#   message       message to hide, or message_file with the path of a UTF-8 text file
+#   password      literal password, or password_ref as env:NAME or file:PATH
+#   media_type    carrier name (detected from the input file if empty)
+#   use_dictionary  true to compress with the preset dictionary
+FIELDS = ('id', 'op', 'input', 'output', 'message', 'message_file', 'password', 'password_ref',
+          'media_type', 'use_dictionary')
+
+def load_manifest(path, manifest_format=None):
+    """Return the manifest rows as dicts, with empty values dropped and ids filled in"""
+    manifest_format = manifest_format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as f:
+        if manifest_format == 'csv':
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+
+    rows = []
+    for number, record in enumerate(records, start=1):
+        row = {key: value for key, value in record.items() if value not in (None, '')}
+        unknown = set(row) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Row {number}: unknown fields {', '.join(sorted(unknown))}")
+        row['id'] = str(row.get('id', number))
+        rows.append(row)
+    return rows
+
+def load_checkpoint(path):
+    """Return the ids of rows a previous run finished successfully"""
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write can leave a partial last line
+                    continue
+                if result.get('status') == 'success':
+                    done.add(result['id'])
+    return done
+
+def resolve_password(row):
+    """Return the row's password, following an env: or file: reference"""
+    if 'password' in row:
+        return row['password']
+    reference = row.get('password_ref', '')
+    kind, _, target = reference.partition(':')
+    if kind == 'env':
+        if target not in os.environ:
+            raise ValueError(f"Environment variable {target} is not set")
+        return os.environ[target]
+    if kind == 'file':
+        with open(target, encoding='utf-8') as f:
+            return f.read().strip()
+    raise ValueError("Row needs a password or a password_ref of the form env:NAME or file:PATH")
+
+def resolve_carrier(row):
+    """Return the carrier named by the row, or detected from its input file"""
+    media_type = row.get('media_type')
+    if media_type is None:
+        with open(row['input'], 'rb') as f:
+            header = f.read(16)
+        media_type = carriers.detect_carrier(header, filename=row['input'])
+        if media_type is None:
+            raise ValueError(f"Cannot detect the media type of {row['input']}")
+    return carriers.get_carrier(media_type)
+
+def encrypt_row(row):
+    if 'output' not in row:
+        raise ValueError("Encrypt rows need an output path")
+    if 'message_file' in row:
+        with open(row['message_file'], encoding='utf-8') as f:
+            message = f.read()
+    else:
+        message = row.get('message', '')
+    if not message:
+        raise ValueError("Row needs a message or message_file")
+
+    carrier = resolve_carrier(row)
+    use_dictionary = str(row.get('use_dictionary', 'false')).lower() == 'true'
+    data_to_hide, stats = payload.prepare_payload(message, resolve_password(row), use_dictionary)
+    os.makedirs(os.path.dirname(os.path.abspath(row['output'])), exist_ok=True)
+    output = carrier.embed(row['input'], data_to_hide, output=row['output'])
+    return {'output': output, 'encrypted_size': stats['encrypted_size']}
+
+def decrypt_row(row):
+    carrier = resolve_carrier(row)
+    try:
+        password = resolve_password(row)
+    except ValueError:
+        # The password is usually embedded in the file
+        password = ''
+    body, status_code = payload.decrypt_extracted_data(carrier.extract(row['input']), password,
+                                                       os.path.basename(row['input']), carrier)
+    # A wrong password comes back as a 'warning' whose message is the error text
+    if status_code >= 400 or body['status'] != 'success':
+        raise ValueError(body['message'])
+    if 'output' in row:
+        with open(row['output'], 'w', encoding='utf-8') as f:
+            f.write(body['message'])
+        return {'output': row['output'], 'message_length': body['message_length']}
+    return {'message': body['message'], 'message_length': body['message_length']}
+
+def process_row(row):
+    """Run one manifest row in a worker process and return its checkpoint record"""
+    started = time.perf_counter()
+    result = {'id': row['id'], 'op': row.get('op', 'encrypt'), 'input': row.get('input')}
+    try:
+        if result['op'] == 'encrypt':
+            result.update(encrypt_row(row))
+        elif result['op'] == 'decrypt':
+            result.update(decrypt_row(row))
+        else:
+            raise ValueError(f"Unknown op {result['op']}")
+        result['status'] = 'success'
+        result['input_bytes'] = os.path.getsize(row['input'])
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+def configure_worker_logging(level):
+    """Log to stderr from a worker; utils and carriers log DEBUG records for every file, shown only with --verbose"""
+    logs.configure_logging(level, json_output=False)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def print_stats(results, skipped, elapsed):
+    """Print throughput and per-row latency for a run"""
+    succeeded = [result for result in results if result['status'] == 'success']
+    total_bytes = sum(result['input_bytes'] for result in succeeded)
+    print(f"Processed {len(results)} rows in {elapsed:.2f}s: {len(succeeded)} succeeded, "
+          f"{len(results) - len(succeeded)} failed, {skipped} already done")
+    if results and elapsed > 0:
+        print(f"Throughput: {len(results) / elapsed:.1f} rows/s, {total_bytes / elapsed / 1024 / 1024:.2f} MB/s of input")
+    if succeeded:
+        seconds = [result['seconds'] for result in succeeded]
+        print(f"Row latency: mean {sum(seconds) / len(seconds):.3f}s, p50 {percentile(seconds, 0.5):.3f}s, "
+              f"p95 {percentile(seconds, 0.95):.3f}s, max {max(seconds):.3f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hide or extract messages for every row of a manifest, without the API server')
+    parser.add_argument('manifest', help='JSONL or CSV manifest (see the FIELDS comment in bulk.py)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='Manifest format (from the extension by default)')
+    parser.add_argument('--checkpoint', help='Results file used to resume (default: <manifest>.done.jsonl)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=4, help='Rows handed to a worker at a time')
+    parser.add_argument('--verbose', action='store_true', help='Show the debug log of the workers')
+    args = parser.parse_args(argv)
+
+    try:
+        rows = load_manifest(args.manifest, args.format)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    checkpoint_path = args.checkpoint or f"{args.manifest}.done.jsonl"
+    done = load_checkpoint(checkpoint_path)
+    pending = [row for row in rows if row['id'] not in done]
+    print(f"{len(rows)} rows in {args.manifest}, {len(rows) - len(pending)} already done, {len(pending)} to run "
+          f"on {args.workers} workers")
+
+    results = []
+    started = time.perf_counter()
+    interrupted = False
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            multiprocessing.Pool(args.workers, initializer=configure_worker_logging,
+                                 initargs=('DEBUG' if args.verbose else 'WARNING',)) as pool:
+        try:
+            for result in pool.imap_unordered(process_row, pending, chunksize=max(1, args.chunksize)):
+                # One line per finished row, flushed so an interrupted run can resume from here
+                checkpoint.write(json.dumps(result) + '\n')
+                checkpoint.flush()
+                results.append(result)
+                if result['status'] != 'success':
+                    print(f"Row {result['id']} failed: {result['error']}")
+        except KeyboardInterrupt:
+            interrupted = True
+            pool.terminate()
+            print("Interrupted; rerun the same command to resume")
+
+    print_stats(results, len(rows) - len(pending), time.perf_counter() - started)
+    if interrupted:
+        return 130
+    return 0 if all(result['status'] == 'success' for result in results) else 2
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import os
+import io
+import abc
+import wave
+import shutil
+import tempfile
+import importlib
+import numpy as np
+from PIL import Image
+
+import utils
+import metrics
+from bitstream import BitReader, terminated
+
+# Registered carriers by name, in registration order
+_registry = {}
+
+def is_path(source):
+    """True if a carrier source or output refers to a file on disk"""
+    return isinstance(source, (str, os.PathLike))
+
+def open_source(source):
+    """Return something PIL/wave can open: a path, or a file object for in-memory sources"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+def read_source(source):
+    """Return the raw bytes of a carrier source"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if is_path(source):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.read()
+
+def write_output(data, output):
+    """Write encoded carrier bytes to output (path or file object), or return them if output is None"""
+    if output is None:
+        return data
+    if is_path(output):
+        with open(output, 'wb') as f:
+            f.write(data)
+    else:
+        output.write(data)
+    return output
+
+class Carrier(abc.ABC):
+    """A media type that can hide a payload
+
+    Sources may be a file path, bytes, a binary file object or a NumPy buffer.
+    embed() writes to an output path or file object, or returns the encoded
+    carrier (bytes, or a new array for NumPy sources) when output is None.
+    Both embed() and extract() take an optional progress(stage, done, total)
+    callback that is passed down to the bitstream and utils functions.
+    """
+    name = None
+    mime_types = ()
+    extensions = ()
+    # (offset, signature) pairs matched against the start of the file
+    magic = ()
+    output_extension = None
+    output_mime_type = None
+    hiding_technique = None
+
+    @abc.abstractmethod
+    def capacity(self, source):
+        """Maximum payload size in bytes, read from the carrier header where possible"""
+
+    @abc.abstractmethod
+    def embed(self, source, data, output=None, progress=None):
+        """Hide data in the carrier"""
+
+    @abc.abstractmethod
+    def extract(self, source, progress=None):
+        """Extract hidden data from the carrier"""
+
+class ImageCarrier(Carrier):
+    """LSB steganography in the RGB channels of an image, saved as PNG"""
+    name = 'image'
+    mime_types = ('image/png', 'image/jpeg', 'image/bmp', 'image/gif', 'image/tiff', 'image/webp')
+    extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+    magic = (
+        (0, b'\x89PNG\r\n\x1a\n'),
+        (0, b'\xff\xd8\xff'),
+        (0, b'GIF87a'),
+        (0, b'GIF89a'),
+        (0, b'BM'),
+        (0, b'II*\x00'),
+        (0, b'MM\x00*'),
+    )
+    output_extension = '.png'
+    output_mime_type = 'image/png'
+    hiding_technique = 'LSB Image Steganography'
+
+    def _pixels(self, source):
+        """Return a writable uint8 RGB pixel array for a source"""
+        if isinstance(source, np.ndarray):
+            return source.astype(np.uint8, copy=True)
+        with metrics.stage('decode', self.name):
+            img = Image.open(open_source(source))
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            return np.asarray(img, dtype=np.uint8).copy()
+
+    def capacity(self, source):
+        if isinstance(source, np.ndarray):
+            n_samples = source.size
+        else:
+            # Image.open only parses the header until pixel data is requested
+            width, height = Image.open(open_source(source)).size
+            n_samples = width * height * 3
+        return max(0, n_samples // 8 - 1)
+
+    def embed(self, source, data, output=None, progress=None):
+        if is_path(source) and is_path(output):
+            return utils.convert_and_hide_in_image(source, output, data, progress=progress)
+
+        pixels = self._pixels(source)
+        writer = terminated(data)
+        if len(writer) > pixels.size:
+            raise ValueError(f"Data too large to hide in this image. Need {len(writer)} bits, but image can only store {pixels.size} bits")
+        with metrics.stage('embed', self.name):
+            writer.embed(pixels, progress=progress)
+
+        if isinstance(source, np.ndarray) and output is None:
+            return pixels
+        with metrics.stage('encode', self.name):
+            buffer = io.BytesIO()
+            Image.fromarray(pixels).save(buffer, format='PNG')
+            return write_output(buffer.getvalue(), output)
+
+    def extract(self, source, progress=None):
+        if isinstance(source, np.ndarray):
+            with metrics.stage('extract', self.name):
+                data, _ = BitReader(source.astype(np.uint8, copy=False)).read_until_terminator(progress=progress)
+            return data
+        return utils.extract_data_from_image(open_source(source), progress=progress)
+
+class AudioCarrier(Carrier):
+    """LSB steganography in the sample bytes of a WAV file (other formats are converted with FFmpeg)"""
+    name = 'audio'
+    mime_types = ('audio/wav', 'audio/x-wav', 'audio/wave', 'audio/mpeg', 'audio/ogg', 'audio/flac',
+                  'audio/aac', 'audio/mp4', 'audio/x-m4a')
+    extensions = ('.wav', '.mp3', '.ogg', '.flac', '.aac', '.m4a')
+    magic = (
+        (8, b'WAVE'),
+        (0, b'ID3'),
+        (0, b'\xff\xfb'),
+        (0, b'\xff\xf3'),
+        (0, b'OggS'),
+        (0, b'fLaC'),
+    )
+    output_extension = '.wav'
+    output_mime_type = 'audio/wav'
+    hiding_technique = 'Audio Sample Steganography'
+
+    def _read_wav(self, source):
+        """Return (params, frames) of a WAV source, converting other formats through a temporary file"""
+        if is_path(source) and not os.fspath(source).lower().endswith('.wav'):
+            source = self._convert(source)
+        elif not is_path(source):
+            raw = read_source(source)
+            if raw[8:12] != b'WAVE':
+                temp_dir = tempfile.mkdtemp()
+                try:
+                    temp_path = os.path.join(temp_dir, 'carrier')
+                    with open(temp_path, 'wb') as f:
+                        f.write(raw)
+                    return self._read_wav(self._convert(temp_path))
+                finally:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+            source = io.BytesIO(raw)
+
+        with metrics.stage('decode', self.name), wave.open(source, 'rb') as audio_file:
+            params = audio_file.getparams()
+            frames = audio_file.readframes(params.nframes)
+        return params, frames
+
+    def _convert(self, path):
+        wav_path = utils.convert_audio_to_wav(os.fspath(path))
+        if not wav_path:
+            raise ValueError("Failed to convert audio to WAV format")
+        return wav_path
+
+    def capacity(self, source):
+        if isinstance(source, np.ndarray):
+            n_samples = source.nbytes
+        elif is_path(source) and not os.fspath(source).lower().endswith('.wav'):
+            n_samples = len(self._read_wav(source)[1])
+        else:
+            # The WAV header gives the sample count without reading the frames
+            try:
+                with wave.open(open_source(source), 'rb') as audio_file:
+                    n_samples = audio_file.getnframes() * audio_file.getnchannels() * audio_file.getsampwidth()
+            except (wave.Error, EOFError):
+                n_samples = len(self._read_wav(source)[1])
+        return max(0, n_samples // 8 - 1)
+
+    def embed(self, source, data, output=None, progress=None):
+        if is_path(source) and is_path(output):
+            return utils.hide_data_in_audio(os.fspath(source), os.fspath(output), data, progress=progress)
+
+        writer = terminated(data)
+        if isinstance(source, np.ndarray):
+            # Raw samples: embed in their bytes, as in a WAV file
+            if output is not None:
+                raise ValueError("NumPy audio sources have no WAV parameters, embed them without an output")
+            samples = np.ascontiguousarray(source).copy()
+            frames = samples.reshape(-1).view(np.uint8)
+            if len(writer) > len(frames):
+                raise ValueError(f"Data too large to hide in this audio file. Need {len(writer)} bits, but audio has only {len(frames)} bytes")
+            with metrics.stage('embed', self.name):
+                writer.embed(frames, progress=progress)
+            return samples
+
+        params, frames = self._read_wav(source)
+        if len(writer) > len(frames):
+            raise ValueError(f"Data too large to hide in this audio file. Need {len(writer)} bits, but audio has only {len(frames)} bytes")
+        frames = bytearray(frames)
+        with metrics.stage('embed', self.name):
+            writer.embed(frames, progress=progress)
+
+        with metrics.stage('encode', self.name):
+            buffer = io.BytesIO()
+            with wave.open(buffer, 'wb') as output_file:
+                output_file.setparams(params)
+                output_file.writeframes(bytes(frames))
+            return write_output(buffer.getvalue(), output)
+
+    def extract(self, source, progress=None):
+        if is_path(source):
+            return utils.extract_data_from_audio(os.fspath(source), progress=progress)
+        if isinstance(source, np.ndarray):
+            frames = np.ascontiguousarray(source).reshape(-1).view(np.uint8)
+        else:
+            frames = self._read_wav(source)[1]
+        with metrics.stage('extract', self.name):
+            data, _ = BitReader(frames).read_until_terminator(pad_partial=True, progress=progress)
+        return data
+
+def register_carrier(carrier):
+    """Register a carrier class or instance under its name"""
+    if isinstance(carrier, type):
+        carrier = carrier()
+    _registry[carrier.name] = carrier
+    return carrier
+
+def register_lazy_carrier(name, target, mime_types=(), extensions=(), magic=()):
+    """Register a carrier by 'module:Class' path without importing it yet
+
+    The module is imported on the first get_carrier(name), so carriers with
+    heavy dependencies only load when a request needs them. The MIME types,
+    extensions and magic are given up front so detection works before that.
+    """
+    _registry[name] = {
+        'target': target,
+        'mime_types': tuple(mime_types),
+        'extensions': tuple(extensions),
+        'magic': tuple(magic),
+    }
+
+def get_carrier(name):
+    """Return the carrier registered under name, importing it if needed
+
+    Raises KeyError for unknown names.
+    """
+    carrier = _registry[name]
+    if isinstance(carrier, dict):
+        module_name, class_name = carrier['target'].split(':')
+        carrier_class = getattr(importlib.import_module(module_name), class_name)
+        carrier = register_carrier(carrier_class)
+    return carrier
+
+def available_carriers():
+    """Names of all registered carriers"""
+    return list(_registry)
+
+def carrier_info(name):
+    """Return the mime types, extensions and magic of a carrier without importing lazy ones"""
+    carrier = _registry[name]
+    if isinstance(carrier, dict):
+        return carrier
+    return {'mime_types': carrier.mime_types, 'extensions': carrier.extensions, 'magic': carrier.magic}
+
+def detect_carrier(header=b'', mime_type=None, filename=None):
+    """Pick a carrier name from magic bytes, then MIME type, then file extension
+
+    Returns None if nothing matches.
+    """
+    for name in _registry:
+        if header and any(header[offset:offset + len(signature)] == signature
+                          for offset, signature in carrier_info(name)['magic']):
+            return name
+    if mime_type:
+        for name in _registry:
+            if mime_type.split(';')[0].strip().lower() in carrier_info(name)['mime_types']:
+                return name
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        for name in _registry:
+            if extension and extension in carrier_info(name)['extensions']:
+                return name
+    return None
+
+register_carrier(ImageCarrier)
+register_carrier(AudioCarrier)
@@ -1,13 +1,163 @@
 import os
 import sys
+import glob
+import json
+import time
+import uuid
+import hashlib
+import random
 import requests
 import argparse
+import threading
 from pathlib import Path
+from collections import Counter
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
 # Default API URL
 API_BASE_URL = "http://localhost:8080/api"
 
-def encrypt_message(api_url, file_path, message, password, media_type="image"):
+# Status codes worth retrying in batch mode (overloaded or restarting server)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+def iter_events(response):
+    """Yield (event, data) pairs from a Server-Sent Events response"""
+    event, data = 'message', []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            # A blank line ends the event
+            if data:
+                yield event, json.loads('\n'.join(data))
+            event, data = 'message', []
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data.append(line[5:].strip())
+
+def format_progress(progress):
+    """One-line description of a job's progress report"""
+    if not progress:
+        return "waiting..."
+    stage, done, total = progress['stage'], progress['done'], progress['total']
+    if total:
+        return f"{stage}: {done}/{total} ({done / total * 100:.0f}%)"
+    return f"{stage}: {done}"
+
+def follow_job(api_url, job):
+    """Print the progress of a background job from its event stream and return the finished job"""
+    url = urljoin(api_url, job['events_url'])
+    with requests.get(url, stream=True, headers={'Accept': 'text/event-stream'}) as response:
+        response.raise_for_status()
+        for event, data in iter_events(response):
+            if event == 'progress':
+                print(f"\r[{data['status']}] {format_progress(data['progress'])}".ljust(60), end='', flush=True)
+            elif event == 'done':
+                print()
+                return data
+            elif event == 'error':
+                print()
+                raise RuntimeError(data['message'])
+    raise RuntimeError("Event stream ended before the job finished")
+
+def encrypt_with_progress(api_url, files, form_data, file_name):
+    """Run an encryption as a background job, showing its progress, and download the result"""
+    response = requests.post(f"{api_url}/encrypt", files=files, data=form_data, params={'async': '1'})
+    if response.status_code != 202:
+        print(f"API Error: {response.json().get('error', 'Unknown error')}")
+        return False
+    
+    job = follow_job(api_url, response.json())
+    if job['status'] != 'succeeded':
+        print(f"Job Error: {job['error']}")
+        return False
+    
+    result = job['result']
+    output_filename = os.path.basename(result['output_filename'])
+    if not download_file(urljoin(api_url, result['download_url']), output_filename):
+        return False
+    print(f"Success! Encrypted message ({result['message_length']} chars) into {output_filename}")
+    print(f"Original file: {file_name}")
+    print(f"Output file size: {result['file_size'] / 1024:.2f} KB")
+    print(f"Encrypted data size: {result['encrypted_size']} bytes")
+    print(f"Output file saved to the current directory")
+    return True
+
+def file_sha256(file_path):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def missing_ranges(ranges, size):
+    """Byte ranges of [0, size) not covered by the sorted, merged ranges the server has received"""
+    missing = []
+    position = 0
+    for start, end in ranges:
+        if start > position:
+            missing.append((position, start))
+        position = max(position, end)
+    if position < size:
+        missing.append((position, size))
+    return missing
+
+def chunked_upload(api_url, file_path, session=None, retries=3, backoff=0.5):
+    """Upload a file in checksummed chunks and return its finalized upload_id
+
+    The upload id is kept in <file>.upload.json until the upload is finalized,
+    so running the same command again after a failure only sends the chunks
+    the server is missing.
+    """
+    session = session or requests.Session()
+    size = os.path.getsize(file_path)
+    state_path = f"{file_path}.upload.json"
+    
+    status = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        # Only resume if the file is unchanged and the upload is still on the server
+        if (state['api_url'], state['size'], state['mtime']) == (api_url, size, os.path.getmtime(file_path)):
+            response = session.get(f"{api_url}/uploads/{state['upload_id']}")
+            if response.status_code == 200 and not response.json()['finalized']:
+                status = {**response.json(), 'chunk_size': state['chunk_size']}
+                print(f"Resuming upload {status['upload_id']}: {status['received']} of {size} bytes already sent")
+    
+    if status is None:
+        response = session.post(f"{api_url}/uploads",
+                                json={'filename': os.path.basename(file_path), 'size': size, 'sha256': file_sha256(file_path)})
+        if response.status_code != 201:
+            raise RuntimeError(response.json().get('message', 'Could not start the upload'))
+        status = response.json()
+        with open(state_path, 'w') as f:
+            json.dump({'api_url': api_url, 'upload_id': status['upload_id'], 'size': size,
+                       'mtime': os.path.getmtime(file_path), 'chunk_size': status['chunk_size']}, f)
+    
+    upload_url = f"{api_url}/uploads/{status['upload_id']}"
+    chunk_size = status['chunk_size']
+    sent = status['received']
+    with open(file_path, 'rb') as f:
+        for start, end in missing_ranges(status['ranges'], size):
+            for offset in range(start, end, chunk_size):
+                f.seek(offset)
+                chunk = f.read(min(chunk_size, end - offset))
+                response = request_with_retries(session, 'PUT', upload_url, retries, backoff, params={'offset': offset},
+                                                data=chunk, headers={'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()})
+                if response.status_code != 200:
+                    raise RuntimeError(f"Chunk at {offset} failed: {response.json().get('message')}")
+                sent += len(chunk)
+                print(f"\rUploaded {sent / 1024 / 1024:.1f} of {size / 1024 / 1024:.1f} MB", end='', flush=True)
+    print()
+    
+    response = session.post(f"{upload_url}/finalize")
+    if response.status_code != 200:
+        raise RuntimeError(response.json().get('message', 'Could not finalize the upload'))
+    os.remove(state_path)
+    return status['upload_id']
+
+def encrypt_message(api_url, file_path, message, password, media_type="image", show_progress=False, chunked=False):
     """Encrypt a message and hide it in a file using the API"""
     if not os.path.exists(file_path):
         print(f"Error: File {file_path} does not exist")
@@ -33,22 +183,30 @@ def encrypt_message(api_url, file_path, message, password, media_type="image"):
     print(f"Encrypting message into {file_name} ({media_type})...")
     
     try:
-        # Send the request
-        response = requests.post(url, files=files, data=form_data)
+        if chunked:
+            # Send the file in resumable chunks first and refer to it by id
+            files['file'][1].close()
+            files = None
+            form_data['upload_id'] = chunked_upload(api_url, file_path)
+        
+        if show_progress:
+            return encrypt_with_progress(api_url, files, form_data, file_name)
+        
+        # Send the request; inline=1 returns the stego file in the response body
+        response = requests.post(url, files=files, data=form_data, params={'inline': '1'})
         
         # Check response
         if response.status_code == 200:
-            data = response.json()
-            
-            # Download the processed file
-            download_url = f"{api_url}/download/{data['output_filename']}"
-            download_file(download_url, data['output_filename'])
+            output_filename = os.path.basename(response.headers['X-Stego-Output-Filename'])
+            with open(output_filename, 'wb') as f:
+                f.write(response.content)
             
-            print(f"Success! Encrypted message ({data['message_length']} chars) into {data['output_filename']}")
-            print(f"Original file: {data['original_filename']}")
-            print(f"Output file size: {data['file_size'] / 1024:.2f} KB")
-            print(f"Encrypted data size: {data['encrypted_size']} bytes")
-            print(f"Compression ratio: {(1 - data['encrypted_size'] / len(message.encode('utf-8'))) * 100:.1f}%")
+            encrypted_size = int(response.headers['X-Stego-Encrypted-Size'])
+            print(f"Success! Encrypted message ({response.headers['X-Stego-Message-Length']} chars) into {output_filename}")
+            print(f"Original file: {file_name}")
+            print(f"Output file size: {len(response.content) / 1024:.2f} KB")
+            print(f"Encrypted data size: {encrypted_size} bytes")
+            print(f"Compression ratio: {(1 - encrypted_size / len(message.encode('utf-8'))) * 100:.1f}%")
             print(f"Output file saved to the current directory")
             return True
         else:
@@ -60,7 +218,7 @@ def encrypt_message(api_url, file_path, message, password, media_type="image"):
         print(f"Error during encryption: {str(e)}")
         return False
 
-def decrypt_message(api_url, file_path, password, media_type="image"):
+def decrypt_message(api_url, file_path, password, media_type="image", show_progress=False, chunked=False):
     """Decrypt a message hidden in a file using the API"""
     if not os.path.exists(file_path):
         print(f"Error: File {file_path} does not exist")
@@ -85,23 +243,38 @@ def decrypt_message(api_url, file_path, password, media_type="image"):
     print(f"Extracting message from {file_name} ({media_type})...")
     
     try:
-        # Send the request
-        response = requests.post(url, files=files, data=form_data)
+        if chunked:
+            # Send the file in resumable chunks first and refer to it by id
+            files['file'][1].close()
+            files = None
+            form_data['upload_id'] = chunked_upload(api_url, file_path)
         
-        # Check response
-        if response.status_code == 200:
-            data = response.json()
-            
-            print(f"Success! Extracted message ({data['message_length']} chars) from {data['filename']}")
-            print("\nDecrypted Message:")
-            print("-" * 40)
-            print(data['message'])
-            print("-" * 40)
-            return True
+        if show_progress:
+            # Run as a background job and follow its event stream
+            response = requests.post(url, files=files, data=form_data, params={'async': '1'})
+            if response.status_code != 202:
+                print(f"API Error: {response.json().get('message', 'Unknown error')}")
+                return False
+            job = follow_job(api_url, response.json())
+            if job['status'] != 'succeeded':
+                print(f"Job Error: {job['error']}")
+                return False
+            data = job['result']
         else:
-            error = response.json().get('error', 'Unknown error')
-            print(f"API Error: {error}")
-            return False
+            # Send the request; inline=1 extracts from the upload without saving it on the server
+            response = requests.post(url, files=files, data=form_data, params={'inline': '1'})
+            if response.status_code != 200:
+                error = response.json().get('error', 'Unknown error')
+                print(f"API Error: {error}")
+                return False
+            data = response.json()
+        
+        print(f"Success! Extracted message ({data['message_length']} chars) from {data['filename']}")
+        print("\nDecrypted Message:")
+        print("-" * 40)
+        print(data['message'])
+        print("-" * 40)
+        return True
     
     except Exception as e:
         print(f"Error during decryption: {str(e)}")
@@ -155,6 +328,175 @@ def detect_media_type(file_path):
     else:
         return 'image'  # Default to image
 
+def create_session(pool_size):
+    """Return a keep-alive session whose connection pool fits pool_size concurrent requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def request_with_retries(session, method, url, retries=3, backoff=0.5, files=None, stats=None, **kwargs):
+    """Send a request, retrying connection errors and retryable status codes with exponential backoff
+
+    files maps form fields to (filename, path) and is reopened for every
+    attempt. A Retry-After header from the server takes precedence over the
+    backoff. Returns the last response, or raises the last connection error.
+    """
+    for attempt in range(retries + 1):
+        handles = {field: open(path, 'rb') for field, (_, path) in (files or {}).items()}
+        try:
+            upload = {field: (files[field][0], handle, 'application/octet-stream') for field, handle in handles.items()}
+            response = session.request(method, url, files=upload or None, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+            retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * 2 ** attempt
+            response.close()
+        except requests.ConnectionError:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+        finally:
+            for handle in handles.values():
+                handle.close()
+        if stats is not None:
+            stats['retries'] += 1
+        # Jitter keeps concurrent workers from retrying in lockstep
+        time.sleep(delay * random.uniform(0.5, 1.5))
+
+def stream_to_file(session, url, path, retries=3, backoff=0.5, stats=None):
+    """Stream a download to disk and return the number of bytes written"""
+    response = request_with_retries(session, 'GET', url, retries, backoff, stats=stats, stream=True)
+    with response:
+        response.raise_for_status()
+        written = 0
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                f.write(chunk)
+                written += len(chunk)
+    return written
+
+def expand_paths(patterns):
+    """Return the files named by directories (their direct children) and glob patterns, sorted and deduplicated"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(os.path.join(pattern, name) for name in os.listdir(pattern))
+        else:
+            paths.update(glob.glob(pattern, recursive=True))
+    return sorted(path for path in paths if os.path.isfile(path))
+
+def batch_encrypt_file(session, api_url, file_path, message, password, media_type, output_dir, retries, backoff, stats):
+    """Hide the message in one file of a batch and download the stego file into output_dir"""
+    response = request_with_retries(
+        session, 'POST', f"{api_url}/encrypt", retries, backoff, stats=stats,
+        files={'file': (os.path.basename(file_path), file_path)},
+        data={'message': message, 'password': password, 'media_type': media_type},
+        # Retries of a request the server already finished get its response instead of running again
+        headers={'Idempotency-Key': uuid.uuid4().hex}
+    )
+    body = response.json()
+    if response.status_code != 200:
+        raise RuntimeError(body.get('error', f"HTTP {response.status_code}"))
+    output_path = os.path.join(output_dir, os.path.basename(body['output_filename']))
+    stream_to_file(session, urljoin(api_url, body['download_url']), output_path, retries, backoff, stats)
+    return {'output': output_path}
+
+def decrypt_output_paths(paths, output_dir):
+    """Map each input file to the text file its message is saved in
+
+    Inputs keep their directory layout below their common directory, so a/x.png and b/x.png
+    become a/x.txt and b/x.txt. Inputs that differ only in their extension keep it (x.png.txt,
+    x.wav.txt).
+    """
+    if not paths:
+        return {}
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    relative = {path: os.path.relpath(os.path.abspath(path), base) for path in paths}
+    stems = {path: os.path.splitext(name)[0] for path, name in relative.items()}
+    counts = Counter(stems.values())
+    return {path: os.path.join(output_dir, f"{relative[path] if counts[stems[path]] > 1 else stems[path]}.txt")
+            for path in paths}
+
+def batch_decrypt_file(session, api_url, file_path, password, media_type, output_path, retries, backoff, stats):
+    """Extract the message from one file of a batch and save it to output_path"""
+    response = request_with_retries(
+        session, 'POST', f"{api_url}/decrypt", retries, backoff, stats=stats,
+        files={'file': (os.path.basename(file_path), file_path)},
+        data={'password': password, 'media_type': media_type},
+        params={'inline': '1'}
+    )
+    body = response.json()
+    if response.status_code != 200 or body.get('status') == 'error':
+        raise RuntimeError(body.get('message') or body.get('error') or f"HTTP {response.status_code}")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(body['message'])
+    return {'output': output_path}
+
+def run_batch(api_url, paths, operation, message=None, password='', media_type=None, output_dir='.',
+              workers=4, retries=3, backoff=0.5):
+    """Encrypt or decrypt many files concurrently over one pooled session
+
+    Returns the per-file results and the run statistics.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stats = {'retries': 0}
+    lock = threading.Lock()
+    session = create_session(workers)
+    # Chosen up front, so files with the same name never write to the same path
+    output_paths = decrypt_output_paths(paths, output_dir) if operation == 'decrypt' else {}
+    
+    def process(file_path):
+        started = time.perf_counter()
+        result = {'file': file_path, 'bytes': os.path.getsize(file_path)}
+        file_type = media_type or detect_media_type(file_path)
+        file_stats = {'retries': 0}
+        try:
+            if operation == 'encrypt':
+                result.update(batch_encrypt_file(session, api_url, file_path, message, password, file_type,
+                                                 output_dir, retries, backoff, file_stats))
+            else:
+                result.update(batch_decrypt_file(session, api_url, file_path, password, file_type,
+                                                 output_paths[file_path], retries, backoff, file_stats))
+            result['status'] = 'success'
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - started
+        with lock:
+            stats['retries'] += file_stats['retries']
+        return result
+    
+    results = []
+    started = time.perf_counter()
+    with session, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process, path) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result['status'] == 'success':
+                print(f"[{len(results)}/{len(paths)}] {result['file']} -> {result['output']} ({result['seconds']:.2f}s)")
+            else:
+                print(f"[{len(results)}/{len(paths)}] {result['file']} failed: {result['error']}")
+    stats['elapsed'] = time.perf_counter() - started
+    return results, stats
+
+def print_batch_summary(results, stats):
+    """Print throughput and latency for a batch run"""
+    succeeded = [result for result in results if result['status'] == 'success']
+    elapsed = stats['elapsed']
+    uploaded = sum(result['bytes'] for result in results)
+    print(f"\n{len(succeeded)}/{len(results)} files succeeded in {elapsed:.2f}s ({stats['retries']} retries)")
+    if results and elapsed > 0:
+        print(f"Throughput: {len(results) / elapsed:.2f} files/s, {uploaded / elapsed / 1024 / 1024:.2f} MB/s uploaded")
+    if succeeded:
+        latencies = sorted(result['seconds'] for result in succeeded)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        print(f"Latency: mean {sum(latencies) / len(latencies):.2f}s, p50 {latencies[len(latencies) // 2]:.2f}s, "
+              f"p95 {p95:.2f}s, max {latencies[-1]:.2f}s")
+
 def main():
     parser = argparse.ArgumentParser(description="Steganography Client for API")
     parser.add_argument("--url", default=API_BASE_URL, help="Base URL of the API")
@@ -167,12 +509,28 @@ def main():
     encrypt_parser.add_argument("message", help="Message to encrypt and hide")
     encrypt_parser.add_argument("password", help="Password for encryption")
     encrypt_parser.add_argument("--type", choices=["image", "audio"], help="Media type (detected automatically if not specified)")
+    encrypt_parser.add_argument("--progress", action="store_true", help="Run as a background job and show its progress")
+    encrypt_parser.add_argument("--chunked", action="store_true", help="Upload in resumable chunks (for large files)")
     
     # Decrypt command
     decrypt_parser = subparsers.add_parser("decrypt", help="Extract and decrypt a hidden message")
     decrypt_parser.add_argument("file", help="Path to the file with hidden data")
     decrypt_parser.add_argument("password", help="Password for decryption")
     decrypt_parser.add_argument("--type", choices=["image", "audio"], help="Media type (detected automatically if not specified)")
+    decrypt_parser.add_argument("--progress", action="store_true", help="Run as a background job and show its progress")
+    decrypt_parser.add_argument("--chunked", action="store_true", help="Upload in resumable chunks (for large files)")
+    
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Encrypt or decrypt many files concurrently")
+    batch_parser.add_argument("operation", choices=["encrypt", "decrypt"], help="Operation to run on every file")
+    batch_parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns (quote them, ** is recursive)")
+    batch_parser.add_argument("--message", help="Message to hide (encrypt)")
+    batch_parser.add_argument("--password", default="", help="Password for encryption, or for files without an embedded password")
+    batch_parser.add_argument("--type", choices=["image", "audio"], help="Media type (detected per file if not specified)")
+    batch_parser.add_argument("--output-dir", default=".", help="Where to save stego files (encrypt) or messages (decrypt)")
+    batch_parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    batch_parser.add_argument("--retries", type=int, default=3, help="Retries per request on connection errors and 429/5xx")
+    batch_parser.add_argument("--backoff", type=float, default=0.5, help="Initial retry delay in seconds, doubled per attempt")
     
     # Health check command
     subparsers.add_parser("health", help="Check if the API is online")
@@ -210,13 +568,31 @@ def main():
     # Encrypt command
     if args.command == "encrypt":
         media_type = args.type if args.type else detect_media_type(args.file)
-        encrypt_message(args.url, args.file, args.message, args.password, media_type)
+        encrypt_message(args.url, args.file, args.message, args.password, media_type, show_progress=args.progress,
+                        chunked=args.chunked)
         return
     
     # Decrypt command
     if args.command == "decrypt":
         media_type = args.type if args.type else detect_media_type(args.file)
-        decrypt_message(args.url, args.file, args.password, media_type)
+        decrypt_message(args.url, args.file, args.password, media_type, show_progress=args.progress,
+                        chunked=args.chunked)
+        return
+    
+    # Batch command
+    if args.command == "batch":
+        if args.operation == "encrypt" and (not args.message or not args.password):
+            print("Error: batch encrypt needs --message and --password")
+            return
+        paths = expand_paths(args.paths)
+        if not paths:
+            print("Error: no files matched")
+            return
+        print(f"Running {args.operation} on {len(paths)} files with {args.workers} workers...")
+        results, stats = run_batch(args.url, paths, args.operation, message=args.message, password=args.password,
+                                   media_type=args.type, output_dir=args.output_dir, workers=args.workers,
+                                   retries=args.retries, backoff=args.backoff)
+        print_batch_summary(results, stats)
         return
 
 if __name__ == "__main__":
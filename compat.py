@@ -0,0 +1,393 @@
+import os
+import sys
+import json
+import time
+import wave
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+import contextlib
+import shutil
+from unittest.mock import patch
+import numpy as np
+from PIL import Image
+
+import utils
+import legacy
+
+# Frozen stego files written by the legacy implementation, with what they must decode to.
+# Regenerating them defeats their purpose; only add new ones (see 'freeze' below).
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'compat_corpus')
+MANIFEST = 'manifest.json'
+
+MEDIA_TYPES = ('image', 'audio', 'encrypt', 'qr')
+
+@contextlib.contextmanager
+def seeded_urandom(seed):
+    """Make os.urandom (salts and IVs) deterministic, so encrypted payloads can be compared byte for byte"""
+    rng = random.Random(seed)
+    with patch.object(os, 'urandom', rng.randbytes):
+        yield
+
+def random_image(path, width, height, rng):
+    pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+    return path
+
+def random_wav(path, n_frames, rng, n_channels=2, sample_width=2, framerate=44100):
+    with wave.open(path, 'wb') as audio_file:
+        audio_file.setnchannels(n_channels)
+        audio_file.setsampwidth(sample_width)
+        audio_file.setframerate(framerate)
+        audio_file.writeframes(rng.integers(0, 256, n_frames * n_channels * sample_width, dtype=np.uint8).tobytes())
+    return path
+
+def random_payload(rng, size):
+    """Random bytes that may contain 0x00, so early terminators are exercised too"""
+    return rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+
+def image_pixels(path):
+    with Image.open(path) as img:
+        return np.array(img.convert('RGB'))
+
+def wav_contents(path):
+    with wave.open(path, 'rb') as audio_file:
+        return audio_file.getparams(), audio_file.readframes(audio_file.getnframes())
+
+def timed(func, *args, **kwargs):
+    """Call func and return (result or the exception it raised, seconds)"""
+    started = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        result = e
+    return result, time.perf_counter() - started
+
+def outcome(result):
+    """'ok', or the name of the exception a call raised (output paths differ by design)"""
+    return type(result).__name__ if isinstance(result, Exception) else 'ok'
+
+class Mismatch(AssertionError):
+    pass
+
+def check_same(name, old, new):
+    if isinstance(old, Exception) or isinstance(new, Exception):
+        if type(old) is not type(new):
+            raise Mismatch(f"{name}: legacy gave {old!r}, current gave {new!r}")
+        return
+    if isinstance(old, np.ndarray):
+        if old.shape != new.shape or not np.array_equal(old, new):
+            differing = int(np.count_nonzero(old != new)) if old.shape == new.shape else 'shape'
+            raise Mismatch(f"{name}: outputs differ ({differing} values)")
+        return
+    if old != new:
+        raise Mismatch(f"{name}: legacy gave {old!r:.80}, current gave {new!r:.80}")
+
+def diff_image(work_dir, rng, max_pixels):
+    """Hide a random payload in a random image with both implementations and read both files back with both"""
+    width = int(rng.integers(1, int(max_pixels ** 0.5) + 1))
+    height = int(rng.integers(1, max_pixels // width + 1))
+    capacity = width * height * 3 // 8
+    # Mostly payloads that fit, sometimes one that is exactly too large
+    size = capacity if rng.random() < 0.1 else int(rng.integers(0, max(capacity - 1, 1)))
+    data = random_payload(rng, size)
+    cover = random_image(os.path.join(work_dir, 'cover.png'), width, height, rng)
+    old_path, new_path = os.path.join(work_dir, 'legacy.png'), os.path.join(work_dir, 'current.png')
+
+    old, old_hide = timed(legacy.hide_data_in_image, cover, old_path, data)
+    new, new_hide = timed(utils.hide_data_in_image, cover, new_path, data)
+    check_same('hide', outcome(old), outcome(new))
+    timings = {'legacy_seconds': old_hide, 'current_seconds': new_hide}
+    if not isinstance(old, Exception):
+        check_same('stego pixels', image_pixels(old_path), image_pixels(new_path))
+        old, old_extract = timed(legacy.extract_data_from_image, new_path)
+        new, new_extract = timed(utils.extract_data_from_image, old_path)
+        check_same('extracted payload', old, new)
+        check_same('payload', data.split(b'\x00')[0], new)
+        timings = {'legacy_seconds': old_hide + old_extract, 'current_seconds': new_hide + new_extract}
+    return f"image/{width}x{height}/{size}B", timings
+
+def diff_audio(work_dir, rng, max_pixels):
+    """The same for WAV files of random length and sample format"""
+    n_channels = int(rng.choice([1, 2]))
+    sample_width = int(rng.choice([1, 2, 3]))
+    n_frames = int(rng.integers(1, max_pixels // (n_channels * sample_width) + 2))
+    capacity = n_frames * n_channels * sample_width // 8
+    size = capacity if rng.random() < 0.1 else int(rng.integers(0, max(capacity - 1, 1)))
+    data = random_payload(rng, size)
+    cover = random_wav(os.path.join(work_dir, 'cover.wav'), n_frames, rng, n_channels, sample_width)
+    old_path, new_path = os.path.join(work_dir, 'legacy.wav'), os.path.join(work_dir, 'current.wav')
+
+    old, old_hide = timed(legacy.hide_data_in_audio, cover, old_path, data)
+    new, new_hide = timed(utils.hide_data_in_audio, cover, new_path, data)
+    check_same('hide', outcome(old), outcome(new))
+    timings = {'legacy_seconds': old_hide, 'current_seconds': new_hide}
+    if not isinstance(old, Exception):
+        check_same('stego samples', wav_contents(old_path), wav_contents(new_path))
+        old, old_extract = timed(legacy.extract_data_from_audio, new_path)
+        new, new_extract = timed(utils.extract_data_from_audio, old_path)
+        check_same('extracted payload', old, new)
+        timings = {'legacy_seconds': old_hide + old_extract, 'current_seconds': new_hide + new_extract}
+    return f"audio/{n_channels}ch{sample_width * 8}bit/{n_frames}f/{size}B", timings
+
+def diff_encrypt(work_dir, rng, max_pixels):
+    """Compression and AES with the same salt and IV must give the same bytes"""
+    size = int(rng.integers(1, 4096))
+    # Half compressible text, half random bytes that do not compress
+    if rng.random() < 0.5:
+        message = ' '.join(rng.choice(['secret', 'meet', 'at', 'noon', 'the', 'north', 'gate']) for _ in range(size))
+    else:
+        message = random_payload(rng, size)
+    seed = int(rng.integers(0, 2 ** 32))
+    password = f"pass-{seed}"
+
+    with seeded_urandom(seed):
+        old, old_seconds = timed(legacy.encrypt_message, message, password)
+    with seeded_urandom(seed):
+        new, new_seconds = timed(utils.encrypt_message, message, password)
+    check_same('ciphertext', old, new)
+    if isinstance(message, str):
+        check_same('decrypted', message, utils.decrypt_message(old, password))
+    return f"encrypt/{len(message)}B", {'legacy_seconds': old_seconds, 'current_seconds': new_seconds}
+
+def diff_qr(work_dir, rng, max_pixels):
+    """QR codes with the same salt and IV must have the same pixels and decode to the message
+
+    Some legacy QR codes never read back: the decoder misses dense codes, and the 0x01 password
+    marker is ambiguous when the ciphertext contains that byte. For those, the current code must
+    fail the same way; every legacy code that decodes must decode from the current one too.
+    """
+    message = ''.join(chr(int(c)) for c in rng.integers(32, 127, int(rng.integers(1, 120))))
+    style = str(rng.choice(['standard', 'fancy', 'embedded']))
+    seed = int(rng.integers(0, 2 ** 32))
+    old_path, new_path = os.path.join(work_dir, 'legacy_qr.png'), os.path.join(work_dir, 'current_qr.png')
+
+    with seeded_urandom(seed):
+        old, old_seconds = timed(legacy.hide_message_in_qr, message, 'qr-pass', old_path, style=style)
+    with seeded_urandom(seed):
+        new, new_seconds = timed(utils.hide_message_in_qr, message, 'qr-pass', new_path, style=style)
+    check_same('hide', outcome(old), outcome(new))
+    if isinstance(old, Exception):
+        return f"qr/{style}/{len(message)}B", {'legacy_seconds': old_seconds, 'current_seconds': new_seconds}
+    check_same('qr pixels', image_pixels(old_path), image_pixels(new_path))
+    old_decoded = utils.extract_message_from_qr(old_path, 'qr-pass')
+    new_decoded = utils.extract_message_from_qr(new_path, 'qr-pass')
+    if old_decoded == message and new_decoded != message:
+        raise Mismatch(f"qr decoded: expected {message!r:.80}, current gave {new_decoded!r:.80}")
+    check_same('qr decoded', old_decoded, new_decoded)
+    return f"qr/{style}/{len(message)}B", {'legacy_seconds': old_seconds, 'current_seconds': new_seconds,
+                                           'decoded': old_decoded == message}
+
+DIFFERS = {'image': diff_image, 'audio': diff_audio, 'encrypt': diff_encrypt, 'qr': diff_qr}
+
+def run_differential(trials=20, seed=0, media_types=MEDIA_TYPES, max_pixels=20_000):
+    """Run trials random cases per media type on both implementations
+
+    Returns one {'case', 'legacy_seconds', 'current_seconds', 'speedup'} per case;
+    raises Mismatch on the first case where the two disagree, naming its seed.
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='stego_compat_')
+    try:
+        for media_type in media_types:
+            for trial in range(trials):
+                trial_seed = [seed, MEDIA_TYPES.index(media_type), trial]
+                rng = np.random.default_rng(trial_seed)
+                try:
+                    name, timings = DIFFERS[media_type](work_dir, rng, max_pixels)
+                except Mismatch as e:
+                    raise Mismatch(f"{media_type} trial {trial} (seed {seed}): {e}") from None
+                speedup = timings['legacy_seconds'] / timings['current_seconds'] if timings['current_seconds'] else None
+                results.append({'case': name, **timings, 'speedup': speedup})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_manifest(corpus_dir=CORPUS_DIR):
+    with open(os.path.join(corpus_dir, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+def check_corpus(corpus_dir=CORPUS_DIR):
+    """Read every frozen file with the current code and write it again from its cover
+
+    Returns a list of failure messages, empty if every file still extracts to what
+    the legacy code extracted and hiding the payload again gives identical pixels
+    or samples.
+    """
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix='stego_compat_')
+    try:
+        for entry in load_manifest(corpus_dir):
+            path = os.path.join(corpus_dir, entry['file'])
+            name = entry['file']
+            if sha256(path) != entry['sha256']:
+                failures.append(f"{name}: file changed since it was frozen")
+                continue
+            if entry['media_type'] == 'qr':
+                message = utils.extract_message_from_qr(path)
+                if message != entry['message']:
+                    failures.append(f"{name}: decoded {message!r}, expected {entry['message']!r}")
+                continue
+
+            if entry['media_type'] == 'image':
+                extracted = utils.extract_data_from_image(path)
+            else:
+                extracted = utils.extract_data_from_audio(path)
+            if extracted.hex() != entry['extracted_hex']:
+                failures.append(f"{name}: extracted {len(extracted)} bytes that differ from the legacy extraction")
+
+            # Files that were not written by hide_data_in_* have no cover to rewrite them from
+            if entry.get('cover') is None:
+                continue
+            payload = bytes.fromhex(entry['payload_hex'])
+            cover = os.path.join(corpus_dir, entry['cover'])
+            if entry['media_type'] == 'image':
+                rewritten = utils.hide_data_in_image(cover, os.path.join(work_dir, 'rewritten.png'), payload)
+                same = np.array_equal(image_pixels(path), image_pixels(rewritten))
+            else:
+                rewritten = utils.hide_data_in_audio(cover, os.path.join(work_dir, 'rewritten.wav'), payload)
+                same = wav_contents(path) == wav_contents(rewritten)
+            if not same:
+                failures.append(f"{name}: hiding the payload again gives different bits")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return failures
+
+def xor_payload(message, password):
+    """The payload /api/encrypt hides for messages under 32 bytes"""
+    key = hashlib.sha256(password.encode('utf-8')).digest()
+    return bytes(char ^ key[i % len(key)] for i, char in enumerate(message.encode('utf-8')))
+
+def freeze(corpus_dir=CORPUS_DIR, seed=0):
+    """Write the corpus with the legacy implementation (only for a new, empty corpus_dir)"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    password = 'Legacy-Pass-123'
+    entries = []
+
+    random_image(os.path.join(corpus_dir, 'cover.png'), 64, 48, rng)
+    with Image.open(os.path.join(corpus_dir, 'cover.png')) as img:
+        img.convert('RGBA').save(os.path.join(corpus_dir, 'cover_rgba.png'))
+    random_wav(os.path.join(corpus_dir, 'cover.wav'), 2000, rng)
+    random_wav(os.path.join(corpus_dir, 'cover_mono8.wav'), 3000, rng, n_channels=1, sample_width=1)
+
+    with seeded_urandom(seed):
+        aes_payload = legacy.encrypt_message('A longer message that is well past thirty-two characters. ' * 3, password)
+    payloads = {
+        'xor': xor_payload('hidden note', password),
+        # Compressed AES payloads contain 0x00, where extraction stops; that must not change either
+        'aes': aes_payload,
+        'full': rng.integers(1, 256, 64 * 48 * 3 // 8 - 1, dtype=np.uint8).tobytes(),
+        'noterminator': rng.integers(1, 256, 64 * 48 * 3 // 8, dtype=np.uint8).tobytes(),
+    }
+    carriers = (('cover.png', 'image', legacy.hide_data_in_image, legacy.extract_data_from_image),
+                ('cover_rgba.png', 'image', legacy.hide_data_in_image, legacy.extract_data_from_image),
+                ('cover.wav', 'audio', legacy.hide_data_in_audio, legacy.extract_data_from_audio),
+                ('cover_mono8.wav', 'audio', legacy.hide_data_in_audio, legacy.extract_data_from_audio))
+    for cover, media_type, hide, extract in carriers:
+        base, suffix = os.path.splitext(cover)
+        for label, payload in payloads.items():
+            name = f"{base.replace('cover', 'stego')}_{label}{suffix}"
+            path = os.path.join(corpus_dir, name)
+            if label == 'noterminator':
+                # Bits up to the very end of the carrier, with no terminator: written directly
+                # since hide_data_in_image always appends one, and read back to the last byte
+                if media_type == 'audio':
+                    continue
+                pixels = image_pixels(os.path.join(corpus_dir, cover)).reshape(-1)
+                bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+                pixels[:len(bits)] = (pixels[:len(bits)] & 0xFE) | bits
+                Image.fromarray(pixels.reshape(48, 64, 3)).save(path)
+            else:
+                try:
+                    hide(os.path.join(corpus_dir, cover), path, payload)
+                except ValueError:
+                    continue
+            entries.append({'file': name, 'media_type': media_type,
+                            'cover': None if label == 'noterminator' else cover, 'payload_hex': payload.hex(),
+                            'extracted_hex': extract(path).hex(), 'sha256': sha256(path)})
+
+    for style in ('standard', 'fancy'):
+        name = f"stego_qr_{style}.png"
+        with seeded_urandom(seed):
+            legacy.hide_message_in_qr('qr hidden note', password, os.path.join(corpus_dir, name), style=style)
+        entries.append({'file': name, 'media_type': 'qr', 'message': 'qr hidden note',
+                        'sha256': sha256(os.path.join(corpus_dir, name))})
+
+    with open(os.path.join(corpus_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2)
+        f.write('\n')
+    return entries
+
+def report(results):
+    """Print each case and a summary of the speedups; return the summary as a dict"""
+    for result in results:
+        speedup = f"{result['speedup']:.1f}x" if result['speedup'] else '-'
+        print(f"{result['case']:<40} legacy {result['legacy_seconds'] * 1000:>9.2f} ms"
+              f"  current {result['current_seconds'] * 1000:>9.2f} ms  {speedup:>8}")
+    summary = {}
+    for media_type in MEDIA_TYPES:
+        speedups = [r['speedup'] for r in results if r['case'].startswith(f"{media_type}/") and r['speedup']]
+        if speedups:
+            summary[media_type] = {'cases': len(speedups), 'median_speedup': float(np.median(speedups)),
+                                   'min_speedup': min(speedups)}
+            print(f"{media_type}: {len(speedups)} cases identical, median speedup {summary[media_type]['median_speedup']:.1f}x"
+                  f" (min {summary[media_type]['min_speedup']:.1f}x)")
+    undecodable = [r['case'] for r in results if r.get('decoded') is False]
+    if undecodable:
+        summary.setdefault('qr', {})['undecodable'] = len(undecodable)
+        print(f"qr: {len(undecodable)} codes did not read back with either implementation")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check that the current steganography code is bit-compatible with the legacy code')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = subparsers.add_parser('check', help='Decode and rewrite the frozen legacy corpus')
+    check_parser.add_argument('--corpus-dir', default=CORPUS_DIR)
+
+    diff_parser = subparsers.add_parser('diff', help='Run legacy and current code side by side on random inputs')
+    diff_parser.add_argument('--trials', type=int, default=20, help='Random cases per media type')
+    diff_parser.add_argument('--seed', type=int, default=0, help='Seed of the random cases (reported on a mismatch)')
+    diff_parser.add_argument('--media', nargs='+', choices=MEDIA_TYPES, default=list(MEDIA_TYPES))
+    diff_parser.add_argument('--max-pixels', type=int, default=20_000,
+                             help='Largest carrier in pixels (or audio bytes); the legacy code is slow on big ones')
+    diff_parser.add_argument('--output', help='Write the per-case timings to this JSON file')
+
+    freeze_parser = subparsers.add_parser('freeze', help='Write a new legacy corpus into an empty directory')
+    freeze_parser.add_argument('corpus_dir')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.command == 'check':
+        failures = check_corpus(args.corpus_dir)
+        for failure in failures:
+            print(f"FAIL {failure}")
+        print(f"{len(load_manifest(args.corpus_dir)) - len(failures)} frozen files compatible, {len(failures)} failures")
+        return 1 if failures else 0
+    if args.command == 'freeze':
+        if os.path.exists(os.path.join(args.corpus_dir, MANIFEST)):
+            parser.error(f"{args.corpus_dir} already holds a corpus; frozen files must never be regenerated")
+        print(f"Wrote {len(freeze(args.corpus_dir))} files to {args.corpus_dir}")
+        return 0
+
+    try:
+        results = run_differential(args.trials, args.seed, args.media, args.max_pixels)
+    except Mismatch as e:
+        print(f"MISMATCH {e}")
+        return 1
+    summary = report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'summary': summary, 'results': results}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+from contextlib import closing
+from Crypto.Cipher import AES
+
+# A key is claimed (pending) while its request runs, then holds the response until it expires
+PENDING = 'pending'
+DONE = 'done'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    status INTEGER,
+    headers BLOB,
+    body BLOB,
+    output TEXT
+)
+"""
+
+# Longest Idempotency-Key accepted, as in the IETF draft's examples and Stripe's API
+MAX_KEY_LENGTH = 255
+
+# How often a duplicate request checks whether the first one finished
+WAIT_POLL_INTERVAL = 0.1
+
+# Bytes read at a time when hashing uploaded files into the fingerprint
+HASH_BUFFER_SIZE = 1024 * 1024
+
+class KeyConflict(Exception):
+    """The key was used before with a different request"""
+
+class KeyBusy(Exception):
+    """A request with the same key is still running after the wait timeout"""
+
+def valid_key(key):
+    return 0 < len(key) <= MAX_KEY_LENGTH and key.isprintable()
+
+def fingerprint(endpoint, args, form, files):
+    """SHA-256 over the endpoint, query string, form fields and uploaded files of a request
+
+    args and form are MultiDicts; files maps field names to FileStorage objects, whose
+    streams are hashed in blocks and rewound.
+    """
+    digest = hashlib.sha256(endpoint.encode())
+    for name, fields in (('args', args), ('form', form)):
+        digest.update(json.dumps([name, sorted(fields.items(multi=True))]).encode())
+    for field, file in sorted(files.items(multi=True), key=lambda item: item[0]):
+        digest.update(json.dumps(['file', field, file.filename]).encode())
+        for block in iter(lambda: file.stream.read(HASH_BUFFER_SIZE), b''):
+            digest.update(block)
+        file.stream.seek(0)
+    return digest.hexdigest()
+
+def derive(key, purpose):
+    """32-byte secret for one purpose, derived from an Idempotency-Key that only its client knows"""
+    return hashlib.sha256(f"{purpose}:{key}".encode()).digest()
+
+def seal(key, data):
+    """Encrypt and authenticate data with AES-GCM under the Idempotency-Key"""
+    cipher = AES.new(derive(key, 'response'), AES.MODE_GCM)
+    sealed, tag = cipher.encrypt_and_digest(data)
+    return cipher.nonce + tag + sealed
+
+def unseal(key, data):
+    cipher = AES.new(derive(key, 'response'), AES.MODE_GCM, nonce=data[:16])
+    return cipher.decrypt_and_verify(data[32:], data[16:32])
+
+class IdempotencyStore:
+    """Responses of completed requests by Idempotency-Key, shared through SQLite by every server process
+
+    begin() claims a key for the caller, returns the stored response of a
+    completed request, or waits while another request with the key runs.
+    The claim lasts lock_timeout seconds, so a key held by a crashed worker
+    is eventually taken over. complete() stores the response for ttl
+    seconds, or until the output file it links to expires; release() gives
+    up a claim so that a retry runs again.
+
+    Responses hold auto-generated passwords, so the table keeps only hashes
+    of the keys and fingerprints, and responses encrypted under their key:
+    a copy of the database reveals nothing without the clients' keys.
+    """
+
+    def __init__(self, path, ttl, lock_timeout, wait_timeout):
+        self.path = path
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+            conn.execute('CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at ON idempotency_keys (expires_at)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _claim(self, key, request_fingerprint):
+        """Claim the key, or return its row if another request holds it or completed it"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            # Take the write lock before reading, so two processes cannot both claim the key
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT * FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+            if row is not None and row['expires_at'] > now:
+                return None, row
+            owner = uuid.uuid4().hex
+            conn.execute("INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, state, owner, created_at, expires_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, request_fingerprint, PENDING, owner, now,
+                                                      now + self.lock_timeout))
+            return owner, None
+
+    def _row_key(self, key):
+        return derive(key, 'row').hex()
+
+    def _discard(self, key, owner):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND owner = ? AND state = ?", (key, owner, DONE))
+
+    def begin(self, key, request_fingerprint, output_exists=None):
+        """Return (owner, None) if the caller should run the request, or (None, response) to replay
+
+        response is a (status, headers, body) tuple. A stored response whose
+        output file output_exists(name) reports gone is dropped, and the
+        request runs again. Raises KeyConflict if the key belongs to a
+        different request, and KeyBusy if the request holding it is still
+        running after wait_timeout seconds.
+        """
+        row_key = self._row_key(key)
+        request_fingerprint = hmac.new(derive(key, 'fingerprint'), request_fingerprint.encode(), 'sha256').hexdigest()
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            owner, row = self._claim(row_key, request_fingerprint)
+            if owner is not None:
+                return owner, None
+            if row['fingerprint'] != request_fingerprint:
+                raise KeyConflict(key)
+            if row['state'] == DONE:
+                if row['output'] is not None and output_exists is not None and not output_exists(row['output']):
+                    self._discard(row_key, row['owner'])
+                    continue
+                return None, (row['status'], json.loads(unseal(key, row['headers'])), unseal(key, row['body']))
+            if time.monotonic() >= deadline:
+                raise KeyBusy(key)
+            time.sleep(WAIT_POLL_INTERVAL)
+
+    def complete(self, key, owner, status, headers, body, output=None, output_expires_at=None):
+        """Store the response of the request that claimed the key
+
+        output names the output file the response links to; the response is
+        not kept past output_expires_at, when the file is removed.
+        """
+        expires_at = time.time() + self.ttl
+        if output_expires_at is not None:
+            expires_at = min(expires_at, output_expires_at)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE idempotency_keys SET state = ?, expires_at = ?, status = ?, headers = ?, body = ?, "
+                         "output = ? WHERE key = ? AND owner = ?",
+                         (DONE, expires_at, status, seal(key, json.dumps(headers).encode()), seal(key, body), output,
+                          self._row_key(key), owner))
+
+    def release(self, key, owner):
+        """Drop the claim of a request that failed, so that a retry runs it again"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND owner = ? AND state = ?",
+                         (self._row_key(key), owner, PENDING))
+
+    def reap(self):
+        """Remove expired keys and return how many were removed"""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),)).rowcount
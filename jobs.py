@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import closing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import metrics
+
+# Job lifecycle: queued -> running -> succeeded | failed
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    media_type TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT,
+    progress TEXT
+)
+"""
+
+# Minimum seconds between progress writes from a running job
+PROGRESS_INTERVAL = 0.25
+
+# How often the event stream checks the job, and how long it stays silent before a keep-alive
+EVENT_POLL_INTERVAL = 0.25
+EVENT_KEEPALIVE = 15
+
+class JobStore:
+    """SQLite-backed job state, visible to every server process that shares the database file"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # WAL lets workers write while the web processes read
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+            # Databases created before progress reporting lack the column
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(jobs)')]
+            if 'progress' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN progress TEXT')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _update(self, job_id, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def create(self, kind, media_type=None):
+        """Record a new queued job and return its id"""
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, media_type, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, media_type, QUEUED, time.time())
+            )
+        return job_id
+
+    def mark_running(self, job_id):
+        self._update(job_id, status=RUNNING, started_at=time.time())
+
+    def complete(self, job_id, result):
+        self._update(job_id, status=SUCCEEDED, finished_at=time.time(), result=json.dumps(result))
+
+    def fail(self, job_id, error):
+        self._update(job_id, status=FAILED, finished_at=time.time(), error=str(error))
+
+    def set_progress(self, job_id, stage, done, total=None):
+        """Record how far a running job has got (units depend on the stage)"""
+        self._update(job_id, progress=json.dumps({'stage': stage, 'done': done, 'total': total}))
+
+    def progress_reporter(self, job_id, interval=PROGRESS_INTERVAL):
+        """Return a progress(stage, done, total) callback that writes at most every interval seconds
+
+        A change of stage and the final report of a stage are always written.
+        """
+        last = {'time': 0.0, 'stage': None}
+
+        def report(stage, done, total=None):
+            now = time.monotonic()
+            finished = total is not None and done >= total
+            if stage == last['stage'] and not finished and now - last['time'] < interval:
+                return
+            last['time'] = now
+            last['stage'] = stage
+            self.set_progress(job_id, stage, done, total)
+
+        return report
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if the id is unknown"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['job_id'] = job.pop('id')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['progress'] = json.loads(job['progress']) if job['progress'] else None
+        return job
+
+    def count(self, status):
+        """Number of jobs in a status"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+def run_job(db_path, job_id, func, args, kwargs):
+    """Run a job function in a worker process and record the outcome in the job store
+
+    func is called with a progress keyword argument: a callback that records
+    progress(stage, done, total) in the store for the event stream.
+    """
+    store = JobStore(db_path)
+    store.mark_running(job_id)
+    try:
+        result = func(*args, progress=store.progress_reporter(job_id), **kwargs)
+    except Exception as e:
+        store.fail(job_id, e)
+        return
+    store.complete(job_id, result)
+
+class JobManager:
+    """Run jobs on bounded process pools, one pool per media type
+
+    workers maps a media type to its pool size; other media types get
+    default_workers processes (one per CPU if not given). Pools start on
+    first use.
+    """
+
+    def __init__(self, store, workers=None, default_workers=None):
+        self.store = store
+        self.workers = dict(workers or {})
+        self.default_workers = default_workers or os.cpu_count() or 1
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, media_type):
+        with self._lock:
+            pool = self._pools.get(media_type)
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=self.workers.get(media_type, self.default_workers))
+                self._pools[media_type] = pool
+            return pool
+
+    def _submit(self, media_type, func, *args, **kwargs):
+        """Run func on the media type's pool and return a Future of its result
+
+        The stages the worker ran are added to this process's metrics when it finishes.
+        """
+        outer = Future()
+
+        def finished(inner):
+            try:
+                raised, value, stages = inner.result()
+            except BaseException as e:
+                # The worker process died, or the call could not be sent to it
+                outer.set_exception(e)
+                return
+            metrics.record_stages(stages)
+            if raised:
+                outer.set_exception(value)
+            else:
+                outer.set_result(value)
+
+        self._pool(media_type).submit(metrics.call_with_stages, func, media_type, args, kwargs).add_done_callback(finished)
+        return outer
+
+    def create(self, kind, media_type):
+        """Create a queued job record, so its id can name files before submitting"""
+        return self.store.create(kind, media_type)
+
+    def submit(self, job_id, media_type, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) for an existing job on the media type's pool
+
+        func must be a module-level function so it can be sent to the worker
+        process, and must accept a progress keyword argument (see run_job).
+        """
+        future = self._submit(media_type, run_job, self.store.path, job_id, func, args, kwargs)
+        future.add_done_callback(lambda f: self._check_worker(job_id, f))
+        return future
+
+    def run(self, media_type, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the media type's pool without a job record
+
+        For work the request waits on itself (batch endpoints). Returns a Future.
+        """
+        return self._submit(media_type, func, *args, **kwargs)
+
+    def _check_worker(self, job_id, future):
+        # A worker that crashed never got to record its own failure
+        error = future.exception()
+        if error is not None:
+            self.store.fail(job_id, f"Worker failed: {error}")
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=wait)
+            self._pools = {}
+
+def format_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def iter_events(store, job_id, poll_interval=EVENT_POLL_INTERVAL, keepalive=EVENT_KEEPALIVE):
+    """Yield Server-Sent Events for a job until it finishes
+
+    A 'progress' event is sent whenever the status or progress changes, and a
+    final 'done' event carries the whole job (with its result or error).
+    Comment lines keep idle connections open through proxies.
+    """
+    last = None
+    last_sent = time.monotonic()
+    while True:
+        job = store.get(job_id)
+        if job is None:
+            yield format_event('error', {'message': 'Unknown job'})
+            return
+        snapshot = (job['status'], job['progress'])
+        if snapshot != last:
+            last = snapshot
+            last_sent = time.monotonic()
+            yield format_event('progress', {'job_id': job_id, 'status': job['status'], 'progress': job['progress']})
+        if job['status'] in (SUCCEEDED, FAILED):
+            yield format_event('done', job)
+            return
+        if time.monotonic() - last_sent >= keepalive:
+            last_sent = time.monotonic()
+            yield ': keep-alive\n\n'
+        time.sleep(poll_interval)
@@ -0,0 +1,377 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+import benchmark
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Relative weights of the replayed requests; change with --mix encrypt=4,decrypt-qr=1,...
+DEFAULT_MIX = {'encrypt': 4, 'decrypt': 4, 'encrypt-qr': 1, 'decrypt-qr': 1}
+ENDPOINTS = tuple(DEFAULT_MIX)
+
+PERCENTILES = (50, 90, 95, 99)
+
+PASSWORD = 'Load-Test-Pass-123'
+MESSAGE = 'A load test message that is long enough to take the AES path. ' * 2
+
+def parse_mix(text):
+    """'encrypt=4,decrypt=1' -> {'encrypt': 4.0, 'decrypt': 1.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r}, choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] < 0:
+            raise ValueError(f"Weight of {name} must not be negative")
+    if not any(mix.values()):
+        raise ValueError("At least one endpoint needs a positive weight")
+    return mix
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def available_server():
+    """The production WSGI server to use by default: waitress, then gunicorn (POSIX only)"""
+    if importlib.util.find_spec('waitress'):
+        return 'waitress'
+    if os.name == 'posix' and importlib.util.find_spec('gunicorn'):
+        return 'gunicorn'
+    return None
+
+def server_command(server, port, workers, threads):
+    bind = f"127.0.0.1:{port}"
+    if server in ('waitress', 'gunicorn'):
+        # The production runner, so the load test sees the same preloading and worker settings
+        return [sys.executable, os.path.join(REPO_DIR, 'serve.py'), '--server', server, '--bind', bind,
+                '--workers', str(workers), '--threads', str(threads)]
+    if server == 'werkzeug':
+        # Flask's development server, for machines without waitress or gunicorn
+        return [sys.executable, '-m', 'flask', '--app', 'api:create_app()', 'run', '--port', str(port),
+                '--with-threads']
+    raise ValueError(f"Unknown server {server!r}")
+
+class Server:
+    """api.app under a WSGI server in a child process, with uploads and output kept in a temporary directory"""
+
+    def __init__(self, server='auto', workers=2, threads=8, port=None):
+        self.server = available_server() if server == 'auto' else server
+        if self.server is None:
+            raise RuntimeError("Neither waitress nor gunicorn is installed; install one or pass --server werkzeug")
+        self.workers = workers
+        self.threads = threads
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.work_dir = None
+        self.process = None
+        self.log = None
+
+    def start(self, timeout=30):
+        self.work_dir = tempfile.mkdtemp(prefix='stego_loadtest_')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (REPO_DIR, os.environ.get('PYTHONPATH')))))
+        self.log = open(os.path.join(self.work_dir, 'server.log'), 'wb')
+        # Uploads, output files and databases end up in work_dir
+        self.process = subprocess.Popen(server_command(self.server, self.port, self.workers, self.threads),
+                                        cwd=self.work_dir, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.server} exited with status {self.process.returncode}:\n{self.log_tail()}")
+            try:
+                if requests.get(f"{self.url}/api/health", timeout=1).ok:
+                    return self
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"{self.server} did not answer /api/health within {timeout} s")
+
+    def log_tail(self, lines=20):
+        self.log.flush()
+        with open(self.log.name, 'rb') as f:
+            return b'\n'.join(f.read().splitlines()[-lines:]).decode(errors='replace')
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.log is not None:
+            self.log.close()
+        if self.work_dir is not None:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of pid and all its descendants, from /proc (None where there is no /proc)"""
+    if not os.path.isdir('/proc'):
+        return None
+    children = defaultdict(list)
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces, the fields after it do not
+                    parent = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children[parent].append(int(entry))
+    total, pending, page_size = 0, [pid], os.sysconf('SC_PAGE_SIZE')
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+        pending.extend(children.get(current, ()))
+    return total
+
+class RssSampler(threading.Thread):
+    """Samples the RSS of a process tree every interval seconds until stopped"""
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.started_at = time.monotonic()
+
+    def run(self):
+        while True:
+            rss = process_tree_rss(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.monotonic() - self.started_at, 2), rss))
+            if self.stopped.wait(self.interval):
+                break
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.samples
+
+class Corpus:
+    """Synthetic carriers, plus stego files made by the server under test for the decrypt requests"""
+
+    def __init__(self, directory, image_megapixels=0.5, audio_seconds=5, media_types=('image', 'audio')):
+        self.media_types = media_types
+        self.covers = {}
+        if 'image' in media_types:
+            path = benchmark.make_image(os.path.join(directory, 'cover.png'), image_megapixels)
+            self.covers['image'] = ('cover.png', read_file(path), 'image/png')
+        if 'audio' in media_types:
+            path = benchmark.make_wav(os.path.join(directory, 'cover.wav'), audio_seconds)
+            self.covers['audio'] = ('cover.wav', read_file(path), 'audio/wav')
+        self.stego = {}
+        self.qr = None
+
+    def prepare(self, api_url):
+        """Make one stego file per media type and one QR code to replay decrypt requests with"""
+        for media_type, (name, data, mime_type) in self.covers.items():
+            response = requests.post(f"{api_url}/encrypt", params={'inline': '1'}, files={'file': (name, data, mime_type)},
+                                     data={'message': MESSAGE, 'password': PASSWORD, 'media_type': media_type})
+            response.raise_for_status()
+            self.stego[media_type] = (response.headers['X-Stego-Output-Filename'], response.content, mime_type)
+        response = requests.post(f"{api_url}/encrypt-qr", data={'message': 'load test', 'password': PASSWORD})
+        response.raise_for_status()
+        download = requests.get(f"{api_url}/download/{response.json()['output_filename']}")
+        download.raise_for_status()
+        self.qr = ('qr.png', download.content, 'image/png')
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def send_request(session, api_url, endpoint, corpus, rng):
+    """Send one request of the mix and return (label, status code, bytes sent)"""
+    if endpoint in ('encrypt', 'decrypt'):
+        media_type = rng.choice(corpus.media_types)
+        name, data, mime_type = (corpus.covers if endpoint == 'encrypt' else corpus.stego)[media_type]
+        form = {'password': PASSWORD, 'media_type': media_type}
+        if endpoint == 'encrypt':
+            form['message'] = MESSAGE
+        response = session.post(f"{api_url}/{endpoint}", files={'file': (name, data, mime_type)}, data=form)
+        label = f"{endpoint}/{media_type}"
+        sent = len(data)
+    elif endpoint == 'encrypt-qr':
+        response = session.post(f"{api_url}/encrypt-qr", data={'message': MESSAGE, 'password': PASSWORD})
+        label, sent = endpoint, len(MESSAGE)
+    else:
+        name, data, mime_type = corpus.qr
+        response = session.post(f"{api_url}/decrypt-qr", files={'file': (name, data, mime_type)})
+        label, sent = endpoint, len(data)
+    # Read the whole body, so its transfer counts towards the latency
+    response.content
+    return label, response.status_code, sent
+
+def run_load(api_url, corpus, mix=None, concurrency=8, duration=None, requests_total=None, seed=0):
+    """Replay the weighted mix from concurrency threads for duration seconds or requests_total requests
+
+    Returns {label: [(latency seconds, status or 'exception'), ...]} and the wall time.
+    """
+    if duration is None and requests_total is None:
+        raise ValueError("Give a duration or a number of requests")
+    mix = mix or DEFAULT_MIX
+    endpoints = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in endpoints]
+    lock = threading.Lock()
+    results = defaultdict(list)
+    issued = [0]
+    started = time.monotonic()
+
+    def worker(number):
+        rng = random.Random(seed * 1000 + number)
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    if requests_total is not None and issued[0] >= requests_total:
+                        return
+                    issued[0] += 1
+                if duration is not None and time.monotonic() - started >= duration:
+                    return
+                endpoint = rng.choices(endpoints, weights)[0]
+                request_started = time.perf_counter()
+                try:
+                    label, status, _ = send_request(session, api_url, endpoint, corpus, rng)
+                except requests.RequestException:
+                    label, status = endpoint, 'exception'
+                latency = time.perf_counter() - request_started
+                with lock:
+                    results[label].append((latency, status))
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker, number) for number in range(concurrency)]:
+            future.result()
+    return dict(results), time.monotonic() - started
+
+def summarize(results, wall_seconds):
+    """Throughput, latency percentiles (ms), error rate and status counts per label and overall"""
+    def stats(entries):
+        latencies = sorted(latency for latency, _ in entries)
+        statuses = defaultdict(int)
+        for _, status in entries:
+            statuses[str(status)] += 1
+        errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+        summary = {
+            'requests': len(entries),
+            'throughput_rps': round(len(entries) / wall_seconds, 2) if wall_seconds else None,
+            'error_rate': round(errors / len(entries), 4) if entries else 0.0,
+            'statuses': dict(statuses),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        }
+        for percent in PERCENTILES:
+            value = percentile(latencies, percent)
+            summary[f"p{percent}_ms"] = round(value * 1000, 2) if value is not None else None
+        return summary
+
+    summary = {label: stats(entries) for label, entries in sorted(results.items())}
+    summary['all'] = stats([entry for entries in results.values() for entry in entries])
+    return summary
+
+def print_report(summary, rss_samples):
+    header = f"{'endpoint':<16} {'requests':>8} {'req/s':>8} {'errors':>7}" + ''.join(f" {f'p{p}':>8}" for p in PERCENTILES)
+    print(header + f" {'max':>8}")
+    for label, stats in summary.items():
+        line = f"{label:<16} {stats['requests']:>8} {stats['throughput_rps']:>8.2f} {stats['error_rate']:>7.1%}"
+        line += ''.join(f" {stats[f'p{p}_ms']:>8.1f}" for p in PERCENTILES) + f" {stats['max_ms']:>8.1f}"
+        print(line)
+    statuses = ', '.join(f"{status}: {count}" for status, count in sorted(summary['all']['statuses'].items()))
+    print(f"Latencies in ms; statuses {statuses}")
+    if rss_samples:
+        peak = max(rss for _, rss in rss_samples)
+        print(f"Server RSS: start {rss_samples[0][1] / 1e6:.0f} MB, end {rss_samples[-1][1] / 1e6:.0f} MB, "
+              f"peak {peak / 1e6:.0f} MB over {len(rss_samples)} samples")
+        # At most 20 evenly spaced samples, enough to see steady growth
+        step = max(1, len(rss_samples) // 20)
+        print('RSS over time: ' + ', '.join(f"{elapsed:.0f}s {rss / 1e6:.0f} MB" for elapsed, rss in rss_samples[::step]))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the API under a production WSGI server on localhost')
+    parser.add_argument('--server', choices=('auto', 'waitress', 'gunicorn', 'werkzeug'), default='auto',
+                        help='WSGI server to boot (auto: waitress, else gunicorn)')
+    parser.add_argument('--url', help='Load test an already running server instead, e.g. http://localhost:8080')
+    parser.add_argument('--workers', type=int, default=2, help='Server processes (gunicorn)')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per server process')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client connections')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run for')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests instead of after --duration')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Endpoint weights, e.g. encrypt=4,decrypt=4,encrypt-qr=1,decrypt-qr=1')
+    parser.add_argument('--media', nargs='+', choices=('image', 'audio'), default=['image', 'audio'],
+                        help='Carriers used by /api/encrypt and /api/decrypt')
+    parser.add_argument('--image-megapixels', type=float, default=0.5)
+    parser.add_argument('--audio-seconds', type=int, default=5)
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='Seconds between RSS samples')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the summary and RSS samples to this JSON file')
+    args = parser.parse_args(argv)
+
+    corpus_dir = tempfile.mkdtemp(prefix='stego_loadtest_corpus_')
+    server = None
+    try:
+        corpus = Corpus(corpus_dir, args.image_megapixels, args.audio_seconds, tuple(args.media))
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            server = Server(args.server, args.workers, args.threads).start()
+            base_url = server.url
+            print(f"Serving api.app with {server.server} on {base_url}")
+        api_url = f"{base_url}/api"
+        corpus.prepare(api_url)
+
+        sampler = RssSampler(server.process.pid, args.sample_interval) if server else None
+        if sampler:
+            sampler.start()
+        duration = None if args.requests else args.duration
+        results, wall_seconds = run_load(api_url, corpus, args.mix, args.concurrency, duration, args.requests, args.seed)
+        rss_samples = sampler.stop() if sampler else []
+
+        summary = summarize(results, wall_seconds)
+        print_report(summary, rss_samples)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'server': server.server if server else base_url, 'concurrency': args.concurrency,
+                           'mix': args.mix, 'wall_seconds': round(wall_seconds, 3), 'summary': summary,
+                           'rss_samples': rss_samples}, f, indent=2)
+            print(f"Results written to {args.output}")
+    finally:
+        if server is not None:
+            server.stop()
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import re
+import sys
+import json
+import random
+import logging
+from datetime import datetime, timezone
+
+# Fields (passed with extra=) whose values are never written out
+SECRET_FIELDS = frozenset(('password', 'auto_generated_password', 'used_password', 'embedded_password',
+                           'secret', 'token', 'key'))
+REDACTED = '[redacted]'
+
+# password=..., "token": "..." and the like inside a message
+SECRET_PATTERN = re.compile(r'(?i)\b(password|passwd|secret|token|api_key)(["\']?\s*[:=]\s*["\']?)[^\s,;"\'}]+')
+
+# Attributes every LogRecord has; anything else came from extra= and is written as a field
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+def redact_text(text):
+    """Replace the values of password=..., token: ... and similar in text"""
+    return SECRET_PATTERN.sub(lambda match: f"{match.group(1)}{match.group(2)}{REDACTED}", text)
+
+def record_fields(record):
+    """The extra= fields of a record"""
+    return {name: value for name, value in vars(record).items() if name not in RECORD_ATTRIBUTES}
+
+class RedactingFilter(logging.Filter):
+    """Masks secret fields and secrets written into the message, before any formatter sees the record"""
+
+    def filter(self, record):
+        for name in SECRET_FIELDS.intersection(vars(record)):
+            setattr(record, name, REDACTED)
+        message = record.getMessage()
+        redacted = redact_text(message)
+        if redacted != message:
+            record.msg, record.args = redacted, ()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Lets through only a fraction rate of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, any extra= fields and the exception"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class StderrHandler(logging.StreamHandler):
+    """Writes to whatever sys.stderr is at the time, so replacing it later (as test runners do) is fine"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+def configure_logging(level='INFO', json_output=True, debug_sample_rate=1.0, stream=None):
+    """Send log records of the root logger to stream (stderr by default) and return the handler
+
+    Records are redacted, DEBUG records sampled at debug_sample_rate, and
+    written as JSON lines (or plain text). A handler installed by an earlier
+    call is replaced; other handlers are left alone.
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if getattr(handler, 'configured_by_logs', False):
+            root.removeHandler(handler)
+
+    handler = StderrHandler() if stream is None else logging.StreamHandler(stream)
+    handler.configured_by_logs = True
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+    handler.addFilter(RedactingFilter())
+    if json_output:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
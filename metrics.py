@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import heapq
+import bisect
+import functools
+import threading
+import contextvars
+
+# Upper bounds in seconds of the latency histogram buckets (+Inf is implicit)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Media type of the request being served, for stages that cannot tell on their own (KDF, compression, ...)
+_media_type = contextvars.ContextVar('media_type', default=None)
+
+def set_media_type(media_type):
+    """Label the stages recorded from now on in this thread (or context) with media_type; None clears it"""
+    _media_type.set(media_type)
+
+def current_media_type():
+    return _media_type.get()
+
+# Stage timings of the request being served, if it is traced
+_trace = contextvars.ContextVar('trace', default=None)
+
+class Trace:
+    """Time spent in each stage during one request, in the order the stages first ran"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def milliseconds(self):
+        """Stage durations in milliseconds, rounded to microseconds"""
+        return {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+
+    def server_timing(self):
+        """Value of a Server-Timing header with every stage and the total so far"""
+        entries = [f"{name};dur={ms}" for name, ms in self.milliseconds().items()]
+        entries.append(f"total;dur={round(self.elapsed() * 1000, 3)}")
+        return ', '.join(entries)
+
+def start_trace():
+    """Collect the stages run from now on in this thread (or context) into a new Trace and return it"""
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+def current_trace():
+    return _trace.get()
+
+def end_trace():
+    _trace.set(None)
+
+# Stages run by a call in a pool worker, sent back to the web process with its result
+_collected = contextvars.ContextVar('collected', default=None)
+
+def call_with_stages(func, media_type, args, kwargs):
+    """Run func(*args, **kwargs) in a pool worker; return (raised, its result or exception, stages it ran)
+
+    /api/metrics is served from the web process's registry, so the stages of job and batch
+    workers would otherwise be lost; the caller adds them there with record_stages().
+    """
+    stages = []
+    collected = _collected.set(stages)
+    labelled = _media_type.set(media_type)
+    try:
+        return False, func(*args, **kwargs), stages
+    except Exception as e:
+        return True, e, stages
+    finally:
+        _collected.reset(collected)
+        _media_type.reset(labelled)
+
+def record_stages(stages):
+    """Add stages returned by call_with_stages() to this process's metrics"""
+    for name, media_type, seconds, failed in stages:
+        STAGE_DURATION.observe(seconds, name, media_type)
+        if failed:
+            STAGE_ERRORS.inc(name, media_type)
+
+class SlowLog:
+    """The slowest size requests seen by this process, optionally mirrored to a JSON file at path
+
+    The file is only rewritten when a request makes it into the list, which
+    stops happening once the list holds the usual worst cases.
+    """
+
+    def __init__(self, size, path=None):
+        self.size = size
+        self.path = path
+        self.heap = []
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def record(self, entry):
+        """Keep entry (a dict with total_ms) if it is among the slowest; return True if it was kept"""
+        if self.size <= 0:
+            return False
+        with self.lock:
+            self.counter += 1
+            item = (entry['total_ms'], self.counter, entry)
+            if len(self.heap) < self.size:
+                heapq.heappush(self.heap, item)
+            elif item[0] > self.heap[0][0]:
+                heapq.heapreplace(self.heap, item)
+            else:
+                return False
+            if self.path:
+                self._write()
+        return True
+
+    def _write(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._entries(), f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def _entries(self):
+        return [entry for _, _, entry in sorted(self.heap, key=lambda item: item[0], reverse=True)]
+
+    def entries(self):
+        """Kept requests, slowest first"""
+        with self.lock:
+            return self._entries()
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=''):
+    labels = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Histogram:
+    """Observations bucketed by upper bound, one set of buckets per label combination
+
+    Recording is a bisect and a few additions under a lock; cumulative counts
+    are only worked out when the metrics are rendered.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            series['counts'][index] += 1
+            series['sum'] += value
+
+    def samples(self, label_values):
+        """Return (count, sum) for one label combination, or (0, 0.0) if nothing was observed"""
+        with self.lock:
+            series = self.series.get(tuple(label_values))
+            if series is None:
+                return 0, 0.0
+            return sum(series['counts']), series['sum']
+
+    def render(self):
+        with self.lock:
+            series = {key: (list(value['counts']), value['sum']) for key, value in self.series.items()}
+        lines = []
+        for label_values, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, label_values)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+class Counter:
+    """A monotonically increasing count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self.lock:
+            return self.series.get(label_values, 0)
+
+    def render(self):
+        with self.lock:
+            series = dict(self.series)
+        return [f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+                for label_values, value in sorted(series.items())]
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'stego_stage_duration_seconds', 'Time spent in each stage of the steganography pipeline', ('stage', 'media_type')))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    'stego_stage_errors_total', 'Pipeline stages that raised an exception', ('stage', 'media_type')))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    'stego_request_duration_seconds', 'Time to handle a request, by endpoint', ('endpoint', 'media_type')))
+REQUESTS = REGISTRY.register(Counter(
+    'stego_requests_total', 'Requests handled, by endpoint and response status', ('endpoint', 'media_type', 'status')))
+
+class stage:
+    """Time a block (with stage('kdf'): ...) or a function (@stage('kdf')) as one pipeline stage
+
+    media_type defaults to the one set for the current request, or 'none'.
+    """
+
+    __slots__ = ('name', 'media_type', 'started')
+
+    def __init__(self, name, media_type=None):
+        self.name = name
+        self.media_type = media_type
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.started
+        media_type = self.media_type or _media_type.get() or 'none'
+        STAGE_DURATION.observe(elapsed, self.name, media_type)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add(self.name, elapsed)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.name, media_type)
+        collected = _collected.get()
+        if collected is not None:
+            collected.append((self.name, media_type, elapsed, exc_type is not None))
+        return False
+
+    def __call__(self, func):
+        name, media_type = self.name, self.media_type
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with stage(name, media_type):
+                return func(*args, **kwargs)
+
+        return timed
+
+def observe_request(endpoint, media_type, status, seconds):
+    """Record a finished request"""
+    media_type = media_type or 'none'
+    REQUEST_DURATION.observe(seconds, endpoint, media_type)
+    REQUESTS.inc(endpoint, media_type, str(status))
+
+def render():
+    """All metrics of this process in the Prometheus text exposition format (version 0.0.4)"""
+    return REGISTRY.render()
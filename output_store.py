@@ -0,0 +1,245 @@
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import closing
+import storage
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    sha256 TEXT
+)
+"""
+
+COUNTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+)
+"""
+
+# Bytes read at a time when hashing a carrier for its output name
+HASH_BUFFER_SIZE = 1024 * 1024
+
+def content_digest(data, path=None):
+    """SHA-256 of the hidden data followed by the carrier file, which together determine the output bytes"""
+    digest = hashlib.sha256(data)
+    if path is not None:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def file_sha256(path):
+    """SHA-256 of a file, read in blocks"""
+    return content_digest(b'', path)
+
+def content_name(filename, digest):
+    """Output name carrying the digest, e.g. stego_cover_3f2b8c0e9d4a4f6b.png for stego_cover.png"""
+    path = Path(filename)
+    return f"{path.stem}_{digest[:16]}{path.suffix}"
+
+class OutputStore:
+    """Output files, each with an expiry time, removed oldest-used first over a size quota
+
+    Files are written to the output folder and handed to a storage backend
+    (by default the folder itself). An SQLite index records the size, last
+    download and expiry of every file, so all server processes (and job
+    workers) sharing it agree on usage. Files that appear in the backend
+    without being added, such as those of older versions or of other nodes,
+    are adopted with the default TTL by reap().
+    """
+
+    def __init__(self, folder, index_path, ttl, quota_bytes, backend=None):
+        self.folder = folder
+        self.index_path = index_path
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self.backend = backend or storage.LocalBackend(folder)
+        os.makedirs(folder, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+            conn.execute(COUNTERS_SCHEMA)
+            # Indexes created before downloads had ETags lack the column
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(outputs)')]
+            if 'sha256' not in columns:
+                conn.execute('ALTER TABLE outputs ADD COLUMN sha256 TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS outputs_last_access ON outputs (last_access)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _count(self, conn, name, amount):
+        if amount:
+            conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def _delete(self, conn, names):
+        for name in names:
+            self.backend.delete(name)
+            conn.execute("DELETE FROM outputs WHERE name = ?", (name,))
+
+    def add(self, name, ttl=None):
+        """Store a file just written to the output folder and return its expiry time
+
+        Evicts other files straight away if the store is now over quota.
+        """
+        now = time.time()
+        expires_at = now + (ttl or self.ttl)
+        path = os.path.join(self.folder, name)
+        size = os.path.getsize(path)
+        # Hashed while the file is still local; downloads use it as a strong ETag
+        sha256 = file_sha256(path)
+        self.backend.put(name, path)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO outputs (name, size, created_at, last_access, expires_at, sha256) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (name, size, now, now, expires_at, sha256))
+            self._count(conn, 'evicted', self._evict(conn, keep=name))
+        return expires_at
+
+    def sha256(self, name):
+        """SHA-256 of a stored file, or None if it is unknown
+
+        Local files adopted by reap() are hashed on first use; remote ones are not.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT sha256 FROM outputs WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        if row['sha256'] is None and self.backend.local:
+            try:
+                sha256 = file_sha256(self.backend.local_path(name))
+            except FileNotFoundError:
+                return None
+            with closing(self._connect()) as conn, conn:
+                conn.execute("UPDATE outputs SET sha256 = ? WHERE name = ?", (sha256, name))
+            return sha256
+        return row['sha256']
+
+    def expires_at(self, name):
+        """Expiry time of a stored file, or None if it is gone (expired, evicted or never stored)"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT expires_at FROM outputs WHERE name = ?", (name,)).fetchone()
+        if row is None or row['expires_at'] <= time.time():
+            return None
+        return row['expires_at']
+
+    def touch(self, name):
+        """Mark a file as just used, moving it to the back of the eviction order"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE outputs SET last_access = ? WHERE name = ?", (time.time(), name))
+
+    def _evict(self, conn, keep=None):
+        """Delete the least recently used files until the store fits the quota; return how many"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM outputs").fetchone()[0]
+        if total <= self.quota_bytes:
+            return 0
+        evicted = 0
+        for row in conn.execute("SELECT name, size FROM outputs ORDER BY last_access").fetchall():
+            if total <= self.quota_bytes:
+                break
+            if row['name'] == keep:
+                continue
+            self._delete(conn, [row['name']])
+            total -= row['size']
+            evicted += 1
+        return evicted
+
+    def reap(self):
+        """Adopt unknown files, drop vanished ones, delete expired files and enforce the quota
+
+        Returns the number of files in each case.
+        """
+        now = time.time()
+        result = {'adopted': 0, 'missing': 0, 'expired': 0, 'evicted': 0}
+        with closing(self._connect()) as conn, conn:
+            known = {row['name'] for row in conn.execute("SELECT name FROM outputs")}
+            present = set()
+            for name, size, modified in self.backend.list():
+                present.add(name)
+                if name not in known:
+                    conn.execute("INSERT OR IGNORE INTO outputs (name, size, created_at, last_access, expires_at) "
+                                 "VALUES (?, ?, ?, ?, ?)", (name, size, modified, modified, modified + self.ttl))
+                    result['adopted'] += 1
+
+            missing = known - present
+            for name in missing:
+                conn.execute("DELETE FROM outputs WHERE name = ?", (name,))
+            result['missing'] = len(missing)
+
+            expired = [row['name'] for row in conn.execute("SELECT name FROM outputs WHERE expires_at <= ?", (now,))]
+            self._delete(conn, expired)
+            result['expired'] = len(expired)
+            result['evicted'] = self._evict(conn)
+
+            for name in ('expired', 'evicted'):
+                self._count(conn, name, result[name])
+            self._count(conn, 'reaps', 1)
+            conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('last_reap_at', ?)", (int(now),))
+        return result
+
+    def reap_uploads(self, folder, max_age):
+        """Delete files older than max_age seconds from a scratch folder (uploads, converted audio)"""
+        removed = 0
+        cutoff = time.time() - max_age
+        if os.path.isdir(folder):
+            for entry in os.scandir(folder):
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    # Removed by the request that owned it in the meantime
+                    continue
+        with closing(self._connect()) as conn, conn:
+            self._count(conn, 'uploads_removed', removed)
+        return removed
+
+    def usage(self):
+        """Current size of the store against the quota, and totals of what has been removed"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS bytes, "
+                               "MIN(last_access) AS oldest_access, MIN(expires_at) AS next_expiry "
+                               "FROM outputs").fetchone()
+            counters = {name: value for name, value in conn.execute("SELECT name, value FROM counters")}
+        return {
+            'files': row['files'],
+            'bytes': row['bytes'],
+            'quota_bytes': self.quota_bytes,
+            'quota_used_percent': round(100 * row['bytes'] / self.quota_bytes, 2) if self.quota_bytes else None,
+            'default_ttl': self.ttl,
+            'oldest_access': row['oldest_access'],
+            'next_expiry': row['next_expiry'],
+            'expired_total': counters.get('expired', 0),
+            'evicted_total': counters.get('evicted', 0),
+            'uploads_removed_total': counters.get('uploads_removed', 0),
+            'reaps_total': counters.get('reaps', 0),
+            'last_reap_at': counters.get('last_reap_at')
+        }
+
+def start_reaper(reap, interval):
+    """Call reap() every interval seconds on a daemon thread and return the thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                reap()
+            except Exception as e:
+                logger.exception("Error reaping output files: %s", e)
+
+    thread = threading.Thread(target=run, name='output-reaper', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,287 @@
+import hashlib
+import logging
+
+import utils
+import metrics
+
+# The payload layout shared by the API and bulk.py, kept free of Flask so that bulk's
+# worker processes do not import the web app:
+#   [encrypted message][0x01][password bytes]
+# Messages under 32 bytes are XOR-encrypted with SHA-256 of the password; longer ones use
+# utils.encrypt_message (AES, optionally compressed).
+
+logger = logging.getLogger(__name__)
+
+def encrypt_message(message, password, use_dictionary=False):
+    try:
+        # Neither the message nor the password is logged, only the size
+        logger.debug("Encrypting message of %d chars/bytes", len(message))
+        
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+            
+        # For very short messages, use simpler encryption
+        if len(message) < 32:
+            logger.debug("Using simple XOR encryption for short message")
+            # Use simple XOR encryption for short messages
+            if isinstance(password, str):
+                password_bytes = password.encode('utf-8')
+            else:
+                password_bytes = password
+                
+            with metrics.stage('encrypt'):
+                key = hashlib.sha256(password_bytes).digest()
+                encrypted = []
+                for i, char in enumerate(message):
+                    key_char = key[i % len(key)]
+                    encrypted_char = char ^ key_char
+                    encrypted.append(encrypted_char)
+            
+            result = bytes(encrypted)
+            logger.debug("XOR encryption result: %d bytes", len(result))
+            return result
+        
+        # Use the utils encrypt_message function for normal messages
+        try:
+            logger.debug("Using AES encryption")
+            return utils.encrypt_message(message, password, use_dictionary=use_dictionary)
+        except Exception as e:
+            # Fallback encryption if utils function fails
+            logger.warning("AES encryption failed: %s, falling back to XOR", e)
+            if isinstance(password, str):
+                password_bytes = password.encode('utf-8')
+            else:
+                password_bytes = password
+                
+            key = hashlib.sha256(password_bytes).digest()
+            encrypted = []
+            for i, char in enumerate(message):
+                key_char = key[i % len(key)]
+                encrypted_char = char ^ key_char
+                encrypted.append(encrypted_char)
+            return bytes(encrypted)
+    except Exception as e:
+        logger.exception("Encryption failed: %s", e)
+        raise
+
+def decrypt_message(encrypted_data, password):
+    try:
+        # Use the decrypt_message function from utils module
+        return utils.decrypt_message(encrypted_data, password)
+    except (AttributeError, ImportError):
+        # Fallback decryption if utils function is not available
+        if isinstance(password, str):
+            password = password.encode('utf-8')
+            
+        key = hashlib.sha256(password).digest()
+        decrypted = []
+        for i, char in enumerate(encrypted_data):
+            key_char = key[i % len(key)]
+            decrypted_char = char ^ key_char
+            decrypted.append(decrypted_char)
+        return bytes(decrypted)
+
+def has_payload_marker(extracted_data):
+    """True if extracted data ends in the 0x01 marker and embedded password every carrier payload has"""
+    index = extracted_data.find(b'\x01')
+    while index != -1:
+        try:
+            password = extracted_data[index + 1:].decode('utf-8')
+            if password and password.isprintable():
+                return True
+        except UnicodeDecodeError:
+            pass
+        index = extracted_data.find(b'\x01', index + 1)
+    return False
+
+def prepare_payload(message, password, use_dictionary=False):
+    """Encrypt a message and append the password, in the layout every carrier hides
+
+    Returns (data to hide, size statistics for the response).
+    """
+    # Get original message size
+    original_size = len(message.encode('utf-8'))
+    
+    # Encrypt the message
+    message_bytes = message.encode('utf-8') if isinstance(message, str) else message
+    encrypted_data = encrypt_message(message_bytes, password, use_dictionary=use_dictionary)
+    
+    # Calculate compression ratio correctly
+    # Format is now: [salt(16)][IV(16)][compression_marker(1)][ciphertext]
+    
+    # Extract compression marker to determine if compression was used
+    if len(encrypted_data) > 32:
+        compression_marker = encrypted_data[32:33]
+        is_compressed = compression_marker != b'\xFF'
+    else:
+        is_compressed = False
+    
+    # Overhead is salt(16) + IV(16) + marker(1) = 33 bytes
+    overhead_size = 33
+    estimated_content_size = max(0, len(encrypted_data) - overhead_size)
+    
+    # For reporting to user
+    compressed_size = estimated_content_size
+    
+    # Calculate compression ratio
+    if is_compressed and original_size > 0:
+        compression_ratio = ((original_size - compressed_size) / original_size) * 100
+    else:
+        compression_ratio = 0  # No compression or invalid size
+    
+    logger.debug("Original size: %d, estimated content size: %d, compression applied: %s, ratio: %.2f%%",
+                 original_size, compressed_size, is_compressed, compression_ratio)
+    
+    # Prepare the data to be hidden
+    # Format: [encrypted data][1 byte: marker][password bytes]
+    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
+    data_to_hide = encrypted_data + b'\x01' + password_bytes
+    
+    return data_to_hide, {
+        'encrypted_size': len(encrypted_data),
+        'message_length': len(message),
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'compression_ratio': compression_ratio
+    }
+
+def decrypt_extracted_data(extracted_data, password, filename, carrier):
+    """Find the embedded password and decrypt data extracted from a carrier
+
+    Returns (response body, HTTP status code).
+    """
+    # Debug info (the hex dump is only formatted when debug logging is on)
+    logger.debug("Extracted data length: %d bytes", len(extracted_data))
+    if len(extracted_data) > 0 and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("First few bytes: %s", bytes(extracted_data[:16]).hex(' '))
+    
+    # Look for embedded password (marker byte 0x01 indicates password follows)
+    embedded_password = None
+    password_found = False
+    encrypted_data = extracted_data
+    
+    # Search for the marker byte
+    for i in range(len(extracted_data) - 1):
+        if extracted_data[i] == 0x01:  # Found marker
+            encrypted_data = extracted_data[:i]
+            try:
+                embedded_password = extracted_data[i+1:].decode('utf-8')
+                password_found = True
+                logger.debug("Found embedded password, encrypted data length: %d bytes", len(encrypted_data))
+                break
+            except UnicodeDecodeError:
+                logger.warning("Failed to decode embedded password, possible corruption")
+    
+    # Always use embedded password if available
+    if password_found:
+        password = embedded_password
+    # Only use provided password if no embedded password was found
+    elif not password:
+        return {
+            'status': 'error', 
+            'message': 'No password provided or found in the file',
+            'filename': filename
+        }, 400
+    
+    # Check if we have any encrypted data
+    if len(encrypted_data) < 1:  # Just check that we have some data
+        logger.debug("No encrypted data found: %d bytes", len(encrypted_data))
+        return {
+            'status': 'error',
+            'filename': filename,
+            'message': "No valid encrypted data found. The file may not contain a hidden message.",
+            'message_length': 0,
+            'password_found': password_found,
+            'used_password': password if password_found else None
+        }, 200
+    
+    # Try simple XOR decryption first for legacy/small messages
+    try:
+        logger.debug("Trying XOR decryption")
+        # Simple XOR encryption/decryption
+        if isinstance(password, str):
+            password_bytes = password.encode('utf-8')
+        else:
+            password_bytes = password
+        
+        key = hashlib.sha256(password_bytes).digest()
+        decrypted = []
+        for i, char in enumerate(encrypted_data):
+            key_char = key[i % len(key)]
+            decrypted_char = char ^ key_char
+            decrypted.append(decrypted_char)
+        
+        decrypted_bytes = bytes(decrypted)
+        
+        # Try to convert to string
+        try:
+            decrypted_message = decrypted_bytes.decode('utf-8')
+            # If it decodes as valid UTF-8, it's likely the correct message
+            logger.debug("Decoded message using XOR")
+            
+            return {
+                'status': 'success',
+                'filename': filename,
+                'message': decrypted_message,
+                'message_length': len(decrypted_message),
+                'password_found': password_found,
+                'used_password': password if password_found else None
+            }, 200
+        except UnicodeDecodeError:
+            # Not valid UTF-8, try AES decryption next
+            logger.debug("XOR result not valid UTF-8, trying AES decryption")
+            pass
+        
+        # Fall through to AES if the XOR result isn't valid UTF-8
+    except Exception as e:
+        logger.debug("XOR decryption failed: %s", e)
+    
+    # Try AES decryption if XOR didn't work
+    try:
+        # Only try AES if we have enough data
+        if len(encrypted_data) >= 33:  # Need at least salt(16) + IV(16) + 1 byte
+            logger.debug("Trying AES decryption")
+            decrypted_message = utils.decrypt_message(encrypted_data, password)
+            
+            # Convert to string if it's bytes
+            if isinstance(decrypted_message, bytes):
+                try:
+                    message_str = decrypted_message.decode('utf-8')
+                except UnicodeDecodeError:
+                    message_str = f"Binary data (could not decode as UTF-8): {decrypted_message.hex()[:50]}..."
+            else:
+                message_str = str(decrypted_message)
+            
+            # Check if the decrypted message contains an error indication
+            has_error = isinstance(message_str, str) and "error" in message_str.lower()
+            
+            return {
+                'status': 'warning' if has_error else 'success',
+                'filename': filename,
+                'message': message_str,
+                'message_length': len(message_str),
+                'password_found': password_found,
+                'used_password': password if password_found else None,
+                'encryption_method': 'AES-256',
+                'hiding_technique': carrier.hiding_technique
+            }, 200
+        else:
+            # Not enough data for AES, and XOR didn't work
+            return {
+                'status': 'error',
+                'filename': filename,
+                'message': "Not enough data for AES decryption and XOR decryption failed.",
+                'message_length': 0,
+                'password_found': password_found,
+                'used_password': password if password_found else None
+            }, 200
+    except Exception as e:
+        logger.error("AES decryption failed: %s", e)
+        return {
+            'status': 'error',
+            'filename': filename,
+            'message': f"Decryption error: {str(e)}",
+            'message_length': 0,
+            'password_found': password_found,
+            'used_password': password if password_found else None
+        }, 200
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import uuid
+import cProfile
+import threading
+import tracemalloc
+
+# Allocation sites listed in each memory report
+TOP_ALLOCATIONS = 25
+
+# tracemalloc traces the whole process, so only one request is profiled at a time
+_lock = threading.Lock()
+
+class Profile:
+    """cProfile and tracemalloc around one request, on the thread serving it"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.started_tracing = False
+        self.started = None
+        self.peak = None
+        self.baseline = None
+        self.allocations = None
+        self.seconds = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            # Stopped again in stop(); tracing set up by someone else is left running
+            tracemalloc.start()
+            self.started_tracing = True
+        tracemalloc.reset_peak()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.seconds = time.perf_counter() - self.started
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(0, peak - self.baseline)
+        statistics = tracemalloc.take_snapshot().statistics('lineno')
+        self.allocations = [{'location': str(stat.traceback), 'size_bytes': stat.size, 'count': stat.count}
+                            for stat in statistics[:TOP_ALLOCATIONS]]
+        if self.started_tracing:
+            tracemalloc.stop()
+
+    def save(self, folder, label, info):
+        """Write <name>.prof (pstats) and <name>.json (peak memory, time, top allocations); return name"""
+        os.makedirs(folder, exist_ok=True)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}_{label}_{uuid.uuid4().hex[:8]}"
+        self.profiler.dump_stats(os.path.join(folder, f"{name}.prof"))
+        report = {
+            'name': name,
+            'created_at': time.time(),
+            'total_ms': round(self.seconds * 1000, 3),
+            'peak_memory_bytes': self.peak,
+            **info,
+            'top_allocations': self.allocations
+        }
+        with open(os.path.join(folder, f"{name}.json"), 'w') as f:
+            json.dump(report, f, indent=2)
+        return name
+
+def start():
+    """Start profiling the current request and return its Profile, or None if another request is being profiled"""
+    if not _lock.acquire(blocking=False):
+        return None
+    try:
+        profile = Profile()
+        profile.start()
+    except Exception:
+        _lock.release()
+        raise
+    return profile
+
+def finish(profile):
+    """Stop a Profile returned by start() and let the next request be profiled"""
+    try:
+        profile.stop()
+    finally:
+        _lock.release()
+
+def list_profiles(folder):
+    """Reports in folder, newest first, without their allocation lists"""
+    reports = []
+    if os.path.isdir(folder):
+        for entry in os.scandir(folder):
+            if entry.name.endswith('.json'):
+                try:
+                    with open(entry.path) as f:
+                        report = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                report.pop('top_allocations', None)
+                reports.append(report)
+    return sorted(reports, key=lambda report: report.get('created_at', 0), reverse=True)
+
+def prune(folder, keep):
+    """Delete all but the newest keep reports (both files of each); return how many were deleted"""
+    removed = 0
+    for report in list_profiles(folder)[keep:]:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(folder, f"{report['name']}{suffix}"))
+            except FileNotFoundError:
+                pass
+        removed += 1
+    return removed
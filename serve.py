@@ -0,0 +1,175 @@
+import os
+import sys
+import random
+import logging
+import argparse
+import threading
+import importlib.util
+
+import flask
+
+import api
+
+logger = logging.getLogger(__name__)
+
+# Requests that run the steganography engine in the worker itself; async jobs run in the job pools
+HEAVY_ENDPOINTS = api.TRACED_ENDPOINTS + ('encrypt_batch', 'decrypt_batch')
+DEFAULT_BIND = '0.0.0.0:8080'
+DEFAULT_MAX_HEAVY_REQUESTS = 200  # Heavy requests before a gunicorn worker is replaced (0 disables)
+DEFAULT_TIMEOUT = 120  # Seconds a gunicorn worker may spend on one request, enough for large carriers
+# Machine-wide defaults that are divided between the server processes unless the config sets them
+SHARED_SETTINGS = ('ADMISSION_DEFAULT_LIMIT', 'ADMISSION_MEMORY_BUDGET', 'JOB_DEFAULT_WORKERS')
+
+def available_server():
+    """The WSGI server to use by default: gunicorn where it runs (POSIX), else waitress"""
+    if os.name == 'posix' and importlib.util.find_spec('gunicorn'):
+        return 'gunicorn'
+    if importlib.util.find_spec('waitress'):
+        return 'waitress'
+    return None
+
+def cpu_count():
+    """Cores this process may run on (its affinity mask where the platform has one)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def default_workers(server, cores=None):
+    """Server processes: one per core under gunicorn, since hiding and extraction hold the GIL"""
+    return (cores or cpu_count()) if server == 'gunicorn' else 1
+
+def default_threads(server, cores=None):
+    """Threads per server process
+
+    gunicorn workers get 4, so slow uploads and downloads do not leave a core idle. waitress
+    serves everything from one process, so it gets 2 per core (at least 4).
+    """
+    if server == 'gunicorn':
+        return 4
+    return max(4, 2 * (cores or cpu_count()))
+
+def user_settings(config):
+    """The settings in config, a dict or the path of a Python config file"""
+    if isinstance(config, str):
+        settings = flask.Config(os.getcwd())
+        settings.from_pyfile(os.path.abspath(config))
+        return dict(settings)
+    return dict(config or {})
+
+def worker_settings(config, workers, cores=None):
+    """config, plus each server process's share of the SHARED_SETTINGS it does not set
+
+    Every process has its own admission controller and job pools. Left at their defaults of one
+    slot and one job process per core and a 2 GiB memory budget, workers processes would admit
+    workers times that between them.
+    """
+    cores = cores or cpu_count()
+    settings = {
+        'ADMISSION_DEFAULT_LIMIT': max(1, cores // workers),
+        'ADMISSION_MEMORY_BUDGET': api.app.config['ADMISSION_MEMORY_BUDGET'] // workers,
+        'JOB_DEFAULT_WORKERS': max(1, cores // workers),
+    }
+    settings.update(user_settings(config))
+    return settings
+
+def heavy_paths(app, endpoints=HEAVY_ENDPOINTS):
+    """URL paths of the given endpoints"""
+    return {rule.rule for rule in app.url_map.iter_rules() if rule.endpoint in endpoints}
+
+def load_app(config=None):
+    """Create the app and load its heavy backends, in the process that will fork the workers"""
+    app = api.create_app(config)
+    api.setup_logging()
+    api.warm_up()
+    return app
+
+class HeavyRequestRecycler:
+    """gunicorn hooks that replace a worker after it served about max_heavy_requests heavy requests
+
+    Large carriers leave a fragmented heap behind that the worker never returns to the OS.
+    gunicorn's own max_requests counts every request, health checks included; this counts only
+    the paths in paths. Each worker draws its limit from up to jitter more, so that workers
+    started together are not all replaced at once. The counts of a threaded worker are
+    approximate.
+    """
+
+    def __init__(self, paths, max_heavy_requests=DEFAULT_MAX_HEAVY_REQUESTS, jitter=None):
+        self.paths = set(paths)
+        self.max_heavy_requests = max_heavy_requests
+        self.jitter = max_heavy_requests // 10 if jitter is None else jitter
+        self.lock = threading.Lock()
+
+    def post_fork(self, server, worker):
+        worker.heavy_requests = 0
+        worker.max_heavy_requests = self.max_heavy_requests + random.randint(0, self.jitter)
+
+    def post_request(self, worker, req, environ, resp):
+        if self.max_heavy_requests <= 0 or environ.get('PATH_INFO') not in self.paths:
+            return
+        with self.lock:
+            worker.heavy_requests += 1
+            if worker.heavy_requests >= worker.max_heavy_requests and worker.alive:
+                # Like max_requests: the worker finishes its open requests, then the arbiter starts a new one
+                worker.log.info("Worker %s served %d heavy requests, restarting", worker.pid, worker.heavy_requests)
+                worker.alive = False
+
+def gunicorn_options(bind, workers, threads, max_heavy_requests=DEFAULT_MAX_HEAVY_REQUESTS, timeout=DEFAULT_TIMEOUT):
+    """Settings of the bundled gunicorn runner"""
+    recycler = HeavyRequestRecycler(heavy_paths(api.app), max_heavy_requests)
+    return {
+        'bind': bind,
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        # Import the app and its backends once in the master, so the forked workers share them
+        'preload_app': True,
+        'timeout': timeout,
+        'post_fork': recycler.post_fork,
+        'post_request': recycler.post_request,
+    }
+
+def run_gunicorn(config, options):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app(config)
+
+    Application().run()
+
+def run_waitress(config, bind, threads):
+    # waitress has one process, so there is nothing to fork or recycle
+    import waitress
+    waitress.serve(load_app(config), listen=bind, threads=threads)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the API under gunicorn or waitress')
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'waitress'), default='auto',
+                        help='WSGI server (auto: gunicorn on POSIX, else waitress)')
+    parser.add_argument('--bind', default=DEFAULT_BIND, help='host:port to listen on')
+    parser.add_argument('--config', help='Python file of app.config settings, e.g. production.cfg')
+    parser.add_argument('--workers', type=int, help='Server processes (gunicorn; default one per core)')
+    parser.add_argument('--threads', type=int, help='Threads per server process (default from the core count)')
+    parser.add_argument('--max-heavy-requests', type=int, default=DEFAULT_MAX_HEAVY_REQUESTS,
+                        help='Replace a gunicorn worker after this many encrypt/decrypt/QR/batch requests (0: never)')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help='gunicorn worker timeout in seconds')
+    args = parser.parse_args(argv)
+
+    server = available_server() if args.server == 'auto' else args.server
+    if server is None:
+        parser.error("neither gunicorn nor waitress is installed (pip install gunicorn, or waitress on Windows)")
+    threads = args.threads or default_threads(server)
+    if server == 'gunicorn':
+        workers = args.workers or default_workers(server)
+        run_gunicorn(worker_settings(args.config, workers),
+                     gunicorn_options(args.bind, workers, threads, args.max_heavy_requests, args.timeout))
+    else:
+        run_waitress(worker_settings(args.config, 1), args.bind, threads)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
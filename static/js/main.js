@@ -194,7 +194,8 @@ $(document).ready(function() {
         var formData = new FormData(this);
         
         // Use different API endpoint based on media type
-        let apiEndpoint = '/api/encrypt';
+        // (image and audio run as background jobs so the button can show progress)
+        let apiEndpoint = '/api/encrypt?async=1';
         if (mediaType === "qr_code") {
             apiEndpoint = '/api/encrypt-qr';
         }
@@ -205,7 +206,16 @@ $(document).ready(function() {
             data: formData,
             contentType: false,
             processData: false,
-            success: function(response) {
+            success: function handleEncryptResponse(response, textStatus, xhr) {
+                if (xhr && xhr.status === 202) {
+                    followJobProgress(response, btn, handleEncryptResponse, function(errorMsg) {
+                        btn.html(originalBtnText);
+                        btn.prop('disabled', false);
+                        showMessage("#encryptionResult", "error", errorMsg);
+                    });
+                    return;
+                }
+                
                 btn.html(originalBtnText);
                 btn.prop('disabled', false);
                 
@@ -323,7 +333,7 @@ $(document).ready(function() {
         var formData = new FormData(this);
         
         // Use different API endpoint based on media type
-        let apiEndpoint = '/api/decrypt';
+        let apiEndpoint = '/api/decrypt?async=1';
         if (mediaType === "qr_code") {
             apiEndpoint = '/api/decrypt-qr';
         }
@@ -334,7 +344,16 @@ $(document).ready(function() {
             data: formData,
             contentType: false,
             processData: false,
-            success: function(response) {
+            success: function handleDecryptResponse(response, textStatus, xhr) {
+                if (xhr && xhr.status === 202) {
+                    followJobProgress(response, btn, handleDecryptResponse, function(errorMsg) {
+                        btn.html(originalBtnText);
+                        btn.prop('disabled', false);
+                        showMessage("#decryptionResult", "error", errorMsg);
+                    });
+                    return;
+                }
+                
                 btn.html(originalBtnText);
                 btn.prop('disabled', false);
                 
@@ -433,6 +452,42 @@ $(document).ready(function() {
         });
     });
     
+    // Follow a background job's event stream, showing its progress on the submit button
+    function followJobProgress(job, btn, onResult, onError) {
+        const stageNames = {embed: "Embedding", extract: "Extracting", frames: "Copying frames", write: "Writing"};
+        const source = new EventSource(job.events_url);
+        
+        source.addEventListener('progress', function(e) {
+            const data = JSON.parse(e.data);
+            let label = data.status === 'queued' ? "Queued..." : "Processing...";
+            if (data.progress) {
+                const stage = stageNames[data.progress.stage] || data.progress.stage;
+                label = data.progress.total
+                    ? `${stage} ${Math.floor(100 * data.progress.done / data.progress.total)}%`
+                    : `${stage}...`;
+            }
+            btn.html(`<div class="loading"><div></div><div></div><div></div></div> ${label}`);
+        });
+        
+        source.addEventListener('done', function(e) {
+            source.close();
+            const finished = JSON.parse(e.data);
+            if (finished.status === 'succeeded') {
+                onResult(finished.result);
+            } else {
+                onError(finished.error || "The job failed");
+            }
+        });
+        
+        // Server-sent error events carry data; connection errors are retried by the browser
+        source.addEventListener('error', function(e) {
+            if (e.data) {
+                source.close();
+                onError(JSON.parse(e.data).message);
+            }
+        });
+    }
+    
     // Function to reset form UI after submission
     function resetFormUI(form) {
         // Reset file drop area
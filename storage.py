@@ -0,0 +1,181 @@
+import os
+import abc
+import shutil
+
+# Bytes read at a time when streaming a stored file to a client
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+class StorageBackend(abc.ABC):
+    """Where output files live once written, so any server node can serve them
+
+    Files are always written to a local path first; put() hands them to the
+    backend. Names are plain file names (no directories).
+    """
+
+    # True if files are kept at local_path(name) and can be served straight from disk
+    local = False
+
+    @abc.abstractmethod
+    def put(self, name, path):
+        """Store the local file at path under name, taking ownership of it"""
+
+    @abc.abstractmethod
+    def open(self, name):
+        """Return a binary file object reading the stored file; raises FileNotFoundError if it is missing"""
+
+    @abc.abstractmethod
+    def size(self, name):
+        """Size in bytes of a stored file; raises FileNotFoundError if it is missing"""
+
+    @abc.abstractmethod
+    def delete(self, name):
+        """Remove a stored file, if it exists"""
+
+    @abc.abstractmethod
+    def list(self):
+        """Yield (name, size, modified time) for every stored file"""
+
+    def iter_chunks(self, name, chunk_size=STREAM_CHUNK_SIZE, start=0, end=None):
+        """Yield bytes start to end (exclusive; None for the end of the file) of a stored file in chunks
+
+        Serving a file this way needs at most chunk_size bytes of memory.
+        """
+        with self.open(name) as f:
+            f.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+class LocalBackend(StorageBackend):
+    """Files in a folder of the local disk (or a volume shared by all nodes)"""
+
+    local = True
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def local_path(self, name):
+        return os.path.join(self.folder, name)
+
+    def put(self, name, path):
+        target = self.local_path(name)
+        if os.path.abspath(path) != os.path.abspath(target):
+            shutil.move(path, target)
+
+    def open(self, name):
+        return open(self.local_path(name), 'rb')
+
+    def size(self, name):
+        return os.path.getsize(self.local_path(name))
+
+    def delete(self, name):
+        try:
+            os.remove(self.local_path(name))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                stat = entry.stat()
+                yield entry.name, stat.st_size, stat.st_mtime
+
+class S3Backend(StorageBackend):
+    """Files in an S3-compatible bucket (AWS S3, MinIO, ...), under an optional key prefix
+
+    Needs boto3. Credentials come from the usual AWS environment variables or
+    configuration files. Uploads use multipart transfers and downloads are
+    streamed, so large files never sit in memory whole.
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region_name=None, client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self._client = client
+
+    def __getstate__(self):
+        # Job workers receive the backend pickled; they make their own client
+        state = self.__dict__.copy()
+        state['_client'] = None
+        return state
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("The S3 storage backend needs boto3 (pip install boto3)")
+            self._client = boto3.client('s3', endpoint_url=self.endpoint_url, region_name=self.region_name)
+        return self._client
+
+    def key(self, name):
+        return f"{self.prefix}{name}"
+
+    def _missing(self, error):
+        return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def put(self, name, path):
+        self.client.upload_file(path, self.bucket, self.key(name))
+        os.remove(path)
+
+    def open(self, name, byte_range=None):
+        from botocore.exceptions import ClientError
+        kwargs = {'Range': byte_range} if byte_range else {}
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(name), **kwargs)['Body']
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(name)
+            raise
+
+    def size(self, name):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(name))['ContentLength']
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(name)
+            raise
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def list(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                name = item['Key'][len(self.prefix):]
+                # Only files directly under the prefix, like the local folder
+                if name and '/' not in name:
+                    yield name, item['Size'], item['LastModified'].timestamp()
+
+    def iter_chunks(self, name, chunk_size=STREAM_CHUNK_SIZE, start=0, end=None):
+        # Only the requested bytes are fetched from the bucket
+        byte_range = None
+        if start or end is not None:
+            byte_range = f"bytes={start}-{'' if end is None else end - 1}"
+        body = self.open(name, byte_range)
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+def create_backend(kind, folder, bucket=None, prefix='', endpoint_url=None, region_name=None):
+    """Return the backend named by kind: 'local' (files stay in folder) or 's3'"""
+    if kind == 'local':
+        return LocalBackend(folder)
+    if kind == 's3':
+        if not bucket:
+            raise ValueError("The S3 storage backend needs a bucket")
+        return S3Backend(bucket, prefix=prefix, endpoint_url=endpoint_url, region_name=region_name)
+    raise ValueError(f"Unknown storage backend {kind}")
@@ -0,0 +1,144 @@
+import io
+import os
+import sys
+import wave
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import admission
+from test_carriers import make_png
+
+def make_wav(frames=1000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as audio_file:
+        audio_file.setnchannels(2)
+        audio_file.setsampwidth(2)
+        audio_file.setframerate(44100)
+        audio_file.writeframes(b'\x00' * frames * 4)
+    return buffer.getvalue()
+
+class TestMemoryEstimates(unittest.TestCase):
+    def test_estimates_from_headers(self):
+        """Test estimates come from image dimensions and WAV sample counts, with a fallback."""
+        stream = io.BytesIO(make_png(64, 48))
+        self.assertEqual(admission.estimate_memory('image', stream), 64 * 48 * 4 * admission.IMAGE_MEMORY_FACTOR)
+        self.assertEqual(stream.tell(), 0)
+
+        stream = io.BytesIO(make_wav(1000))
+        self.assertEqual(admission.estimate_memory('audio', stream), 4000 * admission.AUDIO_MEMORY_FACTOR)
+        self.assertEqual(admission.estimate_memory('audio', io.BytesIO(b'ID3' + b'\x00' * 97)),
+                         100 * admission.COMPRESSED_AUDIO_EXPANSION * admission.AUDIO_MEMORY_FACTOR)
+        self.assertEqual(admission.estimate_memory('image', io.BytesIO(b'not an image')),
+                         12 * admission.FALLBACK_MEMORY_FACTOR)
+
+class TestAdmissionController(unittest.TestCase):
+    def controller(self, **kwargs):
+        options = {'limits': {'audio': 1}, 'default_limit': 2, 'memory_budget': 100, 'max_queue': 1, 'timeout': 0}
+        options.update(kwargs)
+        return admission.AdmissionController(**options)
+
+    def test_zero_limit_disables_media_type(self):
+        """Test a limit of 0 rejects every request of that media type with a fixed retry hint."""
+        controller = self.controller(limits={'audio': 0})
+        with self.assertRaises(admission.Saturated) as context:
+            controller.acquire('audio', 10)
+        self.assertEqual(context.exception.retry_after, admission.DISABLED_RETRY_AFTER)
+        controller.acquire('image', 10).release()
+        with self.assertRaises(ValueError):
+            self.controller(limits={'audio': -1})
+
+    def test_concurrency_limit(self):
+        """Test requests over the per-media-type limit are rejected with a retry hint."""
+        controller = self.controller()
+        ticket = controller.acquire('audio', 10)
+        with self.assertRaises(admission.Saturated) as context:
+            controller.acquire('audio', 10)
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        # Other media types have their own slots
+        controller.acquire('image', 10).release()
+
+        ticket.release()
+        ticket.release()
+        with controller.acquire('audio', 10):
+            pass
+        snapshot = controller.snapshot()
+        self.assertEqual(snapshot['media_types']['audio']['admitted_total'], 2)
+        self.assertEqual(snapshot['media_types']['audio']['rejected_total'], 1)
+        self.assertEqual(snapshot['memory_in_use'], 0)
+
+    def test_memory_budget(self):
+        """Test the memory budget is shared, but a lone oversized request still runs."""
+        controller = self.controller()
+        with controller.acquire('image', 60):
+            with self.assertRaises(admission.Saturated):
+                controller.acquire('image', 60)
+        with controller.acquire('image', 500):
+            self.assertEqual(controller.snapshot()['memory_in_use'], 500)
+
+    def test_waiting_for_a_slot(self):
+        """Test a queued request is admitted when a slot frees up within its timeout."""
+        controller = self.controller(timeout=5)
+        ticket = controller.acquire('audio', 10)
+        admitted = []
+        waiter = threading.Thread(target=lambda: admitted.append(controller.acquire('audio', 10)))
+        waiter.start()
+        while controller.snapshot()['media_types']['audio']['waiting'] == 0:
+            pass
+        # The queue holds one request, so a third is turned away at once
+        with self.assertRaises(admission.Saturated):
+            controller.acquire('audio', 10)
+        ticket.release()
+        waiter.join(5)
+        self.assertEqual(len(admitted), 1)
+        self.assertEqual(controller.snapshot()['media_types']['audio']['max_waiting'], 1)
+
+class TestAdmissionEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        self.controller = admission.AdmissionController({'image': 1}, 1, 1024 ** 3, max_queue=0, timeout=0)
+        patcher = patch('api._admission', self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def encrypt(self):
+        return self.app.post('/api/encrypt', data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'secret two',
+            'password': 'Fixed-Pass-123'
+        })
+
+    def test_saturated_requests_get_429(self):
+        """Test a saturated node answers 429 with Retry-After and frees slots after each request."""
+        ticket = self.controller.acquire('image', 0)
+        response = self.encrypt()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        response = self.app.post('/api/decrypt?inline=1', data={'file': (io.BytesIO(make_png()), 'stego.png')})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json['status'], 'error')
+
+        ticket.release()
+        self.assertEqual(self.encrypt().status_code, 200)
+        self.assertEqual(self.encrypt().status_code, 200)
+        snapshot = self.app.get('/api/admission').json
+        self.assertEqual(snapshot['media_types']['image']['in_flight'], 0)
+        self.assertEqual(snapshot['media_types']['image']['rejected_total'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,7 +42,7 @@ class TestAPIEndpoints(unittest.TestCase):
 
     @patch('utils.convert_and_hide_in_image')
     @patch('utils.generate_strong_password')
-    @patch('api.encrypt_message')
+    @patch('payload.encrypt_message')
     @patch('os.path.getsize')
     @patch('mimetypes.guess_type', return_value=('image/png', None))
     def test_encrypt_api_endpoint(self, mock_mimetype, mock_getsize, mock_encrypt, mock_gen_password, mock_hide_data):
@@ -147,5 +147,44 @@ class TestAPIEndpoints(unittest.TestCase):
             self.assertEqual(response.status_code, 200)
             mock_send.assert_called_once()
 
+    def test_inline_encrypt_decrypt_round_trip(self):
+        """Test ?inline=1 returns the stego image in the body and never saves the upload."""
+        from PIL import Image
+        cover = io.BytesIO()
+        Image.new('RGB', (64, 64), (120, 80, 40)).save(cover, format='PNG')
+        message = 'An inline secret message that is longer than thirty-two bytes'
+
+        # Fixed salt/IV: the null-terminated carrier format cannot hold ciphertext with 0x00 bytes
+        with patch('werkzeug.datastructures.FileStorage.save') as mock_save, \
+             patch('utils.os.urandom', side_effect=lambda n: b'\x5a' * n), \
+             patch('utils.generate_strong_password', return_value='Fixed-Pass-123'):
+            response = self.app.post(
+                '/api/encrypt?inline=1',
+                data={
+                    'file': (io.BytesIO(cover.getvalue()), 'cover.png'),
+                    'message': message,
+                    'auto_generate': 'true',
+                    'media_type': 'image'
+                },
+                content_type='multipart/form-data'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'image/png')
+            self.assertEqual(response.headers['X-Stego-Output-Filename'], 'stego_cover.png')
+            self.assertIn('X-Stego-Auto-Generated-Password', response.headers)
+            self.assertTrue(response.data.startswith(b'\x89PNG'))
+
+            response = self.app.post(
+                '/api/decrypt?inline=1',
+                data={
+                    'file': (io.BytesIO(response.data), 'stego_cover.png'),
+                    'media_type': 'auto'
+                },
+                content_type='multipart/form-data'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json['message'], message)
+            mock_save.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,182 @@
+import io
+import os
+import sys
+import json
+import shutil
+import zipfile
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import jobs
+import utils
+import carriers
+import payload
+from test_carriers import make_png
+
+class TestEncryptBatch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        self.manager = jobs.JobManager(jobs.JobStore(os.path.join(self.temp_dir, 'jobs.sqlite3')), default_workers=2)
+        patcher = patch('api._job_manager', self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.dict(api.app.config, {'OUTPUT_FOLDER': self.temp_dir,
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.manager.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def post_batch(self, query='', count=3):
+        files = [(io.BytesIO(make_png(64, 48)), f"cover{i}.png") for i in range(count)]
+        # Two uploads with the same name must not overwrite each other
+        files.append((io.BytesIO(make_png(64, 48)), 'cover0.png'))
+        with patch('payload.encrypt_message', wraps=payload.encrypt_message) as mock_encrypt:
+            response = self.app.post(
+                f"/api/encrypt-batch{query}",
+                data={'files': files, 'message': 'one message for every cover', 'password': 'batchpassword'},
+                content_type='multipart/form-data'
+            )
+            data = response.get_data()
+        self.assertEqual(mock_encrypt.call_count, 1)
+        return response, data
+
+    def test_zip_output(self):
+        """Test the batch is encrypted once and streamed back as a ZIP with a manifest."""
+        response, data = self.post_batch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/zip')
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            names = set(archive.namelist())
+            self.assertEqual(names, {'stego_cover0.png', 'stego_cover1.png', 'stego_cover2.png',
+                                     'stego_cover0_3.png', 'manifest.json'})
+            manifest = json.loads(archive.read('manifest.json'))
+            extracted = {utils.extract_data_from_image(io.BytesIO(archive.read(name)))
+                         for name in names if name.endswith('.png')}
+
+        self.assertEqual(manifest['count'], 4)
+        self.assertEqual(manifest['failed'], 0)
+        self.assertTrue(all(item['embed_seconds'] >= 0 for item in manifest['items']))
+        # Every file carries the same encrypted payload
+        self.assertEqual(len(extracted), 1)
+        # ZIP mode leaves nothing behind in the output folder
+        self.assertFalse([name for name in os.listdir(self.temp_dir) if name.endswith('.png')])
+
+    def test_url_output(self):
+        """Test ?output=urls keeps the files for download and reports per-item timing."""
+        response, _ = self.post_batch('?output=urls', count=2)
+        self.assertEqual(response.status_code, 200)
+        body = response.json
+        self.assertEqual(body['count'], 3)
+        for item in body['items']:
+            self.assertEqual(item['status'], 'success')
+            self.assertIn('embed_seconds', item)
+            self.assertTrue(os.path.exists(os.path.join(self.temp_dir, item['output_filename'])))
+            self.assertIn('expires_at', item)
+            self.assertEqual(item['download_url'], f"/api/download/{item['output_filename']}")
+
+    def test_item_errors(self):
+        """Test a carrier that is too small fails on its own without failing the batch."""
+        response = self.app.post(
+            '/api/encrypt-batch?output=urls',
+            data={
+                'files': [(io.BytesIO(make_png(64, 48)), 'big.png'), (io.BytesIO(make_png(4, 4)), 'tiny.png')],
+                'message': 'one message for every cover',
+                'password': 'batchpassword'
+            },
+            content_type='multipart/form-data'
+        )
+        self.assertEqual(response.status_code, 200)
+        statuses = {item['original_filename']: item['status'] for item in response.json['items']}
+        self.assertEqual(statuses, {'big.png': 'success', 'tiny.png': 'error'})
+        self.assertEqual(response.json['failed'], 1)
+
+    def test_validation(self):
+        """Test missing files and unknown output modes are rejected."""
+        response = self.app.post('/api/encrypt-batch', data={'message': 'x', 'password': 'y'},
+                                 content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        response = self.app.post('/api/encrypt-batch?output=tar',
+                                 data={'files': [(io.BytesIO(make_png()), 'a.png')], 'message': 'x', 'password': 'y'},
+                                 content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+
+def make_stego_png(message='hidden note', password='Fixed-Pass-123'):
+    """Return PNG bytes hiding a message the way /api/encrypt does
+
+    Messages are picked so their ciphertext has no 0x00 or 0x01 bytes, which
+    the legacy payload format would read as terminator or password marker.
+    """
+    data_to_hide, _ = payload.prepare_payload(message, password)
+    return carriers.get_carrier('image').embed(make_png(64, 48), data_to_hide)
+
+class TestDecryptBatch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        self.manager = jobs.JobManager(jobs.JobStore(os.path.join(self.temp_dir, 'jobs.sqlite3')), default_workers=2)
+        patcher = patch('api._job_manager', self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.manager.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def post_batch(self, files, **form):
+        response = self.app.post('/api/decrypt-batch', data={'files': files, **form},
+                                 content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines[-1]['type'], 'summary')
+        return {line['filename']: line for line in lines[:-1]}, lines[-1]
+
+    def test_files(self):
+        """Test stego files are decrypted, plain media is reported and non-media is skipped by its header."""
+        items, summary = self.post_batch([
+            (io.BytesIO(b'just some notes'), 'notes.txt'),
+            (io.BytesIO(make_stego_png()), 'stego.png'),
+            (io.BytesIO(make_png(64, 48)), 'plain.png'),
+        ])
+        self.assertEqual(items['notes.txt']['status'], 'skipped')
+        self.assertEqual(items['stego.png']['status'], 'success')
+        self.assertEqual(items['stego.png']['message'], 'hidden note')
+        self.assertIn('decrypt_seconds', items['stego.png'])
+        self.assertEqual(items['plain.png']['status'], 'not_stego')
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['statuses'], {'skipped': 1, 'success': 1, 'not_stego': 1})
+        self.assertEqual(os.listdir(api.app.config['UPLOAD_FOLDER']), [])
+
+    def test_zip_upload(self):
+        """Test a ZIP upload is unpacked into one result per member."""
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('batch/one.png', make_stego_png('secret one'))
+            zf.writestr('batch/two.png', make_stego_png('secret two'))
+            zf.writestr('batch/', b'')
+        items, summary = self.post_batch([(io.BytesIO(archive.getvalue()), 'batch.zip')])
+        self.assertEqual({name: item['message'] for name, item in items.items()},
+                         {'one.png': 'secret one', 'two.png': 'secret two'})
+        self.assertEqual(summary['count'], 2)
+
+    def test_too_many_files(self):
+        """Test batches over the file limit are rejected without leaving uploads behind."""
+        with patch.dict(api.app.config, {'BATCH_MAX_FILES': 1}):
+            response = self.app.post('/api/decrypt-batch', data={'files': [
+                (io.BytesIO(make_png()), 'a.png'), (io.BytesIO(make_png()), 'b.png')
+            ]}, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(api.app.config['UPLOAD_FOLDER']), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import wave
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+TINY_PROFILE = {
+    'image_megapixels': (0.01,),
+    'audio_seconds': (1,),
+    'payload_bytes': (32, 512),
+    'qr_payload_bytes': (16,),
+}
+
+class TestBenchmarkCorpus(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_payload_has_no_terminator_and_is_deterministic(self):
+        data = benchmark.payload(4096)
+        self.assertEqual(len(data), 4096)
+        self.assertNotIn(0, data)
+        self.assertEqual(data, benchmark.payload(4096))
+
+    def test_generated_carriers(self):
+        with patch.dict(benchmark.PROFILES, {'tiny': TINY_PROFILE}):
+            files = benchmark.corpus_files('tiny', self.temp_dir)
+
+        with Image.open(files['0.01mp']) as img:
+            self.assertEqual(img.size, benchmark.image_size(0.01))
+            self.assertEqual(img.mode, 'RGB')
+        with wave.open(files['1s'], 'rb') as audio_file:
+            self.assertEqual(audio_file.getnframes(), 44100)
+            self.assertEqual(audio_file.getnchannels(), 2)
+            self.assertEqual(audio_file.getsampwidth(), 2)
+
+    def test_existing_carriers_are_reused(self):
+        with patch.dict(benchmark.PROFILES, {'tiny': TINY_PROFILE}):
+            path = benchmark.corpus_files('tiny', self.temp_dir)['1s']
+            modified = os.path.getmtime(path)
+            os.utime(path, (modified - 100, modified - 100))
+            benchmark.corpus_files('tiny', self.temp_dir)
+        self.assertEqual(os.path.getmtime(path), modified - 100)
+
+class TestBenchmarkRun(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_run_writes_results_and_skips_oversized_payloads(self):
+        output = os.path.join(self.temp_dir, 'results.json')
+        with patch.dict(benchmark.PROFILES, {'tiny': TINY_PROFILE}):
+            code = benchmark.main(['run', '--profile', 'tiny', '--corpus-dir', self.temp_dir, '--repeat', '1',
+                                   '--only', 'hide', '--output', output])
+        self.assertEqual(code, 0)
+
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(results['meta']['profile'], 'tiny')
+        cases = results['results']
+        # A 0.01 MP image holds 3749 bytes, so both payloads fit; extract cases were filtered out
+        self.assertIn('image_hide/0.01mp/512B', cases)
+        self.assertIn('audio_hide/1s/512B', cases)
+        self.assertNotIn('image_extract/0.01mp/32B', cases)
+
+        result = cases['image_hide/0.01mp/512B']
+        self.assertGreater(result['seconds'], 0)
+        self.assertGreater(result['carrier_mb_per_s'], 0)
+        self.assertGreater(result['payload_bits_per_s'], 0)
+        self.assertGreater(result['peak_memory_bytes'], 0)
+
+    def test_oversized_payloads_are_skipped(self):
+        path = benchmark.make_image(os.path.join(self.temp_dir, 'small.png'), 0.0001)
+        cases = benchmark.image_cases('small', path, (4, 1024), self.temp_dir)
+        self.assertEqual([case.name for case in cases], ['image_hide/small/4B', 'image_extract/small/4B'])
+
+class TestBenchmarkCompare(unittest.TestCase):
+    def results(self, seconds, peak):
+        return {'meta': {}, 'results': {'case': {'seconds': seconds, 'peak_memory_bytes': peak}}}
+
+    def test_slower_case_is_a_regression(self):
+        regressions = benchmark.compare(self.results(0.5, 1000), self.results(0.3, 1000), threshold=0.25)
+        self.assertEqual(regressions, [('case', 'seconds', 0.3, 0.5)])
+
+    def test_within_threshold_is_not_a_regression(self):
+        self.assertEqual(benchmark.compare(self.results(0.35, 1000), self.results(0.3, 1000), threshold=0.25), [])
+
+    def test_noise_on_fast_cases_is_ignored(self):
+        self.assertEqual(benchmark.compare(self.results(0.002, 1000), self.results(0.001, 1000)), [])
+
+    def test_memory_growth_is_a_regression(self):
+        regressions = benchmark.compare(self.results(0.3, 50_000_000), self.results(0.3, 10_000_000))
+        self.assertEqual(regressions, [('case', 'peak_memory_bytes', 10_000_000, 50_000_000)])
+
+    def test_compare_command_exit_code(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        paths = {}
+        for name, seconds in (('new', 0.5), ('old', 0.3)):
+            paths[name] = os.path.join(temp_dir, f"{name}.json")
+            with open(paths[name], 'w') as f:
+                json.dump(self.results(seconds, 1000), f)
+
+        self.assertEqual(benchmark.main(['compare', paths['new'], paths['old']]), 1)
+        self.assertEqual(benchmark.main(['compare', paths['old'], paths['new']]), 0)
+        self.assertEqual(benchmark.main(['compare', paths['new'], paths['old'], '--threshold', '1']), 0)
+
+class TestImportTime(unittest.TestCase):
+    OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   zlib
+import time:       300 |        800 |     numpy.core
+import time:       500 |       1300 |   numpy
+import time:       200 |       1600 | bitstream
+import time:        50 |         50 | resource
+"""
+
+    def test_parse_importtime(self):
+        seconds, children = benchmark.parse_importtime(self.OUTPUT, 'bitstream')
+        self.assertEqual(seconds, 0.0016)
+        self.assertEqual(children, {'zlib': 0.1, 'numpy': 1.3})
+        with self.assertRaises(ValueError):
+            benchmark.parse_importtime(self.OUTPUT, 'utils')
+
+    def test_measure_import(self):
+        result = benchmark.measure_import('bitstream', repeat=1)
+        self.assertGreater(result['seconds'], 0)
+        self.assertIn('numpy', result['slowest_imports_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
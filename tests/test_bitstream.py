@@ -0,0 +1,101 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitstream import BitWriter, BitReader, bytes_to_bits, bits_to_bytes, framed, terminated
+
+class TestBitPacking(unittest.TestCase):
+    def test_bytes_bits_round_trip(self):
+        """Test bytes survive unpacking to bits and packing back."""
+        data = bytes(range(256))
+        bits = bytes_to_bits(data)
+        self.assertEqual(len(bits), 2048)
+        self.assertEqual(list(bits[:8]), [0, 0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(list(bits[8:16]), [0, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(bits_to_bytes(bits), data)
+
+    def test_partial_byte(self):
+        """Test a trailing partial byte is dropped or zero-padded."""
+        bits = np.array([1, 0, 1, 0, 1, 0, 1, 0, 1, 1], dtype=np.uint8)
+        self.assertEqual(bits_to_bytes(bits), b'\xaa')
+        self.assertEqual(bits_to_bytes(bits, pad=True), b'\xaa\xc0')
+
+    def test_write_bits(self):
+        """Test k-bit integer writes are most significant bit first."""
+        writer = BitWriter()
+        writer.write_bits(5, 3)
+        writer.write_bits(1, 5)
+        self.assertEqual(bits_to_bytes(writer.getbits()), b'\xa1')
+        with self.assertRaises(ValueError):
+            writer.write_bits(8, 3)
+
+class TestCarrierIO(unittest.TestCase):
+    def setUp(self):
+        self.carrier = np.random.default_rng(0).integers(0, 256, 4000, dtype=np.uint8)
+
+    def test_embed_matches_legacy_lsb_loop(self):
+        """Test embedding gives the same carrier as the per-bit string loop."""
+        data = b'hello world'
+        expected = self.carrier.copy()
+        binary_data = ''.join(format(byte, '08b') for byte in data) + '00000000'
+        for i in range(len(binary_data)):
+            expected[i] = (expected[i] & 0xFE) | int(binary_data[i])
+
+        terminated(data).embed(self.carrier)
+        np.testing.assert_array_equal(self.carrier, expected)
+
+    def test_terminated_round_trip(self):
+        """Test a terminated payload is read back up to the terminator."""
+        terminated(b'secret payload').embed(self.carrier)
+        data, found = BitReader(self.carrier).read_until_terminator(chunk_bytes=4)
+        self.assertTrue(found)
+        self.assertEqual(data, b'secret payload')
+
+    def test_missing_terminator(self):
+        """Test a carrier without terminator is read in full."""
+        carrier = np.full(21, 0xFF, dtype=np.uint8)
+        self.assertEqual(BitReader(carrier).read_until_terminator(), (b'\xff\xff', False))
+        self.assertEqual(BitReader(carrier).read_until_terminator(pad_partial=True), (b'\xff\xff\xf8', False))
+
+    def test_framed_round_trip_with_k_bits(self):
+        """Test a length-framed payload round-trips with several bits per sample."""
+        payload = b'\x00binary\x00payload\x00'
+        for k in (1, 2, 3, 4):
+            carrier = self.carrier.copy()
+            framed(payload).embed(carrier, bits_per_sample=k)
+            # Only the k low bits may change
+            np.testing.assert_array_equal(carrier >> k, self.carrier >> k)
+            self.assertEqual(BitReader(carrier, bits_per_sample=k).read_framed(), payload)
+
+    def test_bytearray_carrier(self):
+        """Test a bytearray carrier is modified in place."""
+        frames = bytearray(200)
+        terminated(b'\xff').embed(frames)
+        self.assertEqual(bytes(frames[:8]), b'\x01' * 8)
+        self.assertEqual(BitReader(bytes(frames)).read_until_terminator(), (b'\xff', True))
+
+    def test_embed_too_large(self):
+        """Test embedding more bits than the carrier holds raises an error."""
+        with self.assertRaises(ValueError):
+            terminated(b'x' * 600).embed(self.carrier)
+
+    def test_progress_callbacks(self):
+        """Test embed and extract report bits written and bytes scanned."""
+        reports = []
+        terminated(b'progress').embed(self.carrier, progress=lambda *args: reports.append(args))
+        self.assertEqual(reports[-1], ('embed', 72, 72))
+        reports = []
+        BitReader(self.carrier).read_until_terminator(progress=lambda *args: reports.append(args))
+        self.assertEqual(reports[-1], ('extract', 9, 9))
+
+    def test_iter_chunks(self):
+        """Test chunked reads cover the whole carrier."""
+        chunks = list(BitReader(self.carrier).iter_chunks(chunk_bytes=128))
+        self.assertEqual([len(chunk) for chunk in chunks], [128, 128, 128, 116])
+
+if __name__ == '__main__':
+    unittest.main()
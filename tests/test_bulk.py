@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk
+import payload
+import carriers
+from test_carriers import make_png
+
+class TestBulkRunner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for i in range(3):
+            with open(self.path(f"cover{i}.png"), 'wb') as f:
+                f.write(make_png(64, 48))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def write_jsonl(self, name, rows):
+        with open(self.path(name), 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+        return self.path(name)
+
+    def read_checkpoint(self, manifest):
+        with open(f"{manifest}.done.jsonl") as f:
+            return [json.loads(line) for line in f]
+
+    def test_encrypt_decrypt_and_resume(self):
+        """Test a manifest is processed once, and a rerun skips the rows already done."""
+        # Messages whose ciphertext avoids the legacy terminator and marker bytes
+        encrypt = self.write_jsonl('encrypt.jsonl', [
+            {'input': self.path('cover0.png'), 'output': self.path('out/stego0.png'),
+             'message': 'secret one', 'password': 'Fixed-Pass-123'},
+            {'input': self.path('cover1.png'), 'output': self.path('out/stego1.png'),
+             'message': 'secret two', 'password_ref': 'env:BULK_TEST_PASSWORD'},
+        ])
+        with patch.dict(os.environ, {'BULK_TEST_PASSWORD': 'Fixed-Pass-123'}):
+            self.assertEqual(bulk.main([encrypt, '--workers', '2']), 0)
+        results = self.read_checkpoint(encrypt)
+        self.assertEqual(sorted(result['id'] for result in results), ['1', '2'])
+        self.assertTrue(all(result['status'] == 'success' for result in results))
+
+        # Nothing left to do on a rerun
+        self.assertEqual(bulk.main([encrypt, '--workers', '1']), 0)
+        self.assertEqual(len(self.read_checkpoint(encrypt)), 2)
+
+        decrypt = self.write_jsonl('decrypt.jsonl', [
+            {'op': 'decrypt', 'input': self.path('out/stego0.png')},
+            {'op': 'decrypt', 'input': self.path('out/stego1.png'), 'output': self.path('out/message1.txt')},
+        ])
+        self.assertEqual(bulk.main([decrypt, '--workers', '1']), 0)
+        results = {result['id']: result for result in self.read_checkpoint(decrypt)}
+        self.assertEqual(results['1']['message'], 'secret one')
+        with open(self.path('out/message1.txt')) as f:
+            self.assertEqual(f.read(), 'secret two')
+
+    def test_csv_manifest_and_failures(self):
+        """Test CSV manifests, and that failed rows are recorded and retried on the next run."""
+        manifest = self.path('manifest.csv')
+        with open(manifest, 'w') as f:
+            f.write('id,input,output,message,password\n')
+            f.write(f"ok,{self.path('cover2.png')},{self.path('stego2.png')},hidden note,Fixed-Pass-123\n")
+            f.write(f"missing,{self.path('nope.png')},{self.path('stego3.png')},hidden note,Fixed-Pass-123\n")
+        self.assertEqual(bulk.main([manifest, '--workers', '1']), 2)
+        results = {result['id']: result['status'] for result in self.read_checkpoint(manifest)}
+        self.assertEqual(results, {'ok': 'success', 'missing': 'error'})
+
+        self.assertEqual(bulk.load_checkpoint(f"{manifest}.done.jsonl"), {'ok'})
+        self.assertEqual(bulk.main([manifest, '--workers', '1']), 2)
+        self.assertEqual(len(self.read_checkpoint(manifest)), 3)
+
+    def test_wrong_password_is_an_error(self):
+        """Test a decrypt with the wrong password is checkpointed as an error, not written out as the message."""
+        # Ciphertext without an embedded password, and free of the terminator and marker bytes
+        while True:
+            data = payload.encrypt_message(b'a message long enough for AES encryption', 'Right-Pass-123')
+            if 0 not in data and 1 not in data:
+                break
+        stego = self.path('stego.png')
+        carriers.get_carrier('image').embed(self.path('cover0.png'), data, output=stego)
+
+        result = bulk.process_row({'id': '1', 'op': 'decrypt', 'input': stego, 'password': 'Wrong-Pass-456',
+                                   'output': self.path('message.txt')})
+        self.assertEqual(result['status'], 'error')
+        self.assertFalse(os.path.exists(self.path('message.txt')))
+
+    def test_manifest_validation(self):
+        """Test unknown manifest fields are rejected before anything runs."""
+        manifest = self.write_jsonl('bad.jsonl', [{'input': 'a.png', 'pasword': 'typo'}])
+        self.assertEqual(bulk.main([manifest]), 1)
+
+    def test_flask_is_not_imported(self):
+        code = "import sys, bulk; print(','.join(m for m in ('flask', 'api') if m in sys.modules))"
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(completed.stdout.strip(), '')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import sys
+import wave
+import unittest
+import numpy as np
+from PIL import Image
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import carriers
+
+def make_png(width=40, height=30):
+    """Return the bytes of a random RGB PNG image"""
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def make_wav(n_frames=2000):
+    """Return the bytes of a random 16-bit stereo WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(np.random.default_rng(0).integers(0, 256, n_frames * 4, dtype=np.uint8).tobytes())
+    return buffer.getvalue()
+
+class TestRegistry(unittest.TestCase):
+    def test_builtin_carriers(self):
+        """Test the image and audio carriers are registered."""
+        self.assertIn('image', carriers.available_carriers())
+        self.assertIn('audio', carriers.available_carriers())
+        with self.assertRaises(KeyError):
+            carriers.get_carrier('hologram')
+
+    def test_detect_carrier(self):
+        """Test detection by magic bytes, then MIME type, then extension."""
+        self.assertEqual(carriers.detect_carrier(make_png()[:16]), 'image')
+        self.assertEqual(carriers.detect_carrier(make_wav()[:16]), 'audio')
+        self.assertEqual(carriers.detect_carrier(b'', mime_type='audio/mpeg'), 'audio')
+        self.assertEqual(carriers.detect_carrier(b'', filename='cover.JPG'), 'image')
+        self.assertIsNone(carriers.detect_carrier(b'plain text', filename='notes.txt'))
+
+    def test_lazy_carrier(self):
+        """Test a carrier registered by path is only imported on first use."""
+        carriers.register_lazy_carrier('lazy_image', 'carriers:ImageCarrier', extensions=('.lazy',))
+        try:
+            self.assertIsInstance(carriers._registry['lazy_image'], dict)
+            self.assertEqual(carriers.detect_carrier(filename='x.lazy'), 'lazy_image')
+            self.assertIsInstance(carriers.get_carrier('lazy_image'), carriers.ImageCarrier)
+        finally:
+            del carriers._registry['lazy_image']
+
+class TestInMemoryCarriers(unittest.TestCase):
+    def test_image_bytes_round_trip(self):
+        """Test embedding in PNG bytes returns PNG bytes that extract again."""
+        carrier = carriers.get_carrier('image')
+        cover = make_png()
+        self.assertEqual(carrier.capacity(cover), 40 * 30 * 3 // 8 - 1)
+        stego = carrier.embed(cover, b'hidden payload')
+        self.assertTrue(stego.startswith(b'\x89PNG'))
+        self.assertEqual(carrier.extract(io.BytesIO(stego)), b'hidden payload')
+
+    def test_image_array_round_trip(self):
+        """Test NumPy pixel buffers are embedded without touching the original."""
+        carrier = carriers.get_carrier('image')
+        pixels = np.zeros((10, 10, 3), dtype=np.uint8)
+        stego = carrier.embed(pixels, b'abc')
+        self.assertFalse(pixels.any())
+        self.assertEqual(carrier.extract(stego), b'abc')
+
+    def test_audio_bytes_round_trip(self):
+        """Test embedding in WAV bytes keeps the WAV parameters."""
+        carrier = carriers.get_carrier('audio')
+        cover = make_wav()
+        self.assertEqual(carrier.capacity(cover), 2000 * 4 // 8 - 1)
+        output = io.BytesIO()
+        carrier.embed(cover, b'audio payload', output=output)
+        with wave.open(io.BytesIO(output.getvalue()), 'rb') as f:
+            self.assertEqual((f.getnchannels(), f.getsampwidth(), f.getnframes()), (2, 2, 2000))
+        self.assertEqual(carrier.extract(output.getvalue()), b'audio payload')
+
+    def test_audio_array_round_trip(self):
+        """Test raw int16 sample buffers round-trip."""
+        carrier = carriers.get_carrier('audio')
+        samples = np.zeros(1000, dtype=np.int16)
+        self.assertEqual(carrier.extract(carrier.embed(samples, b'pcm')), b'pcm')
+
+    def test_too_large(self):
+        """Test payloads over capacity raise ValueError."""
+        with self.assertRaises(ValueError):
+            carriers.get_carrier('image').embed(make_png(4, 4), b'x' * 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import requests
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import client
+
+def fake_response(status_code, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+class TestBatchHelpers(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.upload = os.path.join(self.temp_dir, 'cover.png')
+        with open(self.upload, 'wb') as f:
+            f.write(b'data')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @patch('client.time.sleep')
+    def test_retries_with_backoff(self, mock_sleep):
+        """Test retryable responses and connection errors are retried with growing delays."""
+        session = MagicMock()
+        session.request.side_effect = [fake_response(503), requests.ConnectionError(), fake_response(200)]
+        stats = {'retries': 0}
+        response = client.request_with_retries(session, 'POST', 'http://api/encrypt', retries=3, backoff=1,
+                                               files={'file': ('cover.png', self.upload)}, stats=stats)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stats['retries'], 2)
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        self.assertTrue(0.5 <= delays[0] <= 1.5 and 1 <= delays[1] <= 3)
+        # The upload is reopened for every attempt
+        self.assertEqual(session.request.call_count, 3)
+
+    @patch('client.time.sleep')
+    def test_retry_after_and_give_up(self, mock_sleep):
+        """Test Retry-After is honoured and the last response is returned once retries run out."""
+        session = MagicMock()
+        session.request.return_value = fake_response(429, {'Retry-After': '4'})
+        response = client.request_with_retries(session, 'GET', 'http://api/health', retries=1, backoff=0.1)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(session.request.call_count, 2)
+        self.assertGreaterEqual(mock_sleep.call_args.args[0], 2)
+
+    def test_expand_paths(self):
+        """Test directories and globs expand to a sorted list of files."""
+        os.makedirs(os.path.join(self.temp_dir, 'sub'))
+        other = os.path.join(self.temp_dir, 'sub', 'b.wav')
+        open(other, 'wb').close()
+        self.assertEqual(client.expand_paths([self.temp_dir]), [self.upload])
+        self.assertEqual(client.expand_paths([os.path.join(self.temp_dir, '**', '*.*'), self.temp_dir]),
+                         sorted([self.upload, other]))
+
+    def test_decrypt_output_paths_do_not_collide(self):
+        """Test inputs with the same name in different folders, or different extensions, get their own text file."""
+        paths = [os.path.join('in', 'a', 'x.png'), os.path.join('in', 'b', 'x.png'), os.path.join('in', 'a', 'x.wav'),
+                 os.path.join('in', 'b', 'y.png')]
+        outputs = client.decrypt_output_paths(paths, 'out')
+        self.assertEqual(outputs, {
+            paths[0]: os.path.join('out', 'a', 'x.png.txt'),
+            paths[1]: os.path.join('out', 'b', 'x.txt'),
+            paths[2]: os.path.join('out', 'a', 'x.wav.txt'),
+            paths[3]: os.path.join('out', 'b', 'y.txt'),
+        })
+        self.assertEqual(client.decrypt_output_paths(['x.png', 'y.wav'], 'out'),
+                         {'x.png': os.path.join('out', 'x.txt'), 'y.wav': os.path.join('out', 'y.txt')})
+
+if __name__ == '__main__':
+    unittest.main()
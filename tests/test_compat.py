@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compat
+import utils
+
+class TestFrozenCorpus(unittest.TestCase):
+    def test_legacy_files_still_read_and_write_identically(self):
+        self.assertEqual(compat.check_corpus(), [])
+
+    def test_corpus_covers_every_media_type(self):
+        media_types = {entry['media_type'] for entry in compat.load_manifest()}
+        self.assertEqual(media_types, {'image', 'audio', 'qr'})
+
+    def test_changed_extraction_is_reported(self):
+        with patch('utils.extract_data_from_audio', return_value=b'changed'):
+            failures = compat.check_corpus()
+        self.assertTrue(failures)
+        self.assertTrue(all(failure.endswith('differ from the legacy extraction') for failure in failures))
+        self.assertTrue(all('.wav' in failure for failure in failures))
+
+class TestDifferential(unittest.TestCase):
+    def test_random_cases_match(self):
+        results = compat.run_differential(trials=3, seed=7, max_pixels=4000)
+        self.assertEqual(len(results), 3 * len(compat.MEDIA_TYPES))
+        for result in results:
+            self.assertGreater(result['legacy_seconds'], 0)
+            self.assertGreater(result['current_seconds'], 0)
+
+    def test_mismatch_names_the_trial(self):
+        real_hide = utils.hide_data_in_image
+
+        def flip_first_bit(input_path, output_path, data, progress=None):
+            return real_hide(input_path, output_path, bytes([data[0] ^ 1]) + data[1:] if data else data)
+
+        with patch('utils.hide_data_in_image', side_effect=flip_first_bit):
+            with self.assertRaisesRegex(compat.Mismatch, r'image trial \d+ \(seed 3\)'):
+                compat.run_differential(trials=5, seed=3, media_types=('image',), max_pixels=4000)
+
+    def test_qr_codes_must_decode_to_the_message(self):
+        real_extract = utils.extract_message_from_qr
+
+        def garble_current(path, password=None):
+            return 'garbled' if 'current' in os.path.basename(path) else real_extract(path, password)
+
+        with patch('utils.extract_message_from_qr', side_effect=garble_current):
+            with self.assertRaisesRegex(compat.Mismatch, r'qr trial \d+ \(seed 3\): qr decoded'):
+                compat.run_differential(trials=5, seed=3, media_types=('qr',))
+
+    def test_seeded_urandom_is_repeatable(self):
+        with compat.seeded_urandom(5):
+            first = utils.encrypt_message('same salt and iv', 'pw')
+        with compat.seeded_urandom(5):
+            second = utils.encrypt_message('same salt and iv', 'pw')
+        self.assertEqual(first, second)
+        self.assertNotEqual(os.urandom(16), os.urandom(16))
+
+if __name__ == '__main__':
+    unittest.main()
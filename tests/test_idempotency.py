@@ -0,0 +1,231 @@
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import closing
+from unittest.mock import patch
+from werkzeug.datastructures import FileStorage, MultiDict
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import idempotency
+from test_carriers import make_png
+
+class TestIdempotencyStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = self.make_store()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_store(self, ttl=60, lock_timeout=60, wait_timeout=1):
+        return idempotency.IdempotencyStore(os.path.join(self.temp_dir, 'idempotency.sqlite3'), ttl, lock_timeout,
+                                            wait_timeout)
+
+    def test_completed_response_is_replayed(self):
+        owner, stored = self.store.begin('key', 'abc')
+        self.assertIsNone(stored)
+        self.store.complete('key', owner, 200, [('Content-Type', 'application/json')], b'{}')
+        self.assertEqual(self.store.begin('key', 'abc'), (None, (200, [['Content-Type', 'application/json']], b'{}')))
+
+    def test_different_request_conflicts(self):
+        owner, _ = self.store.begin('key', 'abc')
+        self.store.complete('key', owner, 200, [], b'')
+        with self.assertRaises(idempotency.KeyConflict):
+            self.store.begin('key', 'def')
+
+    def test_duplicate_waits_for_running_request(self):
+        owner, _ = self.store.begin('key', 'abc')
+        threading.Timer(0.2, self.store.complete, ('key', owner, 201, [], b'done')).start()
+        started = time.monotonic()
+        self.assertEqual(self.store.begin('key', 'abc'), (None, (201, [], b'done')))
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    def test_duplicate_gives_up_after_wait_timeout(self):
+        store = self.make_store(wait_timeout=0.2)
+        store.begin('key', 'abc')
+        with self.assertRaises(idempotency.KeyBusy):
+            store.begin('key', 'abc')
+
+    def test_released_key_runs_again(self):
+        owner, _ = self.store.begin('key', 'abc')
+        self.store.release('key', owner)
+        new_owner, stored = self.store.begin('key', 'abc')
+        self.assertIsNone(stored)
+        self.assertNotEqual(new_owner, owner)
+
+    def test_claim_of_crashed_request_expires(self):
+        store = self.make_store(lock_timeout=0)
+        owner, _ = store.begin('key', 'abc')
+        new_owner, _ = store.begin('key', 'abc')
+        self.assertNotEqual(new_owner, owner)
+        # The first request's late result does not overwrite the new claim
+        store.complete('key', owner, 200, [], b'stale')
+        self.assertEqual(store.reap(), 1)
+
+    def test_reap_removes_expired_responses(self):
+        store = self.make_store(ttl=0)
+        owner, _ = store.begin('key', 'abc')
+        store.complete('key', owner, 200, [], b'')
+        self.assertEqual(store.reap(), 1)
+        self.assertIsNone(store.begin('key', 'def')[1])
+
+    def test_response_expires_with_its_output(self):
+        owner, _ = self.store.begin('key', 'abc')
+        self.store.complete('key', owner, 200, [], b'', output='stego.png', output_expires_at=time.time() - 1)
+        self.assertEqual(self.store.reap(), 1)
+
+    def test_response_of_a_removed_output_runs_again(self):
+        owner, _ = self.store.begin('key', 'abc')
+        self.store.complete('key', owner, 200, [], b'', output='stego.png')
+        self.assertIsNotNone(self.store.begin('key', 'abc', output_exists=lambda name: True)[1])
+        new_owner, stored = self.store.begin('key', 'abc', output_exists=lambda name: False)
+        self.assertIsNone(stored)
+        self.assertNotEqual(new_owner, owner)
+
+    def test_fingerprint_covers_form_and_files(self):
+        def fingerprint(message, content):
+            files = MultiDict({'file': FileStorage(io.BytesIO(content), filename='cover.png')})
+            return idempotency.fingerprint('encrypt', MultiDict(), MultiDict({'message': message}), files)
+
+        self.assertEqual(fingerprint('hi', b'png'), fingerprint('hi', b'png'))
+        self.assertNotEqual(fingerprint('hi', b'png'), fingerprint('hello', b'png'))
+        self.assertNotEqual(fingerprint('hi', b'png'), fingerprint('hi', b'gif'))
+
+    def test_database_holds_no_readable_keys_or_responses(self):
+        owner, _ = self.store.begin('client-key', 'abc')
+        self.store.complete('client-key', owner, 200, [('X-Stego-Auto-Generated-Password', 's3cret')], b'{"pw": "s3cret"}')
+        data = b''
+        for path in (self.store.path, self.store.path + '-wal'):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data += f.read()
+        self.assertNotIn(b's3cret', data)
+        self.assertNotIn(b'client-key', data)
+        self.assertEqual(self.store.begin('client-key', 'abc')[1][2], b'{"pw": "s3cret"}')
+
+    def test_key_validation(self):
+        self.assertTrue(idempotency.valid_key('4f1c2b7e-retry'))
+        self.assertFalse(idempotency.valid_key(''))
+        self.assertFalse(idempotency.valid_key('x' * 256))
+        self.assertFalse(idempotency.valid_key('line\nbreak'))
+
+class TestIdempotentEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_folder = os.path.join(self.temp_dir, 'output')
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': self.output_folder,
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3'),
+                                              'IDEMPOTENCY_DB': os.path.join(self.temp_dir, 'idempotency.sqlite3')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ('api._output_store', 'api._idempotency_store'):
+            patcher = patch(name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = api.app.test_client()
+        self.png = make_png()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def encrypt(self, key, message='hello there', query='', **fields):
+        return self.client.post(f"/api/encrypt{query}", headers={'Idempotency-Key': key}, data={
+            'file': (io.BytesIO(self.png), 'cover.png'), 'message': message, 'auto_generate': 'true', **fields})
+
+    def test_retry_replays_the_first_response(self):
+        first = self.encrypt('retry-1')
+        self.assertEqual(first.status_code, 200)
+        with patch('api.hide_in_carrier') as hide:
+            second = self.encrypt('retry-1')
+        hide.assert_not_called()
+        self.assertEqual(second.json, first.json)
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(os.listdir(self.output_folder)), 1)
+
+    def test_response_is_kept_no_longer_than_its_output(self):
+        response = self.encrypt('short-lived', ttl='60')
+        store = api.get_idempotency_store()
+        with closing(store._connect()) as conn:
+            expires_at = conn.execute("SELECT expires_at FROM idempotency_keys").fetchone()[0]
+        self.assertLessEqual(expires_at, response.json['expires_at'])
+
+    def test_retry_after_the_output_was_removed_runs_again(self):
+        first = self.encrypt('evicted')
+        store = api.get_output_store()
+        with closing(store._connect()) as conn, conn:
+            store._delete(conn, [first.json['output_filename']])
+        second = self.encrypt('evicted')
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', second.headers)
+        self.assertNotEqual(second.json['auto_generated_password'], first.json['auto_generated_password'])
+        self.assertEqual(self.encrypt('evicted').headers['Idempotent-Replayed'], 'true')
+
+    def test_inline_response_is_replayed(self):
+        first = self.encrypt('inline-1', query='?inline=1')
+        second = self.encrypt('inline-1', query='?inline=1')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.headers['X-Stego-Auto-Generated-Password'],
+                         first.headers['X-Stego-Auto-Generated-Password'])
+        self.assertEqual(second.headers['Content-Type'], 'image/png')
+
+    def test_reused_key_with_other_request_is_rejected(self):
+        self.encrypt('reused')
+        response = self.encrypt('reused', message='something else')
+        self.assertEqual(response.status_code, 422)
+
+    def test_keys_are_scoped_to_the_endpoint(self):
+        self.encrypt('shared')
+        response = self.client.post('/api/generate-qr', headers={'Idempotency-Key': 'shared'}, data={'data': 'x'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_failed_request_runs_again(self):
+        with patch('api.hide_in_carrier', side_effect=RuntimeError('disk full')):
+            self.assertEqual(self.encrypt('failing').status_code, 500)
+        self.assertEqual(self.encrypt('failing').status_code, 200)
+
+    def test_concurrent_duplicates_run_once(self):
+        real_hide = api.utils.hide_message_in_qr
+        calls = []
+
+        def slow_hide(*args, **kwargs):
+            calls.append(args)
+            time.sleep(0.3)
+            return real_hide(*args, **kwargs)
+
+        responses = []
+
+        def post():
+            client = api.app.test_client()
+            responses.append(client.post('/api/encrypt-qr', headers={'Idempotency-Key': 'qr-1'},
+                                         data={'message': 'meet at noon', 'auto_generate': 'true'}))
+
+        with patch('utils.hide_message_in_qr', side_effect=slow_hide):
+            threads = [threading.Thread(target=post) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200])
+        self.assertEqual(len({response.json['auto_generated_password'] for response in responses}), 1)
+
+    def test_invalid_key_is_rejected(self):
+        response = self.encrypt('x' * 300)
+        self.assertEqual(response.status_code, 400)
+
+    def test_requests_without_a_key_are_not_stored(self):
+        self.client.post('/api/generate-qr', data={'data': 'x'})
+        self.assertFalse(os.path.exists(api.app.config['IDEMPOTENCY_DB']))
+
+if __name__ == '__main__':
+    unittest.main()
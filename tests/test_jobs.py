@@ -0,0 +1,194 @@
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import jobs
+import metrics
+
+def add_numbers(a, b, progress=None):
+    """Job function used by the tests (must be module level to reach worker processes)"""
+    progress('adding', 1, 2)
+    progress('adding', 2, 2)
+    return {'sum': a + b}
+
+def fail_job(progress=None):
+    raise ValueError("bad input")
+
+def timed_job(progress=None):
+    with metrics.stage('test_job_stage'):
+        pass
+    with metrics.stage('test_job_failure'):
+        raise ValueError("bad stage")
+
+def wait_for(store, job_id, timeout=30):
+    """Poll a job until it finishes"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job['status'] in (jobs.SUCCEEDED, jobs.FAILED):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+class TestJobStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = jobs.JobStore(os.path.join(self.temp_dir, 'jobs.sqlite3'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_lifecycle(self):
+        """Test a job moves from queued to running to succeeded."""
+        job_id = self.store.create('encrypt', 'image')
+        self.assertEqual(self.store.get(job_id)['status'], jobs.QUEUED)
+        self.store.mark_running(job_id)
+        self.assertEqual(self.store.get(job_id)['status'], jobs.RUNNING)
+        self.store.complete(job_id, {'output_filename': 'stego.png'})
+        job = self.store.get(job_id)
+        self.assertEqual(job['status'], jobs.SUCCEEDED)
+        self.assertEqual(job['result'], {'output_filename': 'stego.png'})
+        self.assertIsNotNone(job['finished_at'])
+
+    def test_unknown_job(self):
+        """Test unknown ids return None."""
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_visible_across_store_instances(self):
+        """Test state written through one connection is seen by another store on the same file."""
+        job_id = self.store.create('decrypt', 'audio')
+        jobs.JobStore(self.store.path).fail(job_id, 'boom')
+        self.assertEqual(self.store.get(job_id)['error'], 'boom')
+
+    def test_progress_reporter_throttles(self):
+        """Test progress writes are throttled within a stage but stage changes and final reports get through."""
+        job_id = self.store.create('encrypt', 'video')
+        report = self.store.progress_reporter(job_id, interval=60)
+        report('frames', 1, 100)
+        report('frames', 2, 100)
+        self.assertEqual(self.store.get(job_id)['progress'], {'stage': 'frames', 'done': 1, 'total': 100})
+        report('frames', 100, 100)
+        self.assertEqual(self.store.get(job_id)['progress']['done'], 100)
+        report('write', 5, None)
+        self.assertEqual(self.store.get(job_id)['progress'], {'stage': 'write', 'done': 5, 'total': None})
+
+    def test_iter_events(self):
+        """Test the event stream reports progress and ends with the finished job."""
+        job_id = self.store.create('decrypt', 'image')
+        self.store.mark_running(job_id)
+        self.store.set_progress(job_id, 'extract', 10, 10)
+        self.store.complete(job_id, {'decrypted_message': 'hi'})
+        events = list(jobs.iter_events(self.store, job_id, poll_interval=0))
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[0].startswith('event: progress\ndata: '))
+        self.assertIn('"stage": "extract"', events[0])
+        self.assertTrue(events[1].startswith('event: done\n'))
+        self.assertTrue(events[1].endswith('\n\n'))
+        self.assertIn('"decrypted_message": "hi"', events[1])
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = jobs.JobManager(jobs.JobStore(os.path.join(self.temp_dir, 'jobs.sqlite3')),
+                                       workers={'image': 1}, default_workers=1)
+
+    def tearDown(self):
+        self.manager.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def test_process_pool_jobs(self):
+        """Test jobs run in worker processes and record results and failures."""
+        ok = self.manager.create('test', 'image')
+        self.manager.submit(ok, 'image', add_numbers, 2, 3)
+        bad = self.manager.create('test', 'audio')
+        self.manager.submit(bad, 'audio', fail_job)
+
+        job = wait_for(self.manager.store, ok)
+        self.assertEqual(job['result'], {'sum': 5})
+        self.assertEqual(job['progress'], {'stage': 'adding', 'done': 2, 'total': 2})
+        job = wait_for(self.manager.store, bad)
+        self.assertEqual(job['status'], jobs.FAILED)
+        self.assertEqual(job['error'], 'bad input')
+
+    def test_worker_stages_reach_the_parent_metrics(self):
+        """Test stages run in a worker process are added to this process's stage metrics."""
+        job_id = self.manager.create('test', 'image')
+        self.manager.submit(job_id, 'image', timed_job)
+        self.assertEqual(wait_for(self.manager.store, job_id)['status'], jobs.FAILED)
+        # The result is stored by the worker before its stages are sent back
+        deadline = time.time() + 10
+        while metrics.STAGE_ERRORS.value('test_job_failure', 'image') == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(metrics.STAGE_DURATION.samples(('test_job_stage', 'image'))[0], 1)
+        self.assertEqual(metrics.STAGE_ERRORS.value('test_job_failure', 'image'), 1)
+
+        with self.assertRaises(ValueError):
+            self.manager.run('audio', timed_job).result(timeout=30)
+        self.assertEqual(metrics.STAGE_DURATION.samples(('test_job_stage', 'audio'))[0], 1)
+
+class TestJobEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        self.manager = jobs.JobManager(jobs.JobStore(os.path.join(self.temp_dir, 'jobs.sqlite3')), default_workers=1)
+        patcher = patch('api._job_manager', self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.manager.shutdown()
+        shutil.rmtree(self.temp_dir)
+
+    def test_async_encrypt(self):
+        """Test ?async=1 returns 202 and the job result is served from /api/jobs/<id>."""
+        from PIL import Image
+        cover = io.BytesIO()
+        Image.new('RGB', (64, 64), (10, 20, 30)).save(cover, format='PNG')
+
+        with patch.dict(api.app.config, {'OUTPUT_FOLDER': self.temp_dir,
+                                         'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3')}):
+            response = self.app.post(
+                '/api/encrypt?async=1',
+                data={
+                    'file': (io.BytesIO(cover.getvalue()), 'cover.png'),
+                    'message': 'background job message',
+                    'password': 'testpassword',
+                    'media_type': 'image'
+                },
+                content_type='multipart/form-data'
+            )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json['job_id']
+        self.assertEqual(response.headers['Location'], f"/api/jobs/{job_id}")
+
+        job = wait_for(self.manager.store, job_id)
+        self.assertEqual(job['status'], jobs.SUCCEEDED, job['error'])
+        output_filename = job['result']['output_filename']
+        self.assertRegex(output_filename, r'^stego_cover_[0-9a-f]{16}\.png$')
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, output_filename)))
+
+        response = self.app.get(f"/api/jobs/{job_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['result']['output_filename'], output_filename)
+        self.assertEqual(response.json['progress']['stage'], 'embed')
+
+        response = self.app.get(f"/api/jobs/{job_id}/events")
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertIn('event: done', response.get_data(as_text=True))
+
+    def test_unknown_job(self):
+        """Test unknown job ids return 404."""
+        self.assertEqual(self.app.get('/api/jobs/missing').status_code, 404)
+        self.assertEqual(self.app.get('/api/jobs/missing/events').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
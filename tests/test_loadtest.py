@@ -0,0 +1,98 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from werkzeug.serving import make_server
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import loadtest
+
+class TestLoadTestHelpers(unittest.TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(loadtest.parse_mix('encrypt=3, decrypt-qr'), {'encrypt': 3.0, 'decrypt-qr': 1.0})
+        for text in ('upload=1', 'encrypt=-1', 'encrypt=0'):
+            with self.assertRaises(ValueError):
+                loadtest.parse_mix(text)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([7], 99), 7)
+        self.assertIsNone(loadtest.percentile([], 50))
+
+    def test_summarize(self):
+        results = {'encrypt/image': [(0.1, 200), (0.3, 200), (0.2, 429), (0.4, 'exception')]}
+        summary = loadtest.summarize(results, wall_seconds=2.0)
+        encrypt = summary['encrypt/image']
+        self.assertEqual(encrypt['requests'], 4)
+        self.assertEqual(encrypt['throughput_rps'], 2.0)
+        self.assertEqual(encrypt['error_rate'], 0.5)
+        self.assertEqual(encrypt['statuses'], {'200': 2, '429': 1, 'exception': 1})
+        self.assertEqual(encrypt['p50_ms'], 200.0)
+        self.assertEqual(encrypt['max_ms'], 400.0)
+        self.assertEqual(summary['all']['requests'], 4)
+
+    @unittest.skipUnless(os.path.isdir('/proc'), 'needs /proc')
+    def test_process_tree_rss(self):
+        self.assertGreater(loadtest.process_tree_rss(os.getpid()), 1024 * 1024)
+
+class TestLoadRun(unittest.TestCase):
+    """Replays the mix against api.app served by Werkzeug on a thread of the test process"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3'),
+                                              'LOG_FORMAT': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('api._output_store', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.server = make_server('127.0.0.1', 0, api.app, threaded=True)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.api_url = f"http://127.0.0.1:{self.server.server_port}/api"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_mix_is_replayed(self):
+        corpus = loadtest.Corpus(self.temp_dir, image_megapixels=0.01, audio_seconds=1)
+        corpus.prepare(self.api_url)
+        self.assertEqual(set(corpus.stego), {'image', 'audio'})
+
+        results, wall_seconds = loadtest.run_load(self.api_url, corpus, concurrency=2, requests_total=12)
+        self.assertEqual(sum(len(entries) for entries in results.values()), 12)
+        summary = loadtest.summarize(results, wall_seconds)
+        self.assertEqual(summary['all']['error_rate'], 0.0, summary['all']['statuses'])
+        self.assertTrue(set(results) <= {'encrypt/image', 'encrypt/audio', 'decrypt/image', 'decrypt/audio',
+                                         'encrypt-qr', 'decrypt-qr'})
+
+    def test_duration_or_count_is_required(self):
+        with self.assertRaises(ValueError):
+            loadtest.run_load(self.api_url, None)
+
+@unittest.skipUnless(loadtest.available_server(), 'needs waitress or gunicorn')
+class TestServerBoot(unittest.TestCase):
+    def test_server_starts_and_stops(self):
+        server = loadtest.Server(threads=2)
+        with server:
+            self.assertTrue(loadtest.requests.get(f"{server.url}/api/health").ok)
+            work_dir = server.work_dir
+        self.assertIsNotNone(server.process.poll())
+        self.assertFalse(os.path.exists(work_dir))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import logs
+from test_carriers import make_png
+
+class LoggingTestCase(unittest.TestCase):
+    def configure(self, **kwargs):
+        """Install the handler on a StringIO, restoring the root logger afterwards"""
+        root = logging.getLogger()
+        level = root.level
+        stream = io.StringIO()
+        handler = logs.configure_logging(stream=stream, **kwargs)
+        self.addCleanup(root.setLevel, level)
+        self.addCleanup(root.removeHandler, handler)
+        return stream
+
+    def records(self, stream):
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+class TestLogs(LoggingTestCase):
+    def test_json_lines(self):
+        """Test records become JSON objects with their extra fields and exception."""
+        stream = self.configure(level='INFO')
+        logger = logging.getLogger('test_logs')
+        logger.info("Reaped %d files", 3, extra={'expired': 2, 'evicted': 1})
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logger.exception("Failed")
+
+        first, second = self.records(stream)
+        self.assertEqual((first['level'], first['logger'], first['message']), ('INFO', 'test_logs', 'Reaped 3 files'))
+        self.assertEqual((first['expired'], first['evicted']), (2, 1))
+        self.assertIn('ValueError: boom', second['exception'])
+
+    def test_redaction(self):
+        """Test secret fields and secrets inside messages are masked."""
+        stream = self.configure(level='INFO')
+        logger = logging.getLogger('test_logs')
+        logger.info("Login with password=hunter2, token: 'abc123'", extra={'password': 'hunter2', 'user': 'sam'})
+
+        record, = self.records(stream)
+        self.assertNotIn('hunter2', stream.getvalue())
+        self.assertNotIn('abc123', stream.getvalue())
+        self.assertEqual((record['password'], record['user']), (logs.REDACTED, 'sam'))
+        self.assertIn(f"password={logs.REDACTED}", record['message'])
+
+    def test_debug_sampling_and_reconfiguring(self):
+        """Test DEBUG records are sampled while other levels always pass, and reconfiguring replaces the handler."""
+        stream = self.configure(level='DEBUG', debug_sample_rate=0)
+        logger = logging.getLogger('test_logs')
+        logger.debug("dropped")
+        logger.warning("kept")
+        self.assertEqual([record['message'] for record in self.records(stream)], ['kept'])
+
+        stream = self.configure(level='DEBUG', json_output=False)
+        logger.debug("sampled in")
+        self.assertIn('DEBUG test_logs: sampled in', stream.getvalue())
+        self.assertEqual(sum(getattr(handler, 'configured_by_logs', False)
+                             for handler in logging.getLogger().handlers), 1)
+
+class TestRequestLogging(LoggingTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3'),
+                                              'LOG_FORMAT': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('api._output_store', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def round_trip(self):
+        stego = self.app.post('/api/encrypt?inline=1', data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'hidden note',
+            'password': 'Fixed-Pass-123'
+        }).data
+        response = self.app.post('/api/decrypt?inline=1', data={'file': (io.BytesIO(stego), 'stego.png')})
+        self.assertEqual(response.json['message'], 'hidden note')
+
+    def test_debug_logs_without_secrets(self):
+        """Test the pipeline logs its debug details but never the password or the message."""
+        stream = self.configure(level='DEBUG')
+        self.round_trip()
+        output = stream.getvalue()
+        self.assertIn('Extracted data length', output)
+        self.assertNotIn('Fixed-Pass-123', output)
+        self.assertNotIn('hidden note', output)
+
+    def test_quiet_at_info(self):
+        """Test nothing is written for a successful request at the default level."""
+        stream = self.configure(level='INFO')
+        self.round_trip()
+        self.assertEqual(stream.getvalue(), '')
+
+if __name__ == '__main__':
+    unittest.main()
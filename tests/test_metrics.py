@@ -0,0 +1,179 @@
+import io
+import os
+import json
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import metrics
+from test_carriers import make_png
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_rendering(self):
+        """Test buckets are cumulative and the +Inf bucket, sum and count agree."""
+        histogram = metrics.Histogram('test_seconds', 'Test histogram', ('stage',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, 'kdf')
+        self.assertEqual(histogram.render(), [
+            'test_seconds_bucket{stage="kdf",le="0.1"} 2',
+            'test_seconds_bucket{stage="kdf",le="1"} 3',
+            'test_seconds_bucket{stage="kdf",le="+Inf"} 4',
+            'test_seconds_sum{stage="kdf"} 2.65',
+            'test_seconds_count{stage="kdf"} 4',
+        ])
+
+    def test_stage_labels_and_errors(self):
+        """Test stages take the request's media type unless given one, and count exceptions."""
+        @metrics.stage('test_decorated', 'audio')
+        def work():
+            return 42
+
+        self.assertEqual(work(), 42)
+        self.assertEqual(metrics.STAGE_DURATION.samples(('test_decorated', 'audio'))[0], 1)
+
+        metrics.set_media_type('image')
+        try:
+            with self.assertRaises(ValueError):
+                with metrics.stage('test_block'):
+                    raise ValueError('boom')
+        finally:
+            metrics.set_media_type(None)
+        self.assertEqual(metrics.STAGE_DURATION.samples(('test_block', 'image'))[0], 1)
+        self.assertEqual(metrics.STAGE_ERRORS.value('test_block', 'image'), 1)
+        with metrics.stage('test_block'):
+            pass
+        self.assertEqual(metrics.STAGE_DURATION.samples(('test_block', 'none'))[0], 1)
+
+    def test_slow_log_keeps_slowest(self):
+        """Test the slow log keeps the N slowest requests, slowest first, and mirrors them to its file."""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, 'slowest.json')
+        slow_log = metrics.SlowLog(2, path)
+        for total_ms in (5.0, 50.0, 1.0, 20.0):
+            slow_log.record({'total_ms': total_ms})
+        self.assertEqual([entry['total_ms'] for entry in slow_log.entries()], [50.0, 20.0])
+        with open(path) as f:
+            self.assertEqual(json.load(f), slow_log.entries())
+        self.assertFalse(slow_log.record({'total_ms': 2.0}))
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('api._output_store', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_encrypt_records_every_stage(self):
+        """Test an encryption records each pipeline stage under its media type and shows up in /api/metrics."""
+        stages = ('upload_save', 'compress', 'kdf', 'encrypt', 'convert', 'decode', 'embed', 'encode')
+        before = {name: metrics.STAGE_DURATION.samples((name, 'image'))[0] for name in stages}
+        requests_before = metrics.REQUESTS.value('encrypt', 'image', '200')
+
+        response = self.app.post('/api/encrypt', data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'a message long enough to take the AES path',
+            'password': 'Fixed-Pass-123'
+        })
+        self.assertEqual(response.status_code, 200, response.json)
+        for name in stages:
+            self.assertGreater(metrics.STAGE_DURATION.samples((name, 'image'))[0], before[name], name)
+        # Decoding the cover is one observation, however many steps it takes
+        self.assertEqual(metrics.STAGE_DURATION.samples(('decode', 'image'))[0], before['decode'] + 1)
+        self.assertEqual(metrics.REQUESTS.value('encrypt', 'image', '200'), requests_before + 1)
+
+        response = self.app.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+        self.assertIn('# TYPE stego_stage_duration_seconds histogram', text)
+        self.assertIn('stego_stage_duration_seconds_count{stage="kdf",media_type="image"}', text)
+        self.assertIn('stego_requests_total{endpoint="encrypt",media_type="image",status="200"}', text)
+        # The media type does not leak into the next request on the same thread
+        self.assertIsNone(metrics.current_media_type())
+
+class TestRequestTraces(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        self.trace_log = os.path.join(self.temp_dir, 'slowest.json')
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3'),
+                                              'TRACE_SLOWEST': 5, 'TRACE_LOG': self.trace_log})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ('api._output_store', 'api._slow_log'):
+            patcher = patch(name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def encrypt(self, query=''):
+        return self.app.post(f'/api/encrypt{query}', data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'a message long enough to take the AES path',
+            'password': 'Fixed-Pass-123'
+        })
+
+    def test_server_timing_and_timings_field(self):
+        """Test encrypt responses break down their stages in Server-Timing and, if asked, in the body."""
+        response = self.encrypt()
+        self.assertEqual(response.status_code, 200, response.json)
+        server_timing = response.headers['Server-Timing']
+        for name in ('upload_save', 'kdf', 'embed', 'encode', 'total'):
+            self.assertIn(f"{name};dur=", server_timing)
+        self.assertNotIn('timings', response.json)
+
+        response = self.encrypt('?timings=1')
+        timings = response.json['timings']
+        self.assertEqual(set(timings), {'total_ms', 'stages_ms', 'bytes_in', 'bytes_out'})
+        self.assertGreater(timings['stages_ms']['kdf'], 0)
+        self.assertGreaterEqual(timings['total_ms'], sum(timings['stages_ms'].values()) / 2)
+        self.assertEqual(timings['bytes_in'], int(response.request.headers['Content-Length']))
+        self.assertGreater(timings['bytes_out'], 0)
+
+        # Inline responses are the stego file itself, so only the header carries the breakdown
+        response = self.encrypt('?inline=1&timings=1')
+        self.assertIn('embed;dur=', response.headers['Server-Timing'])
+        self.assertEqual(response.data[:8], b'\x89PNG\r\n\x1a\n')
+
+        # Other endpoints are not traced
+        self.assertNotIn('Server-Timing', self.app.get('/api/health').headers)
+
+    def test_qr_and_slowest_requests(self):
+        """Test QR responses are traced and the slowest requests are kept with their stages."""
+        response = self.app.post('/api/encrypt-qr?timings=1', data={'message': 'hidden note',
+                                                                     'password': 'Fixed-Pass-123'})
+        self.assertEqual(response.status_code, 200, response.json)
+        self.assertIn('qr_render', response.json['timings']['stages_ms'])
+        self.encrypt()
+
+        slowest = self.app.get('/api/traces').json['slowest']
+        self.assertEqual(len(slowest), 2)
+        self.assertGreaterEqual(slowest[0]['total_ms'], slowest[1]['total_ms'])
+        self.assertEqual({entry['endpoint'] for entry in slowest}, {'encrypt', 'encrypt_qr'})
+        encrypt = next(entry for entry in slowest if entry['endpoint'] == 'encrypt')
+        self.assertEqual((encrypt['media_type'], encrypt['status'], encrypt['filename']), ('image', 200, 'cover.png'))
+        with open(self.trace_log) as f:
+            self.assertEqual(json.load(f), slowest)
+
+if __name__ == '__main__':
+    unittest.main()
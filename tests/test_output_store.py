@@ -0,0 +1,160 @@
+import io
+import os
+import sys
+import time
+import hashlib
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import output_store
+from test_carriers import make_png
+
+class TestOutputStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.temp_dir, 'output')
+        self.store = output_store.OutputStore(self.folder, os.path.join(self.temp_dir, 'outputs.sqlite3'),
+                                              ttl=60, quota_bytes=250)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, size):
+        with open(os.path.join(self.folder, name), 'wb') as f:
+            f.write(b'x' * size)
+
+    def test_content_names(self):
+        """Test names depend on the payload and the carrier bytes, and keep the original name."""
+        carrier = os.path.join(self.temp_dir, 'cover.png')
+        with open(carrier, 'wb') as f:
+            f.write(b'cover')
+        digest = output_store.content_digest(b'payload', carrier)
+        self.assertNotEqual(digest, output_store.content_digest(b'other payload', carrier))
+        self.assertEqual(output_store.content_name('stego_cover.png', digest), f"stego_cover_{digest[:16]}.png")
+
+    def test_quota_evicts_least_recently_used(self):
+        """Test adding past the quota removes the files downloaded longest ago, never the new one."""
+        for name in ('a.png', 'b.png'):
+            self.write(name, 100)
+            self.store.add(name)
+            time.sleep(0.01)
+        self.store.touch('a.png')
+
+        self.write('c.png', 100)
+        self.store.add('c.png')
+        self.assertEqual(sorted(os.listdir(self.folder)), ['a.png', 'c.png'])
+
+        self.write('huge.png', 300)
+        self.store.add('huge.png')
+        self.assertEqual(os.listdir(self.folder), ['huge.png'])
+        usage = self.store.usage()
+        self.assertEqual((usage['files'], usage['bytes'], usage['evicted_total']), (1, 300, 3))
+
+    def test_reap(self):
+        """Test expired files are deleted, unknown files adopted and vanished ones forgotten."""
+        self.write('short.png', 10)
+        self.store.add('short.png', ttl=1)
+        self.write('kept.png', 10)
+        self.store.add('kept.png')
+        self.write('stray.png', 10)
+        self.write('gone.png', 10)
+        self.store.add('gone.png')
+        os.remove(os.path.join(self.folder, 'gone.png'))
+
+        with patch('output_store.time.time', return_value=time.time() + 5):
+            result = self.store.reap()
+        self.assertEqual(result, {'adopted': 1, 'missing': 1, 'expired': 1, 'evicted': 0})
+        self.assertEqual(sorted(os.listdir(self.folder)), ['kept.png', 'stray.png'])
+        usage = self.store.usage()
+        self.assertEqual((usage['files'], usage['expired_total'], usage['reaps_total']), (2, 1, 1))
+
+    def test_reap_uploads(self):
+        """Test only upload files older than the limit are removed."""
+        uploads = os.path.join(self.temp_dir, 'uploads')
+        os.makedirs(uploads)
+        for name in ('old.wav', 'new.wav'):
+            open(os.path.join(uploads, name), 'wb').close()
+        old = time.time() - 120
+        os.utime(os.path.join(uploads, 'old.wav'), (old, old))
+        self.assertEqual(self.store.reap_uploads(uploads, 60), 1)
+        self.assertEqual(os.listdir(uploads), ['new.wav'])
+        self.assertEqual(self.store.usage()['uploads_removed_total'], 1)
+
+class TestOutputEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        self.uploads = os.path.join(self.temp_dir, 'uploads')
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': self.uploads,
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def encrypt(self, **fields):
+        return self.app.post('/api/encrypt', data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'secret two',
+            'password': 'Fixed-Pass-123',
+            **fields
+        })
+
+    def test_encrypt_stores_output(self):
+        """Test outputs get unique names and a ttl, and the upload is removed once used."""
+        first = self.encrypt(ttl='120').json
+        second = self.encrypt(message='hidden note').json
+        self.assertNotEqual(first['output_filename'], second['output_filename'])
+        # The same request makes the same bytes, stored once under the same name
+        self.assertEqual(self.encrypt(ttl='120').json['output_filename'], first['output_filename'])
+        self.assertAlmostEqual(first['expires_at'], time.time() + 120, delta=5)
+        self.assertEqual(os.listdir(self.uploads), [])
+
+        self.assertEqual(self.app.get(first['download_url']).status_code, 200)
+        usage = self.app.get('/api/storage').json
+        self.assertEqual(usage['files'], 2)
+        self.assertEqual(usage['bytes'], first['file_size'] + second['file_size'])
+
+    def test_conditional_and_range_downloads(self):
+        """Test downloads carry the SHA-256 as a strong ETag and honour If-None-Match and Range."""
+        url = self.encrypt().json['download_url']
+        response = self.app.get(url)
+        etag = hashlib.sha256(response.data).hexdigest()
+        self.assertEqual(response.headers['ETag'], f'"{etag}"')
+
+        self.assertEqual(self.app.get(url, headers={'If-None-Match': f'"{etag}"'}).status_code, 304)
+        response = self.app.get(url, headers={'Range': 'bytes=0-7'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'\x89PNG\r\n\x1a\n')
+
+    def test_offloaded_downloads(self):
+        """Test DOWNLOAD_OFFLOAD hands the file to the web server with an empty body."""
+        body = self.encrypt().json
+        with patch.dict(api.app.config, {'DOWNLOAD_OFFLOAD': 'x-accel-redirect'}):
+            response = self.app.get(body['download_url'])
+        self.assertEqual(response.headers['X-Accel-Redirect'], f"/protected-output/{body['output_filename']}")
+        self.assertEqual(response.data, b'')
+        self.assertIn('ETag', response.headers)
+
+        with patch.dict(api.app.config, {'DOWNLOAD_OFFLOAD': 'x-sendfile'}):
+            response = self.app.get(body['download_url'])
+            self.assertEqual(response.headers['X-Sendfile'],
+                             os.path.abspath(os.path.join(api.app.config['OUTPUT_FOLDER'], body['output_filename'])))
+            self.assertEqual(self.app.get('/api/download/missing.png').status_code, 404)
+
+    def test_invalid_ttl(self):
+        """Test a ttl that is not a positive number of seconds is rejected."""
+        response = self.encrypt(ttl='-5')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['error'], 'ttl must be a positive number of seconds')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import os
+import sys
+import json
+import pstats
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import profiling
+from test_carriers import make_png
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.profile_dir = os.path.join(self.temp_dir, 'profiles')
+        self.app = api.app.test_client()
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3'),
+                                              'PROFILE_TOKEN': 'admin-secret', 'PROFILE_DIR': self.profile_dir,
+                                              'PROFILE_KEEP': 2})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('api._output_store', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def encrypt(self, query='', headers=None):
+        return self.app.post(f'/api/encrypt{query}', headers=headers or {}, data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'secret two',
+            'password': 'Fixed-Pass-123'
+        })
+
+    def test_profiled_request_writes_reports(self):
+        """Test a request with the admin token leaves a loadable .prof and a peak memory report."""
+        response = self.encrypt(headers={'X-Profile-Token': 'admin-secret'})
+        self.assertEqual(response.status_code, 200, response.json)
+        name = response.headers['X-Profile-Id']
+
+        stats = pstats.Stats(os.path.join(self.profile_dir, f"{name}.prof"))
+        self.assertTrue(any(function == 'hide_data_in_image' for _, _, function in stats.stats))
+        with open(os.path.join(self.profile_dir, f"{name}.json")) as f:
+            report = json.load(f)
+        self.assertEqual((report['endpoint'], report['media_type'], report['status']), ('encrypt', 'image', 200))
+        self.assertGreater(report['peak_memory_bytes'], 0)
+        self.assertTrue(report['top_allocations'])
+
+        listing = self.app.get('/api/profiles', headers={'X-Profile-Token': 'admin-secret'}).json['profiles']
+        self.assertEqual([entry['name'] for entry in listing], [name])
+        self.assertNotIn('top_allocations', listing[0])
+        download = self.app.get(f"{listing[0]['prof_url']}?profile=admin-secret")
+        self.assertEqual(download.status_code, 200)
+
+    def test_token_required(self):
+        """Test a wrong or missing token is refused and requests without one are not profiled."""
+        self.assertEqual(self.encrypt('?profile=wrong').status_code, 403)
+        self.assertEqual(self.app.get('/api/profiles').status_code, 403)
+        self.assertEqual(self.app.get('/api/profiles/x.prof?profile=wrong').status_code, 403)
+        response = self.encrypt()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response.headers)
+        self.assertFalse(os.path.exists(self.profile_dir))
+
+        with patch.dict(api.app.config, {'PROFILE_TOKEN': None}):
+            self.assertEqual(self.encrypt('?profile=admin-secret').status_code, 403)
+
+    def test_one_profile_at_a_time(self):
+        """Test a request arriving while another is profiled is served unprofiled, and old reports are pruned."""
+        profile = profiling.start()
+        try:
+            response = self.encrypt('?profile=admin-secret')
+        finally:
+            profiling.finish(profile)
+        self.assertEqual((response.status_code, response.headers['X-Profile-Id']), (200, 'busy'))
+
+        for _ in range(3):
+            self.assertEqual(self.encrypt('?profile=admin-secret').status_code, 200)
+        self.assertEqual(len(profiling.list_profiles(self.profile_dir)), 2)
+        self.assertEqual(len(os.listdir(self.profile_dir)), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import serve
+
+class TestCreateApp(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        patcher = patch.dict(api.app.config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        self.addCleanup(os.chdir, cwd)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_paths_are_made_absolute_and_folders_created(self):
+        app = api.create_app({'OUTPUT_FOLDER': 'out', 'OUTPUT_TTL': 60})
+        self.assertIs(app, api.app)
+        self.assertEqual(app.config['OUTPUT_FOLDER'], os.path.join(os.path.realpath(self.temp_dir), 'out'))
+        self.assertEqual(app.config['OUTPUT_TTL'], 60)
+        for key in api.PATH_SETTINGS:
+            self.assertTrue(os.path.isabs(app.config[key]), key)
+        self.assertTrue(os.path.isdir(app.config['OUTPUT_FOLDER']))
+        self.assertTrue(os.path.isdir(app.config['UPLOAD_FOLDER']))
+
+    def test_config_file(self):
+        with open('production.cfg', 'w') as f:
+            f.write("OUTPUT_TTL = 3600\nADMISSION_MAX_QUEUE = 2\n")
+        app = api.create_app('production.cfg')
+        self.assertEqual(app.config['OUTPUT_TTL'], 3600)
+        self.assertEqual(app.config['ADMISSION_MAX_QUEUE'], 2)
+
+class TestRunnerSettings(unittest.TestCase):
+    def test_counts_follow_the_core_count(self):
+        self.assertEqual(serve.default_workers('gunicorn', cores=8), 8)
+        self.assertEqual(serve.default_workers('waitress', cores=8), 1)
+        self.assertEqual(serve.default_threads('waitress', cores=8), 16)
+        self.assertEqual(serve.default_threads('waitress', cores=1), 4)
+
+    def test_shared_defaults_fit_the_cores(self):
+        workers = serve.default_workers('gunicorn', cores=8)
+        settings = serve.worker_settings(None, workers, cores=8)
+        self.assertLessEqual(settings['ADMISSION_DEFAULT_LIMIT'] * workers, 8)
+        self.assertLessEqual(settings['JOB_DEFAULT_WORKERS'] * workers, 8)
+        self.assertLessEqual(settings['ADMISSION_MEMORY_BUDGET'] * workers, api.app.config['ADMISSION_MEMORY_BUDGET'])
+        settings = serve.worker_settings(None, 2, cores=8)
+        self.assertEqual((settings['ADMISSION_DEFAULT_LIMIT'], settings['JOB_DEFAULT_WORKERS']), (4, 4))
+
+    def test_configured_settings_are_not_divided(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, 'production.cfg')
+        with open(path, 'w') as f:
+            f.write("ADMISSION_DEFAULT_LIMIT = 6\nOUTPUT_TTL = 3600\n")
+        settings = serve.worker_settings(path, 4, cores=8)
+        self.assertEqual(settings['ADMISSION_DEFAULT_LIMIT'], 6)
+        self.assertEqual(settings['OUTPUT_TTL'], 3600)
+        self.assertEqual(settings['JOB_DEFAULT_WORKERS'], 2)
+        self.assertEqual(serve.worker_settings({'JOB_DEFAULT_WORKERS': 3}, 4, cores=8)['JOB_DEFAULT_WORKERS'], 3)
+
+    def test_heavy_paths(self):
+        paths = serve.heavy_paths(api.app)
+        self.assertIn('/api/encrypt', paths)
+        self.assertIn('/api/decrypt-batch', paths)
+        self.assertNotIn('/api/health', paths)
+
+    def test_gunicorn_options_preload(self):
+        options = serve.gunicorn_options('127.0.0.1:0', workers=3, threads=2)
+        self.assertTrue(options['preload_app'])
+        self.assertEqual((options['workers'], options['threads']), (3, 2))
+
+    @unittest.skipUnless(os.name == 'posix' and serve.importlib.util.find_spec('gunicorn'), 'needs gunicorn')
+    def test_gunicorn_accepts_the_options(self):
+        from gunicorn.config import Config
+        config = Config()
+        for key, value in serve.gunicorn_options('127.0.0.1:0', workers=3, threads=2).items():
+            config.set(key, value)
+        self.assertEqual(config.workers, 3)
+
+class TestHeavyRequestRecycler(unittest.TestCase):
+    def worker(self, recycler):
+        worker = SimpleNamespace(alive=True, pid=1, log=MagicMock())
+        recycler.post_fork(None, worker)
+        return worker
+
+    def request(self, recycler, worker, path):
+        recycler.post_request(worker, None, {'PATH_INFO': path}, None)
+
+    def test_worker_stops_after_heavy_requests(self):
+        recycler = serve.HeavyRequestRecycler({'/api/encrypt'}, max_heavy_requests=3, jitter=0)
+        worker = self.worker(recycler)
+        for _ in range(10):
+            self.request(recycler, worker, '/api/health')
+        self.request(recycler, worker, '/api/encrypt')
+        self.request(recycler, worker, '/api/encrypt')
+        self.assertTrue(worker.alive)
+        self.request(recycler, worker, '/api/encrypt')
+        self.assertFalse(worker.alive)
+
+    def test_limits_are_jittered(self):
+        recycler = serve.HeavyRequestRecycler({'/api/encrypt'}, max_heavy_requests=100)
+        limits = {self.worker(recycler).max_heavy_requests for _ in range(50)}
+        self.assertTrue(all(100 <= limit <= 110 for limit in limits))
+        self.assertGreater(len(limits), 1)
+
+    def test_zero_disables_recycling(self):
+        recycler = serve.HeavyRequestRecycler({'/api/encrypt'}, max_heavy_requests=0)
+        worker = self.worker(recycler)
+        for _ in range(5):
+            self.request(recycler, worker, '/api/encrypt')
+        self.assertTrue(worker.alive)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import io
+import os
+import sys
+import pickle
+import hashlib
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import storage
+import output_store
+from test_carriers import make_png
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+class BackendTests:
+    """Behaviour every backend shares; subclasses set self.backend"""
+
+    def put(self, name, data):
+        path = os.path.join(self.temp_dir, f"staged_{name}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.backend.put(name, path)
+        return path
+
+    def test_put_read_delete(self):
+        """Test stored files can be sized, listed, read in chunks and deleted."""
+        data = os.urandom(2500)
+        self.put('stego_a.png', data)
+        self.assertEqual(self.backend.size('stego_a.png'), 2500)
+        self.assertEqual([entry[:2] for entry in self.backend.list()], [('stego_a.png', 2500)])
+        chunks = list(self.backend.iter_chunks('stego_a.png', chunk_size=1000))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 500])
+        self.assertEqual(b''.join(chunks), data)
+
+        self.backend.delete('stego_a.png')
+        self.backend.delete('stego_a.png')
+        with self.assertRaises(FileNotFoundError):
+            self.backend.size('stego_a.png')
+        with self.assertRaises(FileNotFoundError):
+            self.backend.open('stego_a.png')
+
+class TestLocalBackend(BackendTests, unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.backend = storage.LocalBackend(os.path.join(self.temp_dir, 'output'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """Test a backend missing part of the interface fails when created, not on first use."""
+        class WriteOnlyBackend(storage.StorageBackend):
+            def put(self, name, path):
+                pass
+
+        with self.assertRaises(TypeError):
+            WriteOnlyBackend()
+
+    def test_put_in_place(self):
+        """Test a file already in the folder stays where it is."""
+        path = os.path.join(self.backend.folder, 'stego_b.png')
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        self.backend.put('stego_b.png', path)
+        self.assertTrue(os.path.exists(path))
+
+@unittest.skipIf(mock_aws is None, 'boto3 and moto are needed for the S3 backend tests')
+class TestS3Backend(BackendTests, unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='stego-test')
+        self.backend = storage.S3Backend('stego-test', prefix='output/', region_name='us-east-1')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_put_removes_local_copy(self):
+        """Test the local file is removed once uploaded, and only files under the prefix are listed."""
+        path = self.put('stego_c.png', b'data')
+        self.assertFalse(os.path.exists(path))
+        self.backend.client.put_object(Bucket='stego-test', Key='other/file.png', Body=b'x')
+        self.assertEqual([entry[0] for entry in self.backend.list()], ['stego_c.png'])
+
+    def test_pickles_without_client(self):
+        """Test the backend can be sent to job workers, which make their own client."""
+        self.backend.client
+        copy = pickle.loads(pickle.dumps(self.backend))
+        self.assertIsNone(copy._client)
+        self.assertEqual(copy.bucket, 'stego-test')
+
+    def test_output_store_on_s3(self):
+        """Test the output store expires and adopts files in the bucket."""
+        store = output_store.OutputStore(os.path.join(self.temp_dir, 'output'),
+                                         os.path.join(self.temp_dir, 'outputs.sqlite3'), ttl=60, quota_bytes=100,
+                                         backend=self.backend)
+        with open(os.path.join(store.folder, 'stego_d.png'), 'wb') as f:
+            f.write(b'x' * 80)
+        store.add('stego_d.png')
+        self.assertEqual(os.listdir(store.folder), [])
+        self.backend.client.put_object(Bucket='stego-test', Key='output/stego_e.png', Body=b'y' * 40)
+
+        result = store.reap()
+        self.assertEqual((result['adopted'], result['evicted']), (1, 1))
+        self.assertEqual(store.usage()['files'], 1)
+
+@unittest.skipIf(mock_aws is None, 'boto3 and moto are needed for the S3 backend tests')
+class TestS3Downloads(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='stego-test')
+        self.app = api.app.test_client()
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': os.path.join(self.temp_dir, 'uploads'),
+                                              'OUTPUT_FOLDER': os.path.join(self.temp_dir, 'output'),
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3'),
+                                              'STORAGE_BACKEND': 's3', 'S3_BUCKET': 'stego-test',
+                                              'S3_REGION': 'us-east-1', 'DOWNLOAD_CHUNK_SIZE': 4096})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('api._output_store', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_encrypt_then_download(self):
+        """Test outputs go to the bucket and are streamed back by /api/download."""
+        response = self.app.post('/api/encrypt', data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'secret two',
+            'password': 'Fixed-Pass-123'
+        })
+        self.assertEqual(response.status_code, 200, response.json)
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'output')), [])
+
+        response = self.app.get(response.json['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        self.assertEqual(response.data[:8], b'\x89PNG\r\n\x1a\n')
+
+        self.assertEqual(self.app.get('/api/download/missing.png').status_code, 404)
+
+    def test_ranges_and_etags(self):
+        """Test streamed downloads support If-None-Match, Range and If-Range."""
+        url = self.app.post('/api/encrypt', data={
+            'file': (io.BytesIO(make_png(64, 48)), 'cover.png'),
+            'message': 'secret two',
+            'password': 'Fixed-Pass-123'
+        }).json['download_url']
+        data = self.app.get(url).data
+        etag = f'"{hashlib.sha256(data).hexdigest()}"'
+
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.app.get(url, headers={'Range': 'bytes=100-', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f"bytes 100-{len(data) - 1}/{len(data)}")
+        self.assertEqual(response.data, data[100:])
+        # A stale If-Range gets the whole file, an impossible range a 416
+        response = self.app.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual((response.status_code, response.data), (200, data))
+        response = self.app.get(url, headers={'Range': f"bytes={len(data)}-"})
+        self.assertEqual(response.status_code, 416)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import io
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+import admission
+import upload_sessions
+from test_carriers import make_png
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+class TestUploadStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = upload_sessions.UploadStore(self.temp_dir, max_size=1000, ttl=60)
+        self.data = bytes(range(256)) * 2
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_out_of_order_chunks(self):
+        """Test chunks can arrive in any order and the status reports the gaps."""
+        upload_id = self.store.create('cover.wav', len(self.data), sha256(self.data))['upload_id']
+        self.store.write_chunk(upload_id, 300, io.BytesIO(self.data[300:]), 212, sha256(self.data[300:]))
+        status = self.store.write_chunk(upload_id, 0, io.BytesIO(self.data[:100]), 100, sha256(self.data[:100]))
+        self.assertEqual(status['ranges'], [[0, 100], [300, 512]])
+        self.assertEqual(status['next_offset'], 100)
+        with self.assertRaises(ValueError):
+            self.store.finalize(upload_id)
+
+        self.store.write_chunk(upload_id, 100, io.BytesIO(self.data[100:300]), 200, sha256(self.data[100:300]))
+        self.assertTrue(self.store.finalize(upload_id)['finalized'])
+
+        upload = self.store.take(upload_id)
+        self.assertEqual(upload.filename, 'cover.wav')
+        self.assertEqual(upload.stream.read(), self.data)
+        upload.close()
+        # An upload can only be used once
+        with self.assertRaises(KeyError):
+            self.store.take(upload_id)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_restored_upload_can_be_taken_again(self):
+        """Test an upload handed back by a failed request keeps its data and id."""
+        upload_id = self.store.create('cover.wav', len(self.data))['upload_id']
+        self.store.write_chunk(upload_id, 0, io.BytesIO(self.data), len(self.data), sha256(self.data))
+        self.store.finalize(upload_id)
+
+        self.assertTrue(self.store.take(upload_id).restore())
+        upload = self.store.take(upload_id)
+        self.assertEqual(upload.stream.read(), self.data)
+
+        # Once the data has been moved out, there is nothing to give back
+        upload.save(os.path.join(self.temp_dir, 'moved'))
+        self.assertFalse(upload.restore())
+        with self.assertRaises(KeyError):
+            self.store.take(upload_id)
+
+    def test_bad_chunks(self):
+        """Test checksum mismatches, short bodies and out-of-range chunks are not recorded."""
+        upload_id = self.store.create('cover.wav', len(self.data))['upload_id']
+        with self.assertRaises(ValueError):
+            self.store.write_chunk(upload_id, 0, io.BytesIO(self.data[:10]), 10, sha256(b'other'))
+        with self.assertRaises(ValueError):
+            self.store.write_chunk(upload_id, 0, io.BytesIO(self.data[:5]), 10, sha256(self.data[:10]))
+        with self.assertRaises(ValueError):
+            self.store.write_chunk(upload_id, 510, io.BytesIO(self.data[:10]), 10, sha256(self.data[:10]))
+        self.assertEqual(self.store.status(upload_id)['received'], 0)
+
+    def test_limits_and_ids(self):
+        """Test oversized uploads, path-like ids and expired sessions."""
+        with self.assertRaises(ValueError):
+            self.store.create('huge.wav', 1001)
+        with self.assertRaises(KeyError):
+            self.store.status('../etc')
+        upload_id = self.store.create('cover.wav', 10)['upload_id']
+        old = os.path.getmtime(os.path.join(self.temp_dir, upload_id)) - 120
+        os.utime(os.path.join(self.temp_dir, upload_id), (old, old))
+        self.assertEqual(self.store.reap(), 1)
+
+class TestUploadEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.app = api.app.test_client()
+        patcher = patch.dict(api.app.config, {'UPLOAD_FOLDER': self.temp_dir,
+                                              'UPLOAD_SPOOL_DIR': os.path.join(self.temp_dir, 'spool'),
+                                              'OUTPUT_FOLDER': self.temp_dir,
+                                              'OUTPUT_INDEX_DB': os.path.join(self.temp_dir, 'outputs.sqlite3')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_chunked_upload_then_encrypt(self):
+        """Test a file sent in chunks can be used by /api/encrypt through its upload_id."""
+        cover = make_png(64, 48)
+        response = self.app.post('/api/uploads', json={'filename': 'cover.png', 'size': len(cover)})
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json['upload_id']
+        upload_url = response.json['upload_url']
+
+        chunk_size = 4096
+        for offset in range(0, len(cover), chunk_size):
+            chunk = cover[offset:offset + chunk_size]
+            response = self.app.put(f"{upload_url}?offset={offset}", data=chunk,
+                                    headers={'X-Chunk-SHA256': sha256(chunk)})
+            self.assertEqual(response.status_code, 200)
+        response = self.app.put(f"{upload_url}?offset=0", data=b'x', headers={'X-Chunk-SHA256': sha256(b'y')})
+        self.assertEqual(response.status_code, 400)
+
+        self.assertTrue(self.app.get(upload_url).json['complete'])
+        self.assertEqual(self.app.post(f"{upload_url}/finalize").status_code, 200)
+
+        response = self.app.post('/api/encrypt', data={
+            'upload_id': upload_id,
+            'message': 'secret two',
+            'password': 'Fixed-Pass-123',
+            'media_type': 'auto'
+        })
+        self.assertEqual(response.status_code, 200, response.json)
+        self.assertTrue(response.json['output_filename'].startswith('stego_cover_'))
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, response.json['output_filename'])))
+        # The spooled upload is gone once used
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'spool')), [])
+        self.assertEqual(self.app.get(upload_url).status_code, 404)
+
+    def finalized_upload(self, data):
+        upload_id = self.app.post('/api/uploads', json={'filename': 'cover.png', 'size': len(data)}).json['upload_id']
+        self.app.put(f"/api/uploads/{upload_id}?offset=0", data=data, headers={'X-Chunk-SHA256': sha256(data)})
+        self.assertEqual(self.app.post(f"/api/uploads/{upload_id}/finalize").status_code, 200)
+        return upload_id
+
+    def test_upload_survives_rejected_requests(self):
+        """Test a 400 or a 429 leaves the upload in place, so the client can retry with the same upload_id."""
+        upload_id = self.finalized_upload(make_png(64, 48))
+        form = {'upload_id': upload_id, 'password': 'Fixed-Pass-123', 'media_type': 'auto'}
+
+        response = self.app.post('/api/encrypt', data=form)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['error'], 'No message provided')
+
+        form['message'] = 'secret three'
+        with patch('api.admit_request', side_effect=admission.Saturated('Too many image requests in progress', 1)):
+            response = self.app.post('/api/encrypt', data=form)
+        self.assertEqual(response.status_code, 429)
+
+        response = self.app.post('/api/encrypt', data=form)
+        self.assertEqual(response.status_code, 200, response.json)
+        self.assertEqual(self.app.post('/api/encrypt', data=form).status_code, 400)
+
+    def test_unfinalized_upload(self):
+        """Test an upload_id that is not finalized is rejected."""
+        response = self.app.post('/api/uploads', json={'filename': 'cover.png', 'size': 10})
+        response = self.app.post('/api/decrypt', data={'upload_id': response.json['upload_id']})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['message'], 'Upload is not finalized')
+
+if __name__ == '__main__':
+    unittest.main()
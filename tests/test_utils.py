@@ -1,5 +1,6 @@
 import os
 import sys
+import subprocess
 import unittest
 from unittest.mock import patch, MagicMock
 import numpy as np
@@ -8,9 +9,12 @@ from PIL import Image
 # Add the parent directory to sys.path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import zlib
+import utils
 from utils import (
     generate_strong_password, encrypt_message, decrypt_message,
-    hide_data_in_image, extract_data_from_image
+    hide_data_in_image, extract_data_from_image,
+    compress_data, decompress_data, get_zdict
 )
 
 class TestPasswordFunctions(unittest.TestCase):
@@ -31,6 +35,29 @@ class TestPasswordFunctions(unittest.TestCase):
         decrypted = decrypt_message(encrypted, password)
         self.assertEqual(decrypted, message)
 
+class TestPresetDictionary(unittest.TestCase):
+    def test_short_message_shrinks(self):
+        """Test the preset dictionary shrinks a short message far more than plain zlib."""
+        message = b"Please call me when you get this message, the meeting is moved to Friday."
+        plain = compress_data(message)
+        with_dictionary = compress_data(message, use_dictionary=True)
+        self.assertLess(len(with_dictionary), len(plain))
+        self.assertLess(len(with_dictionary), len(message) * 3 // 4)
+        self.assertEqual(decompress_data(with_dictionary), message)
+
+    def test_dictionary_id_recorded(self):
+        """Test the zlib header records the id of the dictionary that was used."""
+        _, zdict = get_zdict()
+        compressed = compress_data(b"The password for the account is in the file I sent you.", use_dictionary=True)
+        self.assertTrue(compressed[1] & 0x20)
+        self.assertEqual(int.from_bytes(compressed[2:6], 'big'), zlib.adler32(zdict))
+
+    def test_encrypt_decrypt_with_dictionary(self):
+        """Test encryption with the preset dictionary round-trips."""
+        message = "Meet me at the train station tomorrow morning at 10."
+        encrypted = encrypt_message(message, "testpassword", use_dictionary=True)
+        self.assertEqual(decrypt_message(encrypted, "testpassword"), message)
+
 class TestImageSteganography(unittest.TestCase):
     @patch('utils.os.path.exists')
     def test_image_functions(self, mock_exists):
@@ -75,5 +102,56 @@ class TestImageSteganography(unittest.TestCase):
                     self.fail(f"hide_data_in_image raised exception {e}")
 
 
+class TestLazyImports(unittest.TestCase):
+    def loaded_after_import(self, module):
+        """Heavy backends in sys.modules after importing module in a fresh interpreter"""
+        code = f"import sys, {module}; print(','.join(m for m in ('cv2', 'qrcode', 'pyzbar') if m in sys.modules))"
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return completed.stdout.strip()
+
+    def test_backends_not_loaded_on_import(self):
+        """Test importing utils or api does not load OpenCV, qrcode or pyzbar."""
+        self.assertEqual(self.loaded_after_import('utils'), '')
+        self.assertEqual(self.loaded_after_import('api'), '')
+
+    def test_qr_decode_loads_opencv_only_as_fallback(self):
+        """Test a QR code that pyzbar reads is decoded without importing OpenCV."""
+        code = (
+            "import sys, types, tempfile, os, utils\n"
+            "from PIL import Image\n"
+            "pyzbar = types.ModuleType('pyzbar.pyzbar')\n"
+            "pyzbar.decode = lambda img: [types.SimpleNamespace(data=b'00')]\n"
+            "sys.modules['pyzbar'] = types.ModuleType('pyzbar')\n"
+            "sys.modules['pyzbar.pyzbar'] = pyzbar\n"
+            "path = os.path.join(tempfile.mkdtemp(), 'qr.png')\n"
+            "Image.new('RGB', (10, 10)).save(path)\n"
+            "utils.extract_message_from_qr(path, 'qr-pass')\n"
+            "print('cv2' in sys.modules)\n"
+        )
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(completed.stdout.strip(), 'False')
+
+    def test_warm_up_loads_backends_and_skips_failures(self):
+        """Test warm_up imports the requested backends and skips ones that cannot load."""
+        timings = utils.warm_up(('qrcode', 'no_such_backend'))
+        self.assertIn('qrcode', sys.modules)
+        self.assertEqual(set(timings), {'qrcode'})
+
+    def test_ffmpeg_lookup_is_cached(self):
+        """Test FFmpeg is only searched for once per process."""
+        with patch('utils._ffmpeg_cmd', None), patch('utils.locate_ffmpeg', return_value='ffmpeg') as locate:
+            self.assertEqual(utils.find_or_download_ffmpeg(), 'ffmpeg')
+            self.assertEqual(utils.find_or_download_ffmpeg(), 'ffmpeg')
+        self.assertEqual(locate.call_count, 1)
+
+    def test_qr_error_correction(self):
+        """Test error correction letters map to qrcode constants, with H as the fallback."""
+        from qrcode import constants
+        self.assertEqual(utils.qr_error_correction('l'), constants.ERROR_CORRECT_L)
+        self.assertEqual(utils.qr_error_correction('x'), constants.ERROR_CORRECT_H)
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
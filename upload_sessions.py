@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import mimetypes
+from werkzeug.datastructures import FileStorage
+
+# Bytes read from the request per write when storing a chunk
+COPY_BUFFER_SIZE = 1024 * 1024
+
+class SpooledUpload(FileStorage):
+    """A finalized chunked upload, usable wherever a multipart file part is
+
+    save() to a path moves the assembled file instead of copying it. close()
+    removes what is left of the session; restore() hands it back under its
+    upload id instead, for a request that failed before using it.
+    """
+
+    def __init__(self, path, filename, session_dir, upload_dir=None):
+        super().__init__(stream=open(path, 'rb'), filename=filename,
+                         content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        self.path = path
+        self.session_dir = session_dir
+        self.upload_dir = upload_dir
+
+    def save(self, dst, buffer_size=16384):
+        if isinstance(dst, (str, os.PathLike)):
+            self.stream.close()
+            # A rename when the spool and the destination share a filesystem
+            shutil.move(self.path, dst)
+        else:
+            super().save(dst, buffer_size)
+
+    def close(self):
+        self.stream.close()
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+
+    def restore(self):
+        """Make the upload usable again by its upload id; False (and closed) if its data was already moved away"""
+        self.stream.close()
+        if self.upload_dir is not None and os.path.exists(self.path):
+            try:
+                os.rename(self.session_dir, self.upload_dir)
+                return True
+            except OSError:
+                pass
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+        return False
+
+class UploadStore:
+    """Resumable uploads assembled in a spool directory, one subdirectory per session
+
+    Each session holds meta.json (written once), the preallocated data file
+    and one marker file per verified chunk, so several server processes can
+    accept chunks of the same upload. Unknown ids raise KeyError; invalid
+    chunks or incomplete uploads raise ValueError.
+    """
+
+    def __init__(self, spool_dir, max_size, ttl):
+        self.spool_dir = spool_dir
+        self.max_size = max_size
+        self.ttl = ttl
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _dir(self, upload_id):
+        # Ids come from URLs, so only accept the hex ids create() hands out
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id or ''):
+            raise KeyError(upload_id)
+        session_dir = os.path.join(self.spool_dir, upload_id)
+        if not os.path.isdir(session_dir):
+            raise KeyError(upload_id)
+        return session_dir
+
+    def _meta(self, session_dir):
+        with open(os.path.join(session_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _ranges(self, session_dir):
+        """Verified byte ranges, merged and sorted"""
+        ranges = []
+        for name in sorted(os.listdir(os.path.join(session_dir, 'chunks'))):
+            start, end = (int(value) for value in name.split('-'))
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([start, end])
+        return ranges
+
+    def create(self, filename, size, sha256=None):
+        """Start an upload of size bytes and return its status"""
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError("size must be a positive number of bytes")
+        if size > self.max_size:
+            raise ValueError(f"Upload is too large (at most {self.max_size} bytes)")
+        self.reap()
+
+        upload_id = uuid.uuid4().hex
+        session_dir = os.path.join(self.spool_dir, upload_id)
+        os.makedirs(os.path.join(session_dir, 'chunks'))
+        # Sparse where the filesystem allows, so space is only used as chunks arrive
+        with open(os.path.join(session_dir, 'data'), 'wb') as f:
+            f.truncate(size)
+        with open(os.path.join(session_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'filename': filename, 'size': size, 'sha256': sha256, 'created_at': time.time()}, f)
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """Return what has been received, for clients resuming an upload"""
+        session_dir = self._dir(upload_id)
+        meta = self._meta(session_dir)
+        ranges = self._ranges(session_dir)
+        received = sum(end - start for start, end in ranges)
+        return {
+            'upload_id': upload_id,
+            'filename': meta['filename'],
+            'size': meta['size'],
+            'received': received,
+            'ranges': ranges,
+            # First byte still missing, where a client resumes sending
+            'next_offset': ranges[0][1] if ranges and ranges[0][0] == 0 else 0,
+            'complete': received == meta['size'],
+            'finalized': os.path.exists(os.path.join(session_dir, 'finalized')),
+            'expires_at': meta['created_at'] + self.ttl
+        }
+
+    def write_chunk(self, upload_id, offset, stream, length, sha256):
+        """Write length bytes read from stream at offset, keeping them only if their SHA-256 matches"""
+        session_dir = self._dir(upload_id)
+        meta = self._meta(session_dir)
+        if os.path.exists(os.path.join(session_dir, 'finalized')):
+            raise ValueError("Upload is already finalized")
+        if offset < 0 or length <= 0 or offset + length > meta['size']:
+            raise ValueError(f"Chunk {offset}+{length} is outside the upload of {meta['size']} bytes")
+
+        ranges = self._ranges(session_dir)
+        covered = any(start <= offset and offset + length <= end for start, end in ranges)
+        if not covered and any(start < offset + length and offset < end for start, end in ranges):
+            raise ValueError(f"Chunk {offset}+{length} overlaps bytes already received")
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(os.path.join(session_dir, 'data'), 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                block = stream.read(min(COPY_BUFFER_SIZE, length - written))
+                if not block:
+                    break
+                digest.update(block)
+                # A resent chunk is only checked, so a bad retry cannot damage verified bytes
+                if not covered:
+                    f.write(block)
+                written += len(block)
+        if written != length:
+            raise ValueError(f"Chunk ended after {written} of {length} bytes")
+        if digest.hexdigest() != sha256.lower():
+            # The bytes stay in the data file but the range is not recorded, so it must be resent
+            raise ValueError("Chunk checksum mismatch")
+
+        open(os.path.join(session_dir, 'chunks', f"{offset:020d}-{offset + length:020d}"), 'wb').close()
+        return self.status(upload_id)
+
+    def finalize(self, upload_id):
+        """Check the upload is complete (and matches its SHA-256, if one was given) and mark it ready"""
+        session_dir = self._dir(upload_id)
+        status = self.status(upload_id)
+        if not status['complete']:
+            raise ValueError(f"Upload is incomplete: {status['received']} of {status['size']} bytes received")
+
+        expected = self._meta(session_dir)['sha256']
+        if expected and not status['finalized']:
+            digest = hashlib.sha256()
+            with open(os.path.join(session_dir, 'data'), 'rb') as f:
+                for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+                    digest.update(block)
+            if digest.hexdigest() != expected.lower():
+                raise ValueError("File checksum mismatch")
+
+        open(os.path.join(session_dir, 'finalized'), 'wb').close()
+        return self.status(upload_id)
+
+    def take(self, upload_id):
+        """Claim a finalized upload for one request and return it as a SpooledUpload"""
+        session_dir = self._dir(upload_id)
+        if not os.path.exists(os.path.join(session_dir, 'finalized')):
+            raise ValueError("Upload is not finalized")
+        filename = self._meta(session_dir)['filename']
+
+        # The rename is atomic, so two requests cannot both use the same upload
+        claimed_dir = os.path.join(self.spool_dir, f"claimed_{upload_id}_{uuid.uuid4().hex}")
+        try:
+            os.rename(session_dir, claimed_dir)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+        return SpooledUpload(os.path.join(claimed_dir, 'data'), filename, claimed_dir, session_dir)
+
+    def discard(self, upload_id):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def reap(self):
+        """Remove sessions older than the TTL and return how many were removed"""
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.spool_dir):
+            session_dir = os.path.join(self.spool_dir, name)
+            try:
+                if os.path.getmtime(session_dir) < cutoff:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
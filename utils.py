@@ -7,18 +7,38 @@ import numpy as np
 import wave
 import struct
 import io
-import cv2
 import random
 import binascii
 import string
 import subprocess
 import tempfile
-import urllib.request
-import zipfile
-import shutil
 import zlib  # Add zlib for compression
-import qrcode  # Import qrcode library
+import re
+import time
+import logging
+import importlib
+from bitstream import BitReader, terminated
+import metrics
 
+# cv2 (video, QR decoding), qrcode, pyzbar and the FFmpeg download helpers are imported by the functions
+# that use them, so processes that only handle text, images or WAV audio never load them (see warm_up)
+
+logger = logging.getLogger(__name__)
+
+# Backends warm_up() can load ahead of time; 'ffmpeg' also runs FFmpeg discovery
+WARM_UP_BACKENDS = ('cv2', 'qrcode', 'pyzbar', 'ffmpeg')
+
+# Result of find_or_download_ffmpeg, looked up once per process
+_ffmpeg_cmd = None
+
+# Versioned preset dictionaries for compressing short messages (built by build_zdict.py)
+ZDICT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zdict')
+_zdicts = None
+
+# Output bytes written per call when streaming a carrier to disk
+WRITE_CHUNK_BYTES = 1024 * 1024
+
+@metrics.stage('kdf')
 def derive_key(password, salt=None):
     """Derive a 32-byte key from a password using SHA-256"""
     if salt is None:
@@ -26,47 +46,129 @@ def derive_key(password, salt=None):
     key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 100000, dklen=32)
     return key, salt
 
-def compress_data(data):
-    """Compress data using zlib with maximum compression level, but only if it actually reduces size"""
+def load_zdicts():
+    """Load the shipped preset dictionaries once, keyed by version number"""
+    global _zdicts
+    if _zdicts is None:
+        zdicts = {}
+        if os.path.isdir(ZDICT_DIR):
+            for name in os.listdir(ZDICT_DIR):
+                match = re.fullmatch(r'v(\d+)\.bin', name)
+                if match:
+                    with open(os.path.join(ZDICT_DIR, name), 'rb') as f:
+                        zdicts[int(match.group(1))] = f.read()
+        _zdicts = zdicts
+    return _zdicts
+
+def get_zdict(version=None):
+    """Return (version, dictionary) for a dictionary version, or the latest one if version is None"""
+    zdicts = load_zdicts()
+    if not zdicts:
+        raise ValueError(f"No preset dictionaries found in {ZDICT_DIR}")
+    if version is None:
+        version = max(zdicts)
+    if version not in zdicts:
+        raise ValueError(f"Unknown preset dictionary version: {version}")
+    return version, zdicts[version]
+
+def find_zdict(dict_id):
+    """Find a preset dictionary by the Adler-32 id zlib records in the stream header"""
+    for zdict in load_zdicts().values():
+        if zlib.adler32(zdict) == dict_id:
+            return zdict
+    return None
+
+def warm_up(backends=WARM_UP_BACKENDS):
+    """Load the given backends now instead of on first use, and return the seconds each took
+
+    Meant for the master process of a preforking server, so every worker starts with
+    them loaded. Backends that fail to load (pyzbar without the zbar library, say) are
+    logged and skipped. On Windows, 'ffmpeg' may download FFmpeg if it is not installed.
+    """
+    timings = {}
+    for backend in backends:
+        started = time.perf_counter()
+        try:
+            if backend == 'ffmpeg':
+                find_or_download_ffmpeg()
+            elif backend == 'pyzbar':
+                importlib.import_module('pyzbar.pyzbar')
+            else:
+                importlib.import_module(backend)
+        except Exception as e:
+            logger.warning("Could not warm up %s: %s", backend, e)
+            continue
+        timings[backend] = round(time.perf_counter() - started, 4)
+    load_zdicts()
+    return timings
+
+@metrics.stage('compress')
+def compress_data(data, use_dictionary=False):
+    """Compress data using zlib with maximum compression level, but only if it actually reduces size
+
+    With use_dictionary, the latest preset dictionary is also tried and used when it
+    gives a smaller result. zlib records the dictionary id in the stream header, so
+    decompress_data can pick the right dictionary later.
+    """
     if isinstance(data, str):
         data = data.encode('utf-8')
     
     # Try compressing the data
     compressed = zlib.compress(data, level=9)  # Use maximum compression level
     
+    if use_dictionary:
+        version, zdict = get_zdict()
+        compressor = zlib.compressobj(level=9, zdict=zdict)
+        dict_compressed = compressor.compress(data) + compressor.flush()
+        if len(dict_compressed) < len(compressed):
+            logger.debug("Preset dictionary v%d reduced compressed size from %d to %d bytes", version, len(compressed), len(dict_compressed))
+            compressed = dict_compressed
+    
     # Only return the compressed data if it's actually smaller
     if len(compressed) < len(data):
-        print(f"DEBUG: Compression reduced size from {len(data)} to {len(compressed)} bytes")
+        logger.debug("Compression reduced size from %d to %d bytes", len(data), len(compressed))
         return compressed
     else:
-        print(f"DEBUG: Compression would increase size from {len(data)} to {len(compressed)} bytes, using original data")
+        logger.debug("Compression would increase size from %d to %d bytes, using original data", len(data), len(compressed))
         # Add a marker byte (0xFF) to indicate uncompressed data
         return b'\xFF' + data
 
+@metrics.stage('decompress')
 def decompress_data(compressed_data):
     """Decompress data that was compressed using zlib, or return original data if not compressed"""
     try:
         # Check if data is marked as uncompressed (first byte is 0xFF)
         if compressed_data and len(compressed_data) > 0 and compressed_data[0] == 0xFF:
             # Return the original data (without the marker byte)
-            print("DEBUG: Data was not compressed, returning original data")
+            logger.debug("Data was not compressed, returning original data")
             return compressed_data[1:]
         
+        # A set FDICT flag means a preset dictionary was used, its Adler-32 id follows the header
+        if len(compressed_data) >= 6 and compressed_data[1] & 0x20:
+            dict_id = struct.unpack('>I', compressed_data[2:6])[0]
+            zdict = find_zdict(dict_id)
+            if zdict is None:
+                raise ValueError(f"Decompression error: unknown preset dictionary id 0x{dict_id:08x}")
+            decompressor = zlib.decompressobj(zdict=zdict)
+            decompressed = decompressor.decompress(compressed_data) + decompressor.flush()
+            logger.debug("Decompressed data from %d to %d bytes using a preset dictionary", len(compressed_data), len(decompressed))
+            return decompressed
+        
         # Otherwise decompress the data
         decompressed = zlib.decompress(compressed_data)
-        print(f"DEBUG: Successfully decompressed data from {len(compressed_data)} to {len(decompressed)} bytes")
+        logger.debug("Decompressed data from %d to %d bytes", len(compressed_data), len(decompressed))
         return decompressed
     except zlib.error as e:
-        print(f"DEBUG: Decompression error: {str(e)}")
+        logger.debug("Decompression error: %s", e)
         raise ValueError(f"Decompression error: {str(e)}")
 
-def encrypt_message(message, password):
+def encrypt_message(message, password, use_dictionary=False):
     """Encrypt a message using AES-256-CBC with a password"""
     # Compress the message first
     if isinstance(message, str):
         message = message.encode('utf-8')
     
-    compressed_message = compress_data(message)
+    compressed_message = compress_data(message, use_dictionary=use_dictionary)
     
     # Check if the data was actually compressed (marker byte 0xFF means not compressed)
     is_compressed = True
@@ -94,7 +196,8 @@ def encrypt_message(message, password):
         compression_marker = b'\xFF'
     
     # Pad and encrypt the message
-    ciphertext = cipher.encrypt(pad(compressed_message, AES.block_size))
+    with metrics.stage('encrypt'):
+        ciphertext = cipher.encrypt(pad(compressed_message, AES.block_size))
     
     # Return salt + IV + compression marker + ciphertext
     return salt + iv + compression_marker + ciphertext
@@ -117,7 +220,8 @@ def decrypt_message(encrypted_data, password):
         
         # Create cipher object and decrypt
         cipher = AES.new(key, AES.MODE_CBC, iv)
-        decrypted = unpad(cipher.decrypt(ciphertext), AES.block_size)
+        with metrics.stage('decrypt'):
+            decrypted = unpad(cipher.decrypt(ciphertext), AES.block_size)
         
         # Check compression marker to determine if we need to decompress
         is_compressed = compression_marker != b'\xFF'
@@ -141,8 +245,11 @@ def decrypt_message(encrypted_data, password):
         return f"Decryption error: {str(e)}"
 
 # Image steganography functions
-def hide_data_in_image(input_path, output_path, data):
-    """Hide binary data inside an image using LSB steganography"""
+def hide_data_in_image(input_path, output_path, data, progress=None):
+    """Hide binary data inside an image using LSB steganography
+
+    progress, if given, is called as progress(stage, done, total) while the data is embedded
+    """
     try:
         # Ensure input_path and output_path are strings, not bytes
         if isinstance(input_path, bytes):
@@ -159,159 +266,104 @@ def hide_data_in_image(input_path, output_path, data):
         output_is_jpeg = output_path.lower().endswith(('.jpg', '.jpeg'))
         
         if input_is_jpeg:
-            print("WARNING: Input image is in JPEG format, which is not suitable for steganography due to lossy compression.")
-            print("Converting to PNG format for processing...")
+            logger.warning("Input image is JPEG, which is lossy; converting to PNG for processing")
         
         if output_is_jpeg:
-            print("WARNING: JPEG output format is not suitable for steganography due to lossy compression!")
-            print("The hidden data will likely be corrupted or lost when saved as JPEG.")
-            print("Changing output format to PNG for reliable steganography.")
+            logger.warning("JPEG output would corrupt the hidden data; saving as PNG instead")
             output_path = os.path.splitext(output_path)[0] + ".png"
         
-        # Convert binary data to a string of bits
-        binary_data = ''.join(format(byte, '08b') for byte in data)
-        # Add terminator
-        binary_data += '00000000'  # Null byte as terminator
+        # Payload bits followed by a null byte terminator
+        writer = terminated(data)
         
-        print(f"DEBUG: Data length in bits: {len(binary_data)}")
-        print(f"DEBUG: First 32 bits of data: {binary_data[:32]}")
+        logger.debug("Data length in bits: %d", len(writer))
         
-        # Open the image
+        # Open the image; only the header is read until the pixels are needed
         img = Image.open(input_path)
-        # Convert image to RGB if it's not already
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
         
         # Get image dimensions
         width, height = img.size
-        print(f"DEBUG: Image dimensions: {width}x{height}")
+        logger.debug("Image dimensions: %dx%d", width, height)
         
-        # Check if the image is big enough to hide the data
+        # Check if the image is big enough to hide the data, before decoding it
         max_bits = width * height * 3
-        print(f"DEBUG: Maximum bits that can be stored: {max_bits}")
+        logger.debug("Maximum bits that can be stored: %d", max_bits)
         
-        if len(binary_data) > max_bits:
-            raise ValueError(f"Data too large to hide in this image. Need {len(binary_data)} bits, but image can only store {max_bits} bits")
+        if len(writer) > max_bits:
+            raise ValueError(f"Data too large to hide in this image. Need {len(writer)} bits, but image can only store {max_bits} bits")
         
-        # Convert image to numpy array for easier manipulation
-        img_array = np.array(img)
+        # Decode to RGB and convert to a numpy array for easier manipulation, as one stage
+        with metrics.stage('decode', 'image'):
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img_array = np.array(img)
         
         # Flatten the array for easier iteration
         flattened = img_array.reshape(-1)
-        print(f"DEBUG: Array length: {len(flattened)}")
+        logger.debug("Array length: %d", len(flattened))
         
-        # Embed data
-        for i in range(len(binary_data)):
-            if i < len(flattened):
-                # Replace the least significant bit
-                flattened[i] = (flattened[i] & 0xFE) | int(binary_data[i])
+        # Embed data by replacing the least significant bits
+        with metrics.stage('embed', 'image'):
+            writer.embed(flattened, progress=progress)
         
-        print(f"DEBUG: Data embedded: {len(binary_data)} bits")
+        logger.debug("Data embedded: %d bits", len(writer))
         
         # Reshape back to original dimensions
         img_array = flattened.reshape(img_array.shape)
         
-        # Create a new image from the modified array
-        modified_img = Image.fromarray(img_array)
-        
-        # Save the modified image
-        modified_img.save(output_path)
-        print(f"DEBUG: Image saved to {output_path}")
-        
-        # Verify the data was embedded correctly
-        # Read back the first 32 bits for verification
-        verification_bits = ""
-        for i in range(min(32, len(binary_data))):
-            verification_bits += str(flattened[i] & 1)
-        
-        print(f"DEBUG: Verification - first 32 bits read back: {verification_bits}")
-        print(f"DEBUG: Do they match? {verification_bits == binary_data[:len(verification_bits)]}")
+        # Create a new image from the modified array and save it
+        with metrics.stage('encode', 'image'):
+            modified_img = Image.fromarray(img_array)
+            modified_img.save(output_path)
+        logger.debug("Image saved to %s", output_path)
         
         return output_path
     except Exception as e:
-        print(f"Error in hide_data_in_image: {str(e)}")
+        logger.error("Error in hide_data_in_image: %s", e)
         raise
 
-def extract_data_from_image(image_path):
+def extract_data_from_image(image_path, progress=None):
     """Extract hidden data from an image using LSB steganography"""
-    # Open the image
-    img = Image.open(image_path)
-    
-    # Convert image to RGB if it's not already
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    # Convert image to numpy array
-    img_array = np.array(img)
+    with metrics.stage('decode', 'image'):
+        # Open the image
+        img = Image.open(image_path)
+        
+        # Convert image to RGB if it's not already
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        # Convert image to numpy array
+        img_array = np.array(img)
     
     # Get dimensions for debug output
     height, width = img_array.shape[:2]
-    print(f"DEBUG: Image dimensions: {width}x{height}")
+    logger.debug("Image dimensions: %dx%d", width, height)
     
     # Flatten the array for easier iteration
     flattened = img_array.reshape(-1)
-    print(f"DEBUG: Total pixels to scan: {len(flattened)}")
-    
-    # Extract the LSB from each byte
-    extracted_bits = ""
-    found_terminator = False
-    terminator_position = -1
-    
-    # Print the first 100 bits to see pattern
-    debug_bits = []
-    
-    # Scan the entire image, not just the first 1000 pixels
-    for i in range(len(flattened)):
-        bit = str(flattened[i] & 1)
-        extracted_bits += bit
-        
-        # Save first 100 bits for debug output
-        if i < 100:
-            debug_bits.append(bit)
-        
-        # Check for terminator every 8 bits
-        if len(extracted_bits) % 8 == 0 and len(extracted_bits) >= 8:
-            byte_index = len(extracted_bits) - 8
-            byte = extracted_bits[byte_index:byte_index+8]
-            if byte == '00000000':
-                found_terminator = True
-                terminator_position = i
-                extracted_bits = extracted_bits[:byte_index]
-                print(f"DEBUG: Found terminator at position {terminator_position}")
-                break
-    
-    print(f"DEBUG: First 100 extracted bits: {''.join(debug_bits)}")
-    print(f"DEBUG: Terminator found: {found_terminator}")
-    print(f"DEBUG: Total bits extracted: {len(extracted_bits)}")
-    
-    if len(extracted_bits) % 8 != 0:
-        print(f"DEBUG: Warning - extracted bits not multiple of 8: {len(extracted_bits)}")
+    logger.debug("Total pixels to scan: %d", len(flattened))
     
-    # Group the bits into bytes
-    extracted_bytes = []
-    for i in range(0, len(extracted_bits), 8):
-        if i + 8 <= len(extracted_bits):
-            byte = extracted_bits[i:i+8]
-            extracted_bytes.append(int(byte, 2))
+    # Read LSBs up to the null byte terminator, scanning the whole image if needed
+    with metrics.stage('extract', 'image'):
+        result, found_terminator = BitReader(flattened).read_until_terminator(progress=progress)
     
-    result = bytes(extracted_bytes)
-    print(f"DEBUG: Extracted {len(result)} bytes of data")
+    logger.debug("Terminator found: %s", found_terminator)
+    logger.debug("Extracted %d bytes of data", len(result))
     
-    # Print first few bytes as hex for debugging
-    if len(result) > 0:
-        hex_data = ' '.join([f"{b:02x}" for b in result[:16]])
-        print(f"DEBUG: First 16 bytes (hex): {hex_data}")
-    else:
-        print("DEBUG: No data extracted")
+    # Log the first few bytes as hex (only worth formatting when debug logging is on)
+    if logger.isEnabledFor(logging.DEBUG):
+        if len(result) > 0:
+            logger.debug("First 16 bytes (hex): %s", result[:16].hex(' '))
+        else:
+            logger.debug("No data extracted")
     
     return result
 
 # Audio steganography functions
-def hide_data_in_audio(audio_path, output_path, data):
+def hide_data_in_audio(audio_path, output_path, data, progress=None):
     """Hide binary data inside an audio file using LSB steganography"""
     # Check if input is not WAV
     if not audio_path.lower().endswith('.wav'):
-        print(f"Input audio is not WAV format. Converting...")
+        logger.info("Input audio is not WAV, converting")
         converted_path = convert_audio_to_wav(audio_path)
         if not converted_path:
             raise ValueError("Failed to convert audio to WAV format")
@@ -319,12 +371,12 @@ def hide_data_in_audio(audio_path, output_path, data):
     
     # Check if output should be WAV
     if not output_path.lower().endswith('.wav'):
-        print(f"Warning: Output must be WAV format for audio steganography")
+        logger.warning("Audio output must be WAV, changing the output extension")
         output_path = os.path.splitext(output_path)[0] + ".wav"
     
     try:
         # Open the audio file
-        with wave.open(audio_path, 'rb') as audio_file:
+        with metrics.stage('decode', 'audio'), wave.open(audio_path, 'rb') as audio_file:
             # Get audio parameters
             n_channels = audio_file.getnchannels()
             sample_width = audio_file.getsampwidth()
@@ -335,20 +387,17 @@ def hide_data_in_audio(audio_path, output_path, data):
             frames = audio_file.readframes(n_frames)
         
         # Print debug info
-        print(f"DEBUG: Audio parameters: {n_channels} channels, {sample_width} bytes/sample, {framerate} Hz, {n_frames} frames")
-        print(f"DEBUG: Total audio size: {len(frames)} bytes")
+        logger.debug("Audio parameters: %d channels, %d bytes/sample, %d Hz, %d frames", n_channels, sample_width, framerate, n_frames)
+        logger.debug("Total audio size: %d bytes", len(frames))
         
-        # Convert binary data to a string of bits
-        binary_data = ''.join(format(byte, '08b') for byte in data)
-        # Add terminator
-        binary_data += '00000000'  # Null byte as terminator
+        # Payload bits followed by a null byte terminator
+        writer = terminated(data)
         
-        print(f"DEBUG: Data length in bits: {len(binary_data)}")
-        print(f"DEBUG: First 32 bits of data: {binary_data[:32] if len(binary_data) >= 32 else binary_data}")
+        logger.debug("Data length in bits: %d", len(writer))
         
         # Check if the audio file is big enough to hide the data
-        if len(binary_data) > len(frames):
-            raise ValueError(f"Data too large to hide in this audio file. Need {len(binary_data)} bits, but audio has only {len(frames)} bytes")
+        if len(writer) > len(frames):
+            raise ValueError(f"Data too large to hide in this audio file. Need {len(writer)} bits, but audio has only {len(frames)} bytes")
         
         # Create a new audio file
         with wave.open(output_path, 'wb') as output_file:
@@ -358,28 +407,31 @@ def hide_data_in_audio(audio_path, output_path, data):
             frames_list = bytearray(frames)
             
             # Embed one bit per byte
-            for i in range(len(binary_data)):
-                if i < len(frames_list):
-                    # Modify the LSB of the frame byte
-                    frames_list[i] = (frames_list[i] & 0xFE) | int(binary_data[i])
+            with metrics.stage('embed', 'audio'):
+                writer.embed(frames_list, progress=progress)
             
-            print(f"DEBUG: Data embedded: {len(binary_data)} bits")
+            logger.debug("Data embedded: %d bits", len(writer))
             
-            # Write modified frames to output file
-            output_file.writeframes(bytes(frames_list))
+            # Write modified frames to output file in chunks (the header is finalised on close)
+            view = memoryview(frames_list)
+            with metrics.stage('encode', 'audio'):
+                for start in range(0, len(view), WRITE_CHUNK_BYTES):
+                    output_file.writeframesraw(view[start:start + WRITE_CHUNK_BYTES])
+                    if progress is not None:
+                        progress('write', min(start + WRITE_CHUNK_BYTES, len(view)), len(view))
             
-            print(f"DEBUG: Output saved with {len(frames_list)} bytes")
+            logger.debug("Output saved with %d bytes", len(frames_list))
         
         return output_path
     except Exception as e:
-        print(f"Error in hide_data_in_audio: {str(e)}")
+        logger.error("Error in hide_data_in_audio: %s", e)
         raise
 
-def extract_data_from_audio(audio_path):
+def extract_data_from_audio(audio_path, progress=None):
     """Extract hidden data from an audio file using LSB steganography"""
     # Check if input is not WAV
     if not audio_path.lower().endswith('.wav'):
-        print(f"Input audio is not WAV format. Converting...")
+        logger.info("Input audio is not WAV, converting")
         converted_path = convert_audio_to_wav(audio_path)
         if not converted_path:
             raise ValueError("Failed to convert audio to WAV format")
@@ -387,7 +439,7 @@ def extract_data_from_audio(audio_path):
     
     try:
         # Open the audio file
-        with wave.open(audio_path, 'rb') as audio_file:
+        with metrics.stage('decode', 'audio'), wave.open(audio_path, 'rb') as audio_file:
             # Get audio parameters
             n_channels = audio_file.getnchannels()
             sample_width = audio_file.getsampwidth()
@@ -398,70 +450,35 @@ def extract_data_from_audio(audio_path):
             frames = audio_file.readframes(n_frames)
         
         # Print debug info
-        print(f"DEBUG: Audio parameters: {n_channels} channels, {sample_width} bytes/sample, {framerate} Hz, {n_frames} frames")
-        print(f"DEBUG: Total audio size: {len(frames)} bytes")
-        
-        # Extract the LSB from each byte
-        extracted_bits = ""
-        for i in range(len(frames)):
-            # Get LSB from each byte
-            extracted_bits += str(frames[i] & 1)
-            
-            # Check for terminator every 8 bits
-            if len(extracted_bits) % 8 == 0 and len(extracted_bits) >= 8:
-                byte_index = len(extracted_bits) - 8
-                byte = extracted_bits[byte_index:byte_index+8]
-                if byte == '00000000':
-                    # Found terminator, truncate the bits
-                    extracted_bits = extracted_bits[:byte_index]
-                    print(f"DEBUG: Found terminator at position {i}")
-                    break
+        logger.debug("Audio parameters: %d channels, %d bytes/sample, %d Hz, %d frames", n_channels, sample_width, framerate, n_frames)
+        logger.debug("Total audio size: %d bytes", len(frames))
         
-        # Print debug info
-        print(f"DEBUG: Total bits extracted: {len(extracted_bits)}")
-        if len(extracted_bits) > 0:
-            print(f"DEBUG: First 32 bits extracted: {extracted_bits[:32] if len(extracted_bits) >= 32 else extracted_bits}")
+        # Read LSBs up to the null byte terminator, padding a trailing partial byte with zeros
+        with metrics.stage('extract', 'audio'):
+            result, found_terminator = BitReader(frames).read_until_terminator(pad_partial=True, progress=progress)
         
-        # Check if we have valid data
-        if len(extracted_bits) == 0 or len(extracted_bits) % 8 != 0:
-            print(f"DEBUG: Warning - extracted bits not multiple of 8: {len(extracted_bits)}")
-            
-            # Try to pad if almost a multiple of 8
-            remainder = len(extracted_bits) % 8
-            if remainder > 0:
-                padding = '0' * (8 - remainder)
-                extracted_bits += padding
-                print(f"DEBUG: Padded with {8 - remainder} zeros")
-        
-        # Group the bits into bytes
-        extracted_bytes = []
-        for i in range(0, len(extracted_bits), 8):
-            if i + 8 <= len(extracted_bits):
-                byte = extracted_bits[i:i+8]
-                extracted_bytes.append(int(byte, 2))
-        
-        result = bytes(extracted_bytes)
-        print(f"DEBUG: Extracted {len(result)} bytes of data")
-        
-        # Print first few bytes as hex for debugging
-        if len(result) > 0:
-            hex_data = ' '.join([f"{b:02x}" for b in result[:16]])
-            print(f"DEBUG: First 16 bytes (hex): {hex_data}")
-        else:
-            print("DEBUG: No data extracted")
+        logger.debug("Terminator found: %s", found_terminator)
+        logger.debug("Extracted %d bytes of data", len(result))
+        
+        # Log the first few bytes as hex (only worth formatting when debug logging is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            if len(result) > 0:
+                logger.debug("First 16 bytes (hex): %s", result[:16].hex(' '))
+            else:
+                logger.debug("No data extracted")
         
         return result
     except Exception as e:
-        print(f"Error in extract_data_from_audio: {str(e)}")
+        logger.error("Error in extract_data_from_audio: %s", e)
         raise
 
 # Video steganography functions
-def hide_data_in_video(video_path, data, output_path):
+def hide_data_in_video(video_path, data, output_path, progress=None):
     """Hide binary data inside a video file using LSB steganography in frames"""
-    # Convert binary data to a string of bits
-    binary_data = ''.join(format(byte, '08b') for byte in data)
-    # Add terminator
-    binary_data += '00000000'  # Null byte as terminator
+    import cv2
+    
+    # Payload bits followed by a null byte terminator
+    writer = terminated(data)
     
     # Open the video file
     cap = cv2.VideoCapture(video_path)
@@ -470,6 +487,7 @@ def hide_data_in_video(video_path, data, output_path):
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Use appropriate codec
     
     # Create video writer
@@ -480,11 +498,10 @@ def hide_data_in_video(video_path, data, output_path):
     if not ret:
         raise ValueError("Could not read video file")
     
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    bits_per_frame = frame.size  # Each pixel has 3 channels (RGB), and we use 1 bit per channel
-    total_bits = total_frames * bits_per_frame
+    # Only the first frame carries data: 3 channels (RGB) per pixel, 1 bit per channel
+    bits_per_frame = frame.size
     
-    if len(binary_data) > total_bits:
+    if len(writer) > bits_per_frame:
         raise ValueError("Data too large to hide in this video file")
     
     # Reset the video
@@ -494,27 +511,23 @@ def hide_data_in_video(video_path, data, output_path):
     # Hide data in the first frame
     ret, frame = cap.read()
     if ret:
-        # Flatten the frame for easier iteration
-        flattened = frame.flatten()
-        
-        # Embed data
-        for i in range(len(binary_data)):
-            if i < len(flattened):
-                # Replace the least significant bit
-                flattened[i] = (flattened[i] & 0xFE) | int(binary_data[i])
-        
-        # Reshape back to original dimensions
-        frame = flattened.reshape(frame.shape)
+        # Replace the least significant bits of the frame in place
+        with metrics.stage('embed', 'video'):
+            writer.embed(frame, progress=progress)
         
         # Write the modified first frame
         out.write(frame)
     
     # Copy the rest of the frames without modification
+    frames_done = 1
     while True:
+        if progress is not None:
+            progress('frames', frames_done, total_frames)
         ret, frame = cap.read()
         if not ret:
             break
         out.write(frame)
+        frames_done += 1
     
     # Release resources
     cap.release()
@@ -522,8 +535,10 @@ def hide_data_in_video(video_path, data, output_path):
     
     return output_path
 
-def extract_data_from_video(video_path):
+def extract_data_from_video(video_path, progress=None):
     """Extract hidden data from a video file using LSB steganography"""
+    import cv2
+    
     # Open the video file
     cap = cv2.VideoCapture(video_path)
     
@@ -532,35 +547,14 @@ def extract_data_from_video(video_path):
     if not ret:
         raise ValueError("Could not read video file")
     
-    # Flatten the frame for easier iteration
-    flattened = frame.flatten()
-    
-    # Extract the LSB from each byte
-    extracted_bits = ""
-    for i in range(len(flattened)):
-        extracted_bits += str(flattened[i] & 1)
-        
-        # Check for terminator every 8 bits
-        if len(extracted_bits) % 8 == 0:
-            byte_index = len(extracted_bits) - 8
-            byte = extracted_bits[byte_index:byte_index+8]
-            if byte == '00000000':
-                # Found terminator, truncate the bits
-                extracted_bits = extracted_bits[:byte_index]
-                break
-    
-    # Group the bits into bytes
-    extracted_bytes = []
-    for i in range(0, len(extracted_bits), 8):
-        if i + 8 <= len(extracted_bits):
-            byte = extracted_bits[i:i+8]
-            extracted_bytes.append(int(byte, 2))
+    # Read LSBs up to the null byte terminator
+    with metrics.stage('extract', 'video'):
+        result, _ = BitReader(frame).read_until_terminator(progress=progress)
     
     # Release resources
     cap.release()
     
-    # Convert bytes to binary data
-    return bytes(extracted_bytes)
+    return result
 
 def generate_strong_password(length=16):
     """Generate a strong random password"""
@@ -609,7 +603,7 @@ def convert_audio_to_wav(audio_path):
     
     # Check if the input file exists
     if not os.path.exists(audio_path):
-        print(f"Warning: Input file '{audio_path}' doesn't exist. This might be a test call.")
+        logger.warning("Input file %s doesn't exist, only setting up FFmpeg", audio_path)
         # If it looks like a test call, just try to set up FFmpeg
         download_ffmpeg()
         return None
@@ -622,43 +616,49 @@ def convert_audio_to_wav(audio_path):
         ffmpeg_cmd = find_or_download_ffmpeg()
         
         if not ffmpeg_cmd:
-            print("FFmpeg not found and download failed.")
-            print("Please install FFmpeg manually from: https://ffmpeg.org/download.html")
-            print("Make sure to add the bin directory to your PATH.")
+            logger.error("FFmpeg not found and download failed; install it from https://ffmpeg.org/download.html "
+                         "and add its bin directory to PATH")
             return None
                 
         # Use raw strings for Windows paths
         cmd = [ffmpeg_cmd, '-i', audio_path, '-acodec', 'pcm_s16le', '-ar', '44100', '-ac', '2', output_wav]
         
-        print(f"Converting {os.path.basename(audio_path)} to WAV format...")
-        print(f"Running command: {' '.join(cmd)}")
+        logger.info("Converting %s to WAV", os.path.basename(audio_path))
+        logger.debug("Running command: %s", cmd)
         
         # Run with shell=True on Windows
         import platform
         is_windows = platform.system() == "Windows"
         
-        result = subprocess.run(cmd, 
-                              check=True, 
-                              stdout=subprocess.PIPE, 
-                              stderr=subprocess.PIPE,
-                              shell=is_windows)
+        with metrics.stage('ffmpeg', 'audio'):
+            result = subprocess.run(cmd, 
+                                  check=True, 
+                                  stdout=subprocess.PIPE, 
+                                  stderr=subprocess.PIPE,
+                                  shell=is_windows)
         
-        print(f"Successfully converted to WAV: {output_wav}")
+        logger.info("Converted to WAV: %s", output_wav)
         return output_wav
     except subprocess.CalledProcessError as e:
-        print(f"Error converting audio: {str(e)}")
-        if hasattr(e, 'stderr'):
-            print(f"FFmpeg error output: {e.stderr.decode('utf-8', errors='ignore')}")
-        print("Please install ffmpeg or convert the file manually to WAV format.")
+        stderr = e.stderr.decode('utf-8', errors='ignore') if getattr(e, 'stderr', None) else ''
+        logger.error("Error converting audio: %s", e, extra={'ffmpeg_stderr': stderr})
         return None
     except Exception as e:
-        print(f"Unexpected error converting audio: {str(e)}")
-        print("If FFmpeg is not installed, please download it from: https://ffmpeg.org/download.html")
-        print("Make sure to add FFmpeg to your system PATH after installation.")
+        logger.error("Unexpected error converting audio (is FFmpeg installed and on PATH?): %s", e)
         return None
 
 def find_or_download_ffmpeg():
-    """Find FFmpeg on the system or download it if not found on Windows"""
+    """Find FFmpeg on the system or download it if not found on Windows
+
+    The command is looked up once per process; a failed lookup is retried on the next call.
+    """
+    global _ffmpeg_cmd
+    if _ffmpeg_cmd is None:
+        _ffmpeg_cmd = locate_ffmpeg()
+    return _ffmpeg_cmd
+
+def locate_ffmpeg():
+    """Search for FFmpeg (Windows tries each usual location, then downloads it)"""
     import platform
     
     # Check if we're on Windows
@@ -679,7 +679,7 @@ def find_or_download_ffmpeg():
             try:
                 # Test if this path works
                 subprocess.run([path, "-version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-                print(f"Found ffmpeg at: {path}")
+                logger.info("Found ffmpeg at: %s", path)
                 return path
             except Exception:
                 continue
@@ -693,7 +693,7 @@ def find_or_download_ffmpeg():
 def download_ffmpeg():
     """Download FFmpeg for Windows"""
     try:
-        print("FFmpeg not found. Attempting to download...")
+        logger.info("FFmpeg not found, attempting to download it")
         import tempfile
         import urllib.request
         import zipfile
@@ -713,7 +713,7 @@ def download_ffmpeg():
         temp_dir = tempfile.mkdtemp()
         zip_path = os.path.join(temp_dir, "ffmpeg.zip")
         
-        print(f"Downloading FFmpeg from {ffmpeg_url}...")
+        logger.info("Downloading FFmpeg from %s", ffmpeg_url)
         
         # Use a custom user agent to avoid blocking
         headers = {
@@ -728,7 +728,7 @@ def download_ffmpeg():
             shutil.copyfileobj(response, out_file)
         
         # Extract zip
-        print("Extracting FFmpeg...")
+        logger.info("Extracting FFmpeg")
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
             zip_ref.extractall(temp_dir)
         
@@ -739,8 +739,7 @@ def download_ffmpeg():
                 ffmpeg_exe = os.path.join(root, "ffmpeg.exe")
                 # Copy ffmpeg.exe to user's directory
                 shutil.copy2(ffmpeg_exe, user_ffmpeg_exe)
-                print(f"FFmpeg installed to: {user_ffmpeg_dir}")
-                print("Please add this directory to your PATH for future use.")
+                logger.info("FFmpeg installed to %s; add it to PATH for future use", user_ffmpeg_dir)
                 break
         
         # Clean up temp directory
@@ -752,14 +751,14 @@ def download_ffmpeg():
         if os.path.exists(user_ffmpeg_exe):
             return user_ffmpeg_exe
         else:
-            print("Could not install FFmpeg automatically.")
+            logger.error("Could not install FFmpeg automatically")
             return None
             
     except Exception as e:
-        print(f"Error downloading FFmpeg: {str(e)}")
+        logger.error("Error downloading FFmpeg: %s", e)
         return None
 
-def convert_and_hide_in_image(input_path, output_path, data):
+def convert_and_hide_in_image(input_path, output_path, data, progress=None):
     """Convert any image format (including JPEG/JPG) to PNG and hide data in it"""
     try:
         # Ensure input_path and output_path are strings, not bytes
@@ -775,78 +774,94 @@ def convert_and_hide_in_image(input_path, output_path, data):
         # Always ensure output is PNG regardless of extension provided
         if not output_path.lower().endswith('.png'):
             output_path = os.path.splitext(output_path)[0] + ".png"
-            print(f"Changed output path to {output_path} to ensure lossless format")
+            logger.debug("Changed output path to %s to ensure lossless format", output_path)
         
         # Open and convert the image
-        print(f"Opening image at {input_path}")
-        img = Image.open(input_path)
-        
-        # Convert to RGB if needed
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-            print(f"Converted image to RGB mode")
-        
-        # Save as temporary PNG file
-        temp_png_path = os.path.join(os.path.dirname(output_path), "temp_converted.png")
-        img.save(temp_png_path, format="PNG")
-        print(f"Saved temporary PNG at {temp_png_path}")
+        logger.debug("Opening image at %s", input_path)
+        with metrics.stage('convert', 'image'):
+            img = Image.open(input_path)
+            
+            # Convert to RGB if needed
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+                logger.debug("Converted image to RGB mode")
+            
+            # Save as temporary PNG file (unique, so concurrent workers don't overwrite each other)
+            temp_fd, temp_png_path = tempfile.mkstemp(suffix=".png", prefix="temp_converted_", dir=os.path.dirname(output_path) or None)
+            os.close(temp_fd)
+            img.save(temp_png_path, format="PNG")
+        logger.debug("Saved temporary PNG at %s", temp_png_path)
         
         # Now hide data in the PNG
-        result = hide_data_in_image(temp_png_path, output_path, data)
+        result = hide_data_in_image(temp_png_path, output_path, data, progress=progress)
         
         # Clean up temporary file
         try:
             os.remove(temp_png_path)
         except:
-            print(f"Warning: Could not remove temporary file {temp_png_path}")
+            logger.warning("Could not remove temporary file %s", temp_png_path)
         
         return result
     
     except Exception as e:
-        print(f"Error in convert_and_hide_in_image: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in convert_and_hide_in_image: %s", e)
         raise
 
-def generate_qr_code(data, output_path, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4):
+def qr_error_correction(level='H'):
+    """qrcode constant of an error correction level 'L', 'M', 'Q' or 'H' (anything else gives 'H')"""
+    from qrcode import constants
+    return {
+        'L': constants.ERROR_CORRECT_L,  # ~7% correction
+        'M': constants.ERROR_CORRECT_M,  # ~15% correction
+        'Q': constants.ERROR_CORRECT_Q,  # ~25% correction
+        'H': constants.ERROR_CORRECT_H   # ~30% correction
+    }.get(str(level).upper(), constants.ERROR_CORRECT_H)
+
+def generate_qr_code(data, output_path, error_correction=None, box_size=10, border=4):
     """
     Generate a QR code and save it to the specified path
     
     Args:
         data: The data to encode in the QR code
         output_path: The path to save the QR code image
-        error_correction: QR error correction level (L, M, Q, H)
+        error_correction: qrcode error correction constant (see qr_error_correction), H by default
         box_size: Size of each box in the QR code
         border: Border size in boxes
         
     Returns:
         Path to the generated QR code
     """
+    import qrcode
+    
+    if error_correction is None:
+        error_correction = qrcode.constants.ERROR_CORRECT_H
+    
     try:
-        # Create QR code instance
-        qr = qrcode.QRCode(
-            version=None,  # Auto determine version
-            error_correction=error_correction,
-            box_size=box_size,
-            border=border,
-        )
-        
-        # Add data to the QR code
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Create an image from the QR code
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save the image
-        img.save(output_path)
+        with metrics.stage('qr_render', 'qr'):
+            # Create QR code instance
+            qr = qrcode.QRCode(
+                version=None,  # Auto determine version
+                error_correction=error_correction,
+                box_size=box_size,
+                border=border,
+            )
+            
+            # Add data to the QR code
+            qr.add_data(data)
+            qr.make(fit=True)
+            
+            # Create an image from the QR code
+            img = qr.make_image(fill_color="black", back_color="white")
+            
+            # Save the image
+            img.save(output_path)
         
         return output_path
     except Exception as e:
-        print(f"Error generating QR code: {str(e)}")
+        logger.error("Error generating QR code: %s", e)
         raise
 
-def hide_message_in_qr(message, password, output_path, background_image=None, style="standard"):
+def hide_message_in_qr(message, password, output_path, background_image=None, style="standard", use_dictionary=False):
     """
     Generate a QR code with a hidden message
     
@@ -856,10 +871,13 @@ def hide_message_in_qr(message, password, output_path, background_image=None, st
         output_path: Path to save the QR code
         background_image: Optional background image path
         style: QR code style ("standard", "embedded", "fancy")
+        use_dictionary: Compress with the preset dictionary to shrink short messages
         
     Returns:
         Path to the generated QR code
     """
+    import qrcode
+    
     try:
         # Encrypt the message
         if isinstance(message, str):
@@ -867,7 +885,7 @@ def hide_message_in_qr(message, password, output_path, background_image=None, st
         else:
             message_bytes = message
             
-        encrypted_data = encrypt_message(message_bytes, password)
+        encrypted_data = encrypt_message(message_bytes, password, use_dictionary=use_dictionary)
         
         # Create the QR code with embedded password
         data_to_encode = encrypted_data + b'\x01' + password.encode('utf-8')
@@ -875,48 +893,49 @@ def hide_message_in_qr(message, password, output_path, background_image=None, st
         # Convert binary data to a base64 string for QR encoding
         encoded_data = binascii.hexlify(data_to_encode).decode('ascii')
         
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=None,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(encoded_data)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        if style == "standard":
-            img = qr.make_image(fill_color="black", back_color="white")
-        elif style == "fancy":
-            # Create a colored QR code
-            img = qr.make_image(fill_color="blue", back_color="white")
-        elif style == "embedded":
-            # Create QR with lower contrast for better blending
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-        # Handle background image if provided
-        if background_image and os.path.exists(background_image):
-            # Open background image
-            bg = Image.open(background_image)
+        with metrics.stage('qr_render', 'qr'):
+            # Generate QR code
+            qr = qrcode.QRCode(
+                version=None,
+                error_correction=qrcode.constants.ERROR_CORRECT_H,
+                box_size=10,
+                border=4,
+            )
+            qr.add_data(encoded_data)
+            qr.make(fit=True)
             
-            # Resize background to match QR code size
-            bg = bg.resize(img.size)
+            # Create QR code image
+            if style == "standard":
+                img = qr.make_image(fill_color="black", back_color="white")
+            elif style == "fancy":
+                # Create a colored QR code
+                img = qr.make_image(fill_color="blue", back_color="white")
+            elif style == "embedded":
+                # Create QR with lower contrast for better blending
+                img = qr.make_image(fill_color="black", back_color="white")
+                
+            # Handle background image if provided
+            if background_image and os.path.exists(background_image):
+                # Open background image
+                bg = Image.open(background_image)
+                
+                # Resize background to match QR code size
+                bg = bg.resize(img.size)
+                
+                if style == "embedded":
+                    # Blend QR code with background image
+                    img = Image.blend(bg.convert("RGBA"), img.convert("RGBA"), 0.7)
+                else:
+                    # Center QR code on background
+                    bg.paste(img, (0, 0))
+                    img = bg
             
-            if style == "embedded":
-                # Blend QR code with background image
-                img = Image.blend(bg.convert("RGBA"), img.convert("RGBA"), 0.7)
-            else:
-                # Center QR code on background
-                bg.paste(img, (0, 0))
-                img = bg
-        
-        # Save the final image
-        img.save(output_path)
+            # Save the final image
+            img.save(output_path)
         
         return output_path
     except Exception as e:
-        print(f"Error hiding message in QR code: {str(e)}")
+        logger.error("Error hiding message in QR code: %s", e)
         raise
 
 def extract_message_from_qr(qr_code_path, password=None):
@@ -931,50 +950,54 @@ def extract_message_from_qr(qr_code_path, password=None):
         The extracted message
     """
     try:
-        # Read QR code
-        img = Image.open(qr_code_path)
-        
-        # Try using pyzbar first, which tends to be more reliable
-        try:
-            from pyzbar.pyzbar import decode
-            decoded_objects = decode(img)
-            if decoded_objects:
-                print("Successfully decoded QR with pyzbar")
-                decoded_info = [decoded_objects[0].data.decode('ascii')]
-            else:
-                # If pyzbar fails, try OpenCV
-                print("Pyzbar couldn't decode, trying OpenCV...")
-                # Convert PIL image to OpenCV format properly
-                # Convert to RGB first to ensure we have a 3-channel image
-                img_rgb = img.convert('RGB')
-                cv_img = np.array(img_rgb)
-                # Convert RGB to BGR (OpenCV format)
-                cv_img = cv2.cvtColor(cv_img, cv2.COLOR_RGB2BGR)
-                
-                # Initialize QR code detector
-                detector = cv2.QRCodeDetector()
-                
-                # Detect and decode
-                retval, decoded_info, points, straight_qrcode = detector.detectAndDecodeMulti(cv_img)
-                
-                if not retval or len(decoded_info) == 0:
-                    return "No QR code found in the image"
-        except Exception as e:
-            print(f"Error in QR code reading: {str(e)}")
-            # Last resort: try OpenCV if pyzbar failed to import or process
+        with metrics.stage('qr_decode', 'qr'):
+            # Read QR code
+            img = Image.open(qr_code_path)
+            
+            # Try using pyzbar first, which tends to be more reliable
             try:
-                print("Trying OpenCV as fallback...")
-                img_rgb = img.convert('RGB')
-                cv_img = np.array(img_rgb)
-                cv_img = cv2.cvtColor(cv_img, cv2.COLOR_RGB2BGR)
-                
-                detector = cv2.QRCodeDetector()
-                retval, decoded_info, points, straight_qrcode = detector.detectAndDecodeMulti(cv_img)
-                
-                if not retval or len(decoded_info) == 0:
-                    return "Failed to extract QR code data. The image may not contain a valid QR code."
-            except Exception as nested_e:
-                return f"Failed to extract QR code data. Error: {str(nested_e)}"
+                from pyzbar.pyzbar import decode
+                decoded_objects = decode(img)
+                if decoded_objects:
+                    logger.debug("Decoded QR code with pyzbar")
+                    decoded_info = [decoded_objects[0].data.decode('ascii')]
+                else:
+                    # If pyzbar fails, try OpenCV
+                    logger.debug("pyzbar couldn't decode the QR code, trying OpenCV")
+                    # OpenCV is only loaded when pyzbar cannot read the code
+                    import cv2
+                    # Convert PIL image to OpenCV format properly
+                    # Convert to RGB first to ensure we have a 3-channel image
+                    img_rgb = img.convert('RGB')
+                    cv_img = np.array(img_rgb)
+                    # Convert RGB to BGR (OpenCV format)
+                    cv_img = cv2.cvtColor(cv_img, cv2.COLOR_RGB2BGR)
+                    
+                    # Initialize QR code detector
+                    detector = cv2.QRCodeDetector()
+                    
+                    # Detect and decode
+                    retval, decoded_info, points, straight_qrcode = detector.detectAndDecodeMulti(cv_img)
+                    
+                    if not retval or len(decoded_info) == 0:
+                        return "No QR code found in the image"
+            except Exception as e:
+                logger.warning("Error reading QR code: %s", e)
+                # Last resort: try OpenCV if pyzbar failed to import or process
+                try:
+                    logger.debug("Trying OpenCV as fallback")
+                    import cv2
+                    img_rgb = img.convert('RGB')
+                    cv_img = np.array(img_rgb)
+                    cv_img = cv2.cvtColor(cv_img, cv2.COLOR_RGB2BGR)
+                    
+                    detector = cv2.QRCodeDetector()
+                    retval, decoded_info, points, straight_qrcode = detector.detectAndDecodeMulti(cv_img)
+                    
+                    if not retval or len(decoded_info) == 0:
+                        return "Failed to extract QR code data. The image may not contain a valid QR code."
+                except Exception as nested_e:
+                    return f"Failed to extract QR code data. Error: {str(nested_e)}"
         
         # Convert hex string back to binary data
         try:
@@ -994,10 +1017,10 @@ def extract_message_from_qr(qr_code_path, password=None):
                 try:
                     embedded_password = encrypted_data[i+1:].decode('utf-8')
                     password_found = True
-                    print(f"Found embedded password: {embedded_password}")
+                    logger.debug("Found embedded password")
                     break
                 except UnicodeDecodeError:
-                    print("Failed to decode embedded password - possible corruption")
+                    logger.warning("Failed to decode embedded password, possible corruption")
         
         # Always use embedded password if available
         if password_found:
@@ -1014,5 +1037,5 @@ def extract_message_from_qr(qr_code_path, password=None):
             return f"Error decrypting message: {str(e)}. The password may be incorrect or the data corrupted."
         
     except Exception as e:
-        print(f"Error extracting message from QR code: {str(e)}")
+        logger.error("Error extracting message from QR code: %s", e)
         return f"Error: {str(e)}"
\ No newline at end of file